@@ -1,6 +1,15 @@
-from src.processamento_lote import processar_pasta_gpx
+from src.processamento_lote import processar_pasta_gpx, processar_pasta_gpx_streaming
+from src.leitura_antecipada import LeitorAntecipado
+from src.descoberta_arquivos import descobrir_arquivos_gpx
+from src.indice_espacial import IndiceEspacial
+from src.niveis_detalhe import ArmazemNiveisDetalhe
 from src.enriquecimento_geografico import enriquecer_localizacao
 from src.clustering_dificuldade import classificar_dificuldade_kmeans, classificar_dificuldade_dbscan, classificar_dificuldade_hierarquico
+from src.similaridade import construir_indice_similaridade
+from src.estabilidade_clustering import analisar_estabilidade
+from src.monitoramento import MonitorPasta
+from src.elevacao_dem import ModeloElevacao
+from src.telemetria import Telemetria, medir_etapa
 
 
 def main():
@@ -21,26 +30,110 @@ def main():
     caminho_analise = 'dados/resultados/analise_trilhas.csv'
     caminho_enriquecido = 'dados/resultados/analise_trilhas_enriquecido.csv'
     caminho_classificado = 'dados/resultados/trilhas_classificadas.csv'
+    caminho_indice_espacial = 'dados/resultados/indice_espacial.npz'
+    caminho_detalhe = 'dados/resultados/trilhas_detalhe'
+    caminho_modelo = 'dados/resultados/modelo_kmeans.joblib'
+    caminho_indice_similaridade = 'dados/resultados/indice_similaridade.joblib'
+
+    # Estabilidade bootstrap do K-Means e do Hierárquico (0 = desligada)
+    n_reamostras_estabilidade = 0
+
+    # Monitoramento contínuo de 'dados/gpx' após o pipeline (polling; Ctrl+C encerra)
+    modo_monitoramento = False
+    intervalo_monitoramento_s = 30
 
     #calcular_localizacao = input("\nDeseja executar o enriquecimento geográfico? (s/n): ").strip().lower() == 's'
     
     calcular_localizacao = False
+
+    # Streaming: grava o CSV em blocos e limita as trilhas parseadas em memória
+    modo_streaming = False
+    max_trilhas_em_memoria = 4
+
+    # Pré-leitura: threads leem os próximos GPX (limite em arquivos e bytes) enquanto o atual é
+    # parseado; útil em armazenamento de rede (0 threads = leitura síncrona)
+    threads_pre_leitura = 4
+    max_bytes_pre_leitura = 64 * 1024 * 1024
+
+    # Correção de altitude por modelo digital de elevação local (tiles SRTM .hgt, ex.: 'dados/dem');
+    # None mantém a altitude do GPS
+    pasta_dem = None
+
+    # Quase duplicatas (reexportações, cópias cortadas): 'manter', 'sinalizar' ou 'ignorar'
+    modo_duplicatas = 'manter'
+
+    # Telemetria: trace JSON-lines por arquivo/etapa e perfil dos N arquivos mais lentos
+    caminho_telemetria = 'dados/resultados/telemetria.jsonl'
+    perfilar_top_n = 0
+
+    telemetria = Telemetria(
+        caminho_trace=caminho_telemetria,
+        perfilar_top_n=perfilar_top_n
+    )
+
     # ------------------------------------------------------------
     # 1) Processamento GPX
     # ------------------------------------------------------------
 
     print("\n[1/3] Processando arquivos GPX...")
 
-    df_resultados = processar_pasta_gpx(pasta_gpx)
+    # Varre as subpastas (ano/região) e descarta arquivos vazios antes do parse
+    arquivos_gpx = descobrir_arquivos_gpx(pasta_gpx, recursivo=True)
 
-    df_resultados.to_csv(
-        caminho_analise,
-        index=False,
-        encoding='utf-8'
-    )
+    # Índice espacial construído no mesmo lote (linhas alinhadas com o CSV de análise)
+    indice_espacial = IndiceEspacial()
+
+    # Geometria simplificada em vários níveis para os mapas do acervo
+    armazem_detalhe = ArmazemNiveisDetalhe()
+
+    corretor_elevacao = ModeloElevacao(pasta_dem) if pasta_dem else None
+
+    leitor_antecipado = None
+    if threads_pre_leitura > 0:
+        leitor_antecipado = LeitorAntecipado(
+            max_threads=threads_pre_leitura,
+            max_bytes=max_bytes_pre_leitura
+        )
+
+    if modo_streaming:
+        processar_pasta_gpx_streaming(
+            pasta_gpx,
+            caminho_analise,
+            max_trilhas_em_memoria=max_trilhas_em_memoria,
+            telemetria=telemetria,
+            arquivos=arquivos_gpx,
+            duplicatas=modo_duplicatas,
+            indice_espacial=indice_espacial,
+            corretor_elevacao=corretor_elevacao,
+            armazem_detalhe=armazem_detalhe,
+            leitor_antecipado=leitor_antecipado
+        )
+    else:
+        df_resultados = processar_pasta_gpx(
+            pasta_gpx,
+            telemetria,
+            arquivos=arquivos_gpx,
+            duplicatas=modo_duplicatas,
+            indice_espacial=indice_espacial,
+            corretor_elevacao=corretor_elevacao,
+            armazem_detalhe=armazem_detalhe,
+            leitor_antecipado=leitor_antecipado
+        )
+
+        df_resultados.to_csv(
+            caminho_analise,
+            index=False,
+            encoding='utf-8'
+        )
 
     print(f"Arquivo salvo em: {caminho_analise}")
 
+    indice_espacial.salvar(caminho_indice_espacial)
+    print(f"Índice espacial salvo em: {caminho_indice_espacial}")
+
+    armazem_detalhe.salvar(caminho_detalhe)
+    print(f"Níveis de detalhe salvos em: {caminho_detalhe}.npz")
+
     # ------------------------------------------------------------
     # 2) Enriquecimento (Opcional)
     # ------------------------------------------------------------
@@ -68,31 +161,70 @@ def main():
 
     # K-Means (Base)
     print("\nExecutando K-Means...")
-    classificar_dificuldade_kmeans(
-        caminho_csv_entrada=caminho_para_classificacao,
-        caminho_csv_saida='dados/resultados/trilhas_kmeans.csv',
-        n_clusters=5
+    with medir_etapa(telemetria, 'clustering', 'kmeans'):
+        classificar_dificuldade_kmeans(
+            caminho_csv_entrada=caminho_para_classificacao,
+            caminho_csv_saida='dados/resultados/trilhas_kmeans.csv',
+            n_clusters=5,
+            caminho_modelo=caminho_modelo
+        )
+
+    # Índice de "trilhas parecidas" no mesmo espaço padronizado do K-Means
+    construir_indice_similaridade(
+        'dados/resultados/trilhas_kmeans.csv',
+        caminho_modelo,
+        caminho_indice_similaridade
     )
 
     # Hierárquico
     print("\nExecutando Clustering Hierárquico...")
-    classificar_dificuldade_hierarquico(
-        caminho_csv_entrada=caminho_para_classificacao,
-        caminho_csv_saida='dados/resultados/trilhas_hierarquico.csv',
-        n_clusters=5
-    )
+    with medir_etapa(telemetria, 'clustering', 'hierarquico'):
+        classificar_dificuldade_hierarquico(
+            caminho_csv_entrada=caminho_para_classificacao,
+            caminho_csv_saida='dados/resultados/trilhas_hierarquico.csv',
+            n_clusters=5
+        )
 
     # DBSCAN
     print("\nExecutando DBSCAN...")
-    classificar_dificuldade_dbscan(
-        caminho_csv_entrada=caminho_para_classificacao,
-        caminho_csv_saida='dados/resultados/trilhas_dbscan.csv',
-        eps=0.5, 
-        min_samples=3
-    )
+    with medir_etapa(telemetria, 'clustering', 'dbscan'):
+        classificar_dificuldade_dbscan(
+            caminho_csv_entrada=caminho_para_classificacao,
+            caminho_csv_saida='dados/resultados/trilhas_dbscan.csv',
+            eps=0.5, 
+            min_samples=3
+        )
+
+    if n_reamostras_estabilidade > 0:
+        print("\nAnalisando estabilidade dos clusters...")
+        with medir_etapa(telemetria, 'clustering', 'estabilidade'):
+            analisar_estabilidade(
+                caminho_csv_entrada=caminho_para_classificacao,
+                caminho_csv_saida='dados/resultados/estabilidade_clusters.csv',
+                n_clusters=5,
+                n_reamostras=n_reamostras_estabilidade
+            )
 
     print("\nAnálise comparativa completa. Verifique a pasta 'dados/resultados/'.")
 
+    if modo_monitoramento:
+        MonitorPasta(
+            pasta_gpx,
+            caminho_analise,
+            'dados/resultados/trilhas_kmeans.csv',
+            caminho_modelo,
+            caminho_indice_similaridade=caminho_indice_similaridade,
+            telemetria=telemetria,
+            corretor_elevacao=corretor_elevacao,
+            caminho_indice_espacial=caminho_indice_espacial,
+            caminho_detalhe=caminho_detalhe
+        ).executar(intervalo_monitoramento_s)
+
+    telemetria.resumo()
+    if perfilar_top_n > 0:
+        telemetria.salvar_perfis('dados/resultados/perfis')
+    telemetria.fechar()
+
 
 if __name__ == "__main__":
     main()
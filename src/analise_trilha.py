@@ -1,13 +1,15 @@
-import os
 import numpy as np
 import pandas as pd
 
-from src.leitura_gpx import ler_gpx
+from src.leitura_gpx import ler_gpx_trilha, nome_trilha as extrair_nome_trilha
 from src.metricas_trilha import (
     calcular_distancia_total_km,
-    calcular_ganho_elevacao_m
+    calcular_ganho_elevacao_m,
+    calcular_ganhos_diarios_m
 )
 from src.modelos_tempo import estimar_tempo_tobler_min
+from src.trilha import como_trilha
+from src.telemetria import Telemetria, medir_etapa
 
 
 # ------------------------------------------------------------
@@ -33,45 +35,38 @@ def calcular_inclinacao_media_graus(distancia_km: float, ganho_elevacao_m: float
     return float(np.degrees(inclinacao_rad))
 
 
-def calcular_dias_trilha(dados: pd.DataFrame) -> int:
+def calcular_dias_trilha(dados) -> int:
     """
     Objetivo: Diferenciar trilhas de um dia (leisure) de expedições multi-day.
-    Entrada: pd.DataFrame com a coluna 'time'.
-    Processamento: Extrai a parte da 'data' do timestamp e conta ocorrências únicas.
+    Entrada: Trilha ou pd.DataFrame com a coluna 'time'.
+    Processamento: Extrai o dia (UTC) de cada timestamp válido e conta ocorrências únicas.
     Saída: Inteiro representando o número de dias de duração.
     """
-    if 'time' not in dados.columns:
+    if isinstance(dados, pd.DataFrame) and 'time' not in dados.columns:
         return 1
 
-    tempos = dados['time'].dropna()
+    dias = como_trilha(dados).dias_utc()
 
-    if len(tempos) < 2:
+    if len(dias) < 2:
         return 1
 
-    return int(tempos.dt.date.nunique())
+    return int(len(np.unique(dias)))
 
 
-def calcular_indice_concentracao(dados: pd.DataFrame) -> float:
+def calcular_indice_concentracao(dados) -> float:
     """
     Objetivo: Medir a heterogeneidade do esforço vertical ao longo dos dias.
-    Entrada: pd.DataFrame com colunas 'time' e 'altitude_m'.
+    Entrada: Trilha ou pd.DataFrame com colunas 'time' e 'altitude_m'.
     Processamento: 
         1. Agrupa os pontos por data.
         2. Calcula o ganho de elevação de cada dia individualmente.
         3. Computa o Coeficiente de Variação (Desvio Padrão / Média) dos ganhos diários.
     Saída: Float representando a regularidade do esforço (0 = esforço constante).
     """
-    if 'time' not in dados.columns:
+    if isinstance(dados, pd.DataFrame) and 'time' not in dados.columns:
         return 0.0
 
-    df = dados.dropna(subset=['time']).copy()
-    df['data'] = df['time'].dt.date
-
-    ganhos = []
-
-    for _, grupo in df.groupby('data'):
-        ganho_dia = calcular_ganho_elevacao_m(grupo)
-        ganhos.append(ganho_dia)
+    ganhos = calcular_ganhos_diarios_m(dados)
 
     if len(ganhos) <= 1:
         return 0.0
@@ -81,43 +76,82 @@ def calcular_indice_concentracao(dados: pd.DataFrame) -> float:
         return 0.0
 
     return float(np.std(ganhos) / media)
-    return float(np.std(ganhos) / media)
 
 
 # ------------------------------------------------------------
 # FUNÇÃO PRINCIPAL
 # ------------------------------------------------------------
 
-def analisar_trilha(caminho_gpx: str) -> dict:
+def ler_trilha_corrigida(caminho_gpx: str, telemetria: Telemetria = None, corretor_elevacao=None):
+    """
+    Objetivo: Ler o GPX e corrigir a altitude pelo modelo de elevação, quando informado.
+    Saída: Tupla (nome da trilha, Trilha colunar).
+    """
+    nome_trilha = extrair_nome_trilha(caminho_gpx)
+
+    with medir_etapa(telemetria, 'parse', nome_trilha) as registro:
+        dados = ler_gpx_trilha(caminho_gpx)
+        registro['n_pontos'] = len(dados)
+
+    if corretor_elevacao is not None:
+        with medir_etapa(telemetria, 'elevacao', nome_trilha, len(dados)):
+            dados = corretor_elevacao.corrigir(dados)
+
+    return nome_trilha, dados
+
+
+def analisar_trilha(caminho_gpx: str, telemetria: Telemetria = None, corretor_elevacao=None) -> dict:
     """
     Objetivo: Orquestrar a extração completa de metadados científicos de uma trilha.
-    Entrada: String com o caminho do arquivo GPX.
+    Entrada: 
+        - caminho_gpx: String com o caminho do arquivo GPX.
+        - telemetria: Coletor opcional que mede cada etapa (parse, distancia, ganho, dias_ic, tobler).
+        - corretor_elevacao: Modelo de elevação opcional ('ModeloElevacao') aplicado à altitude.
     Processamento: 
-        1. Executa 'ler_gpx' para obter o DataFrame.
-        2. Aciona o motor de métricas (distância, ganho, inclinação).
-        3. Aplica o modelo de Tobler para estimativa de intensidade temporal.
-        4. Calcula o score de Intensidade Diária (combinação de tempo e declividade).
+        1. Executa 'ler_trilha_corrigida' para obter a Trilha colunar (altitude já corrigida).
+        2. Delega o cálculo dos indicadores a 'calcular_metricas_trilha'.
     Saída: Dicionário contendo todos os indicadores calculados prontos para o dataset.
     """
 
-    nome_trilha = os.path.splitext(
-        os.path.basename(caminho_gpx)
-    )[0]
+    nome_trilha, dados = ler_trilha_corrigida(caminho_gpx, telemetria, corretor_elevacao)
 
-    dados = ler_gpx(caminho_gpx)
+    return calcular_metricas_trilha(nome_trilha, dados, telemetria)
 
-    latitude_inicio = float(dados.iloc[0]['latitude'])
-    longitude_inicio = float(dados.iloc[0]['longitude'])
 
-    distancia_km = calcular_distancia_total_km(dados)
-    ganho_elevacao_m = calcular_ganho_elevacao_m(dados)
+def calcular_metricas_trilha(nome_trilha: str, dados, telemetria: Telemetria = None) -> dict:
+    """
+    Objetivo: Calcular os indicadores científicos de uma trilha já carregada em memória.
+    Entrada: 
+        - nome_trilha: Identificador da trilha (nome do arquivo sem extensão).
+        - dados: Trilha (ou pd.DataFrame no layout de 'ler_gpx').
+        - telemetria: Coletor opcional de métricas de execução.
+    Processamento: 
+        1. Aciona o motor de métricas (distância, ganho, inclinação).
+        2. Aplica o modelo de Tobler para estimativa de intensidade temporal.
+        3. Calcula o score de Intensidade Diária (combinação de tempo e declividade).
+    Saída: Dicionário contendo todos os indicadores calculados prontos para o dataset.
+    """
+
+    dados = como_trilha(dados)
+    n_pontos = len(dados)
+
+    latitude_inicio = float(dados.latitude[0])
+    longitude_inicio = float(dados.longitude[0])
+
+    with medir_etapa(telemetria, 'distancia', nome_trilha, n_pontos):
+        distancia_km = calcular_distancia_total_km(dados)
+
+    with medir_etapa(telemetria, 'ganho', nome_trilha, n_pontos):
+        ganho_elevacao_m = calcular_ganho_elevacao_m(dados)
 
     inclinacao_media = calcular_inclinacao_media_graus(
         distancia_km,
         ganho_elevacao_m
     )
 
-    dias_trilha = max(calcular_dias_trilha(dados), 1)
+    with medir_etapa(telemetria, 'dias_ic', nome_trilha, n_pontos):
+        dias_trilha = max(calcular_dias_trilha(dados), 1)
+        indice_concentracao = calcular_indice_concentracao(dados)
 
     tipo_trilha = (
         'single_day' if dias_trilha == 1 else 'multi_day'
@@ -134,10 +168,11 @@ def analisar_trilha(caminho_gpx: str) -> dict:
     # TEMPO ESTIMADO VIA TOBLER
     # ------------------------------------------------------------
 
-    tempo_estimado_dia_min = estimar_tempo_tobler_min(
-        distancia_por_dia,
-        inclinacao_media
-    )
+    with medir_etapa(telemetria, 'tobler', nome_trilha, n_pontos):
+        tempo_estimado_dia_min = estimar_tempo_tobler_min(
+            distancia_por_dia,
+            inclinacao_media
+        )
 
     tempo_por_km_dia = (
         tempo_estimado_dia_min / distancia_por_dia
@@ -154,8 +189,6 @@ def analisar_trilha(caminho_gpx: str) -> dict:
         + inclinacao_media
     )
 
-    indice_concentracao = calcular_indice_concentracao(dados)
-
     return {
         'trilha': nome_trilha,
         'latitude_inicio': round(latitude_inicio, 6),
@@ -1,11 +1,61 @@
+import json
+import os
+import time
+
+import joblib
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import KMeans, AgglomerativeClustering, DBSCAN
 from sklearn.metrics import silhouette_score
+from sklearn.neighbors import KDTree
+from scipy.sparse import csr_matrix
+
+
+COLUNAS_DIFICULDADE = ['intensidade_diaria', 'dias_trilha', 'indice_concentracao_esforco']
+
+# Configuração do K-Means do pipeline (reproduzida pela análise de estabilidade)
+SEMENTE_KMEANS = 42
+N_INIT_KMEANS = 30
 
 
-def classificar_dificuldade_kmeans(caminho_csv_entrada: str, caminho_csv_saida: str, n_clusters: int = 5) -> None:
+def rotulos_dificuldade(n_clusters: int) -> list:
+    """
+    Objetivo: Nomes dos níveis de dificuldade, do cluster menos ao mais severo.
+    Saída: Lista com 'n_clusters' nomes. Lança ValueError para k fora de 3 a 5.
+    """
+    if n_clusters == 5:
+        return [
+            'Leve',
+            'Moderada',
+            'Pesada',
+            'Muito Pesada',
+            'Extrema'
+        ]
+    elif n_clusters == 4:
+        return [
+            'Leve',
+            'Moderada',
+            'Pesada',
+            'Extrema'
+        ]
+    elif n_clusters == 3:
+        return [
+            'Leve',
+            'Moderada',
+            'Pesada'
+        ]
+    else:
+        raise ValueError("Número de clusters não suportado.")
+
+
+def classificar_dificuldade_kmeans(
+    caminho_csv_entrada: str,
+    caminho_csv_saida: str,
+    n_clusters: int = 5,
+    caminho_modelo: str = None,
+    amostra_silhouette: int = None
+) -> None:
     """
     Objetivo: Clusterizar e rotular as trilhas por nível de dificuldade percebida.
     Entrada: Caminho do CSV consolidado com as features científicas.
@@ -15,16 +65,14 @@ def classificar_dificuldade_kmeans(caminho_csv_entrada: str, caminho_csv_saida:
         3. Treina o K-Means para encontrar padrões naturais de agrupamento.
         4. Calcula o Silhouette Score para validar a qualidade da segmentação (Ref. Monografia: 0.442).
         5. Lógica de Negócio: Ordena os clusters pela "severidade" do centroide e mapeia nomes (Leve -> Extrema).
-    Saída: Salva um novo CSV com as colunas 'cluster' e 'dificuldade'.
+        6. Opcionalmente salva o modelo ajustado (scaler + K-Means + mapa de rótulos) em 'caminho_modelo'.
+    Saída: Salva um novo CSV com as colunas 'cluster' e 'dificuldade' e o JSON de métricas ao lado
+           (ver 'salvar_metricas_clustering'; 'amostra_silhouette' limita o custo do Silhouette).
     """
 
     df = pd.read_csv(caminho_csv_entrada)
 
-    colunas = [
-        'intensidade_diaria',
-        'dias_trilha',
-        'indice_concentracao_esforco'
-    ]
+    colunas = COLUNAS_DIFICULDADE
 
     dados_cluster = df[colunas].dropna()
 
@@ -33,16 +81,18 @@ def classificar_dificuldade_kmeans(caminho_csv_entrada: str, caminho_csv_saida:
 
     kmeans = KMeans(
         n_clusters=n_clusters,
-        random_state=42,
-        n_init=30
+        random_state=SEMENTE_KMEANS,
+        n_init=N_INIT_KMEANS
     )
 
+    inicio = time.perf_counter()
     clusters = kmeans.fit_predict(X_scaled)
+    tempo_ajuste = time.perf_counter() - inicio
 
     df.loc[dados_cluster.index, 'cluster'] = clusters
 
-    if n_clusters > 1:
-        silhouette = silhouette_score(X_scaled, clusters)
+    silhouette, tempo_silhouette = _silhouette(X_scaled, clusters, amostra_silhouette)
+    if silhouette is not None:
         print(f"Silhouette Score (k={n_clusters}): {silhouette:.3f}")
 
     # ------------------------------------------------------------
@@ -56,29 +106,7 @@ def classificar_dificuldade_kmeans(caminho_csv_entrada: str, caminho_csv_saida:
 
     ordem = scores.argsort()
 
-    if n_clusters == 5:
-        rotulos = [
-            'Leve',
-            'Moderada',
-            'Pesada',
-            'Muito Pesada',
-            'Extrema'
-        ]
-    elif n_clusters == 4:
-        rotulos = [
-            'Leve',
-            'Moderada',
-            'Pesada',
-            'Extrema'
-        ]
-    elif n_clusters == 3:
-        rotulos = [
-            'Leve',
-            'Moderada',
-            'Pesada'
-        ]
-    else:
-        raise ValueError("Número de clusters não suportado.")
+    rotulos = rotulos_dificuldade(n_clusters)
 
     mapa = {
         ordem[i]: rotulos[i]
@@ -93,19 +121,174 @@ def classificar_dificuldade_kmeans(caminho_csv_entrada: str, caminho_csv_saida:
         encoding='utf-8'
     )
 
+    if caminho_modelo:
+        salvar_modelo_dificuldade(caminho_modelo, scaler, kmeans, mapa, colunas)
+
+    salvar_metricas_clustering(caminho_csv_saida, metricas_clustering(
+        'kmeans',
+        dados_cluster,
+        clusters,
+        silhouette,
+        amostra_silhouette,
+        parametros={'n_clusters': n_clusters, 'n_init': N_INIT_KMEANS, 'random_state': SEMENTE_KMEANS},
+        tempos_s={'ajuste': tempo_ajuste, 'silhouette': tempo_silhouette},
+        mapa=mapa
+    ))
+
     print("\nClassificação concluída.")
     print(df['dificuldade'].value_counts())
 
 
+# ------------------------------------------------------------
+# MODELO AJUSTADO (REUSO FORA DO TREINO)
+# ------------------------------------------------------------
 
-def classificar_dificuldade_hierarquico(caminho_csv_entrada: str, caminho_csv_saida: str, n_clusters: int = 5) -> None:
+def salvar_modelo_dificuldade(caminho_modelo: str, scaler, kmeans, mapa: dict, colunas: list) -> None:
+    """
+    Objetivo: Persistir o scaler, o K-Means e o mapa cluster -> dificuldade de um mesmo ajuste.
+    Saída: Arquivo joblib com um dicionário {'colunas', 'scaler', 'kmeans', 'mapa'}.
+    """
+    pasta = os.path.dirname(caminho_modelo)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+
+    joblib.dump(
+        {
+            'colunas': list(colunas),
+            'scaler': scaler,
+            'kmeans': kmeans,
+            'mapa': {int(cluster): rotulo for cluster, rotulo in mapa.items()}
+        },
+        caminho_modelo
+    )
+
+
+def carregar_modelo_dificuldade(caminho_modelo: str) -> dict:
+    return joblib.load(caminho_modelo)
+
+
+def prever_dificuldade(modelo: dict, df: pd.DataFrame) -> pd.Series:
+    """
+    Objetivo: Rotular trilhas novas com o modelo salvo, sem reajustar o K-Means.
+    Entrada: Modelo de 'carregar_modelo_dificuldade' e DataFrame com as colunas do modelo.
+    Saída: pd.Series de dificuldades alinhada ao índice do DataFrame (NaN se faltar feature).
+    """
+    dados = df[modelo['colunas']].dropna()
+
+    if dados.empty:
+        return pd.Series(np.nan, index=df.index, dtype=object)
+
+    clusters = modelo['kmeans'].predict(modelo['scaler'].transform(dados))
+
+    return pd.Series(
+        [modelo['mapa'][int(cluster)] for cluster in clusters],
+        index=dados.index,
+        dtype=object
+    ).reindex(df.index)
+
+
+# ------------------------------------------------------------
+# MÉTRICAS DO AJUSTE (JSON AO LADO DO CSV)
+# ------------------------------------------------------------
+
+def _silhouette(X_scaled: np.ndarray, clusters: np.ndarray, amostra: int = None):
+    """
+    Objetivo: Silhouette exato (amostra=None) ou sobre 'amostra' linhas sorteadas.
+    Saída: Tupla (score ou None se houver menos de 2 grupos, tempo em segundos).
+    """
+    if len(set(clusters) - {-1}) < 2:
+        return None, 0.0
+
+    inicio = time.perf_counter()
+    amostra = min(amostra, len(X_scaled)) if amostra else None
+    score = silhouette_score(X_scaled, clusters, sample_size=amostra, random_state=42)
+
+    return float(score), time.perf_counter() - inicio
+
+
+def caminho_metricas(caminho_csv_saida: str) -> str:
+    return os.path.splitext(caminho_csv_saida)[0] + '_metricas.json'
+
+
+def metricas_clustering(
+    metodo: str,
+    dados_cluster: pd.DataFrame,
+    clusters: np.ndarray,
+    silhouette: float,
+    amostra_silhouette: int,
+    parametros: dict,
+    tempos_s: dict,
+    mapa: dict = None
+) -> dict:
+    """
+    Objetivo: Resumo estruturado de um ajuste de clustering (consumido pelos gráficos).
+    Entrada: Features usadas (escala original), rótulos, Silhouette e sua amostra (None = exato),
+             parâmetros, tempos e, se houver, o mapa cluster -> dificuldade.
+    Saída: Dicionário serializável em JSON; centroides são as médias de cada cluster na escala
+           original das features (o ruído do DBSCAN, -1, fica fora).
+    """
+    rotulos = pd.Series(clusters, index=dados_cluster.index)
+    tamanhos = rotulos.value_counts().sort_index()
+    centroides = dados_cluster[rotulos != -1].groupby(rotulos[rotulos != -1]).mean()
+
+    return {
+        'metodo': metodo,
+        'n_trilhas': int(len(rotulos)),
+        'n_clusters': int(len(tamanhos.drop(-1, errors='ignore'))),
+        'ruido': int(tamanhos.get(-1, 0)),
+        'silhouette': None if silhouette is None else round(silhouette, 4),
+        'silhouette_amostra': amostra_silhouette,
+        'tamanhos': {str(cluster): int(n) for cluster, n in tamanhos.items()},
+        'colunas': list(dados_cluster.columns),
+        'centroides': {
+            str(cluster): [round(float(valor), 4) for valor in linha]
+            for cluster, linha in zip(centroides.index, centroides.to_numpy())
+        },
+        'dificuldades': None if mapa is None else {str(int(cluster)): rotulo for cluster, rotulo in mapa.items()},
+        'parametros': parametros,
+        'tempos_s': {etapa: round(tempo, 4) for etapa, tempo in tempos_s.items()},
+        'timestamp': time.time()
+    }
+
+
+def salvar_metricas_clustering(caminho_csv_saida: str, metricas: dict) -> str:
+    """
+    Objetivo: Gravar as métricas em '<csv sem extensão>_metricas.json'.
+    Saída: Caminho do JSON.
+    """
+    caminho = caminho_metricas(caminho_csv_saida)
+
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(metricas, arquivo, ensure_ascii=False, indent=2)
+
+    return caminho
+
+
+def carregar_metricas_clustering(caminho_csv_saida: str) -> dict:
+    """
+    Objetivo: Ler as métricas gravadas junto ao CSV de um método.
+    Saída: Dicionário de 'metricas_clustering' ou None se o método não foi executado.
+    """
+    try:
+        with open(caminho_metricas(caminho_csv_saida), 'r', encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except FileNotFoundError:
+        return None
+
+
+def classificar_dificuldade_hierarquico(
+    caminho_csv_entrada: str,
+    caminho_csv_saida: str,
+    n_clusters: int = 5,
+    amostra_silhouette: int = None
+) -> None:
     """
     Objetivo: Agrupamento hierárquico (Aglomerativo) para identificar níveis de dificuldade.
     Diferença: Constrói uma hierarquia de clusters de baixo para cima utilizando a ligação de Ward. 
     Serve como validação da estrutura natural de agrupamento dos dados (ID, Dias, IC).
     """
     df = pd.read_csv(caminho_csv_entrada)
-    colunas = ['intensidade_diaria', 'dias_trilha', 'indice_concentracao_esforco']
+    colunas = COLUNAS_DIFICULDADE
     dados_cluster = df[colunas].dropna()
 
     scaler = StandardScaler()
@@ -113,7 +296,9 @@ def classificar_dificuldade_hierarquico(caminho_csv_entrada: str, caminho_csv_sa
 
     # Implementação Hierárquica
     hc = AgglomerativeClustering(n_clusters=n_clusters, linkage='ward')
+    inicio = time.perf_counter()
     clusters = hc.fit_predict(X_scaled)
+    tempo_ajuste = time.perf_counter() - inicio
     df.loc[dados_cluster.index, 'cluster'] = clusters
 
     # Para ordenar os rótulos no Hierárquico, calculamos as médias de cada cluster (pseudo-centroides)
@@ -129,39 +314,188 @@ def classificar_dificuldade_hierarquico(caminho_csv_entrada: str, caminho_csv_sa
     
     df['dificuldade'] = df['cluster'].map(mapa)
     
-    if n_clusters > 1:
-        silhouette = silhouette_score(X_scaled, clusters)
+    silhouette, tempo_silhouette = _silhouette(X_scaled, clusters, amostra_silhouette)
+    if silhouette is not None:
         print(f"Silhouette Score Hierárquico (k={n_clusters}): {silhouette:.3f}")
 
     df.to_csv(caminho_csv_saida, index=False, encoding='utf-8')
 
-
-
-def classificar_dificuldade_dbscan(caminho_csv_entrada: str, caminho_csv_saida: str, eps: float = 0.5, min_samples: int = 5) -> None:
+    salvar_metricas_clustering(caminho_csv_saida, metricas_clustering(
+        'hierarquico',
+        dados_cluster,
+        clusters,
+        silhouette,
+        amostra_silhouette,
+        parametros={'n_clusters': n_clusters, 'linkage': 'ward'},
+        tempos_s={'ajuste': tempo_ajuste, 'silhouette': tempo_silhouette},
+        mapa=mapa
+    ))
+
+
+
+def classificar_dificuldade_dbscan(
+    caminho_csv_entrada: str,
+    caminho_csv_saida: str,
+    eps: float = 0.5,
+    min_samples: int = 5,
+    escalavel: bool = False,
+    casas_decimais: int = None,
+    memoria_max_mb: float = 256,
+    memoria_grafo_max_mb: float = None
+) -> None:
     """
     Objetivo: Identificar clusters por densidade e pontos anômalos (ruído).
     Diferença: Não exige definição prévia de k e identifica trilhas "fora do padrão" (outliers).
     Utilizado para validar a diversidade dos dados e detectar casos excepcionais (cluster -1).
+    Modo escalável ('escalavel=True'): usa 'dbscan_escalavel' (amostras ponderadas e grafo de
+    vizinhança esparso montado em blocos, com teto opcional para o grafo inteiro) e calcula o
+    Silhouette sobre uma amostra.
     """
     df = pd.read_csv(caminho_csv_entrada)
-    colunas = ['intensidade_diaria', 'dias_trilha', 'indice_concentracao_esforco']
+    colunas = COLUNAS_DIFICULDADE
     dados_cluster = df[colunas].dropna()
 
     scaler = StandardScaler()
     X_scaled = scaler.fit_transform(dados_cluster)
 
     # Implementação DBSCAN
-    dbscan = DBSCAN(eps=eps, min_samples=min_samples)
-    clusters = dbscan.fit_predict(X_scaled)
+    inicio = time.perf_counter()
+    if escalavel:
+        clusters = dbscan_escalavel(
+            X_scaled,
+            eps,
+            min_samples,
+            casas_decimais,
+            memoria_max_mb,
+            memoria_grafo_max_mb
+        )
+    else:
+        dbscan = DBSCAN(eps=eps, min_samples=min_samples)
+        clusters = dbscan.fit_predict(X_scaled)
+    tempo_ajuste = time.perf_counter() - inicio
     df.loc[dados_cluster.index, 'cluster'] = clusters
 
     # No DBSCAN, o rótulo -1 indica ruído/outlier
     n_clusters_encontrados = len(set(clusters)) - (1 if -1 in clusters else 0)
     
-    if n_clusters_encontrados > 1:
-        silhouette = silhouette_score(X_scaled, clusters)
+    amostra = min(len(X_scaled), 10000) if escalavel else None
+    silhouette, tempo_silhouette = _silhouette(X_scaled, clusters, amostra)
+    if silhouette is not None:
         print(f"Silhouette Score DBSCAN (eps={eps}): {silhouette:.3f}")
     
     print(f"DBSCAN encontrou {n_clusters_encontrados} clusters e {list(clusters).count(-1)} pontos de ruído.")
 
-    df.to_csv(caminho_csv_saida, index=False, encoding='utf-8')
\ No newline at end of file
+    df.to_csv(caminho_csv_saida, index=False, encoding='utf-8')
+
+    salvar_metricas_clustering(caminho_csv_saida, metricas_clustering(
+        'dbscan',
+        dados_cluster,
+        clusters,
+        silhouette,
+        amostra,
+        parametros={
+            'eps': eps,
+            'min_samples': min_samples,
+            'escalavel': escalavel,
+            'casas_decimais': casas_decimais
+        },
+        tempos_s={'ajuste': tempo_ajuste, 'silhouette': tempo_silhouette}
+    ))
+
+
+def dbscan_escalavel(
+    X_scaled: np.ndarray,
+    eps: float,
+    min_samples: int,
+    casas_decimais: int = None,
+    memoria_max_mb: float = 256,
+    memoria_grafo_max_mb: float = None
+) -> np.ndarray:
+    """
+    Objetivo: DBSCAN com memória controlada para tabelas grandes e cheias de linhas repetidas.
+    Entrada:
+        - X_scaled: Matriz padronizada (n x d).
+        - eps / min_samples: Parâmetros do DBSCAN.
+        - casas_decimais: Arredonda as features antes de agrupar vetores (None = só repetidos exatos).
+        - memoria_max_mb: Teto aproximado para as vizinhanças geradas a cada bloco de consultas.
+          Limita só o bloco: o grafo completo (16 bytes por par vizinho, mais a cópia CSR) cresce
+          com o total de pares e fica inteiro em memória durante o DBSCAN.
+        - memoria_grafo_max_mb: Teto para o grafo completo (None = sem teto, apenas reportado).
+    Processamento:
+        1. Colapsa vetores idênticos em amostras únicas com peso = número de repetições.
+        2. Monta o grafo esparso de vizinhança (distância <= eps) com uma KD-Tree, em blocos cujo
+           tamanho é ajustado pela densidade observada no bloco anterior; se o total acumulado de
+           pares passar de 'memoria_grafo_max_mb', interrompe com ValueError (reduzir 'eps' ou
+           'casas_decimais' para agrupar mais linhas repetidas).
+        3. Roda o DBSCAN pré-computado com 'sample_weight' (min_samples conta o peso).
+        4. Expande os rótulos das amostras únicas para todas as linhas e renumera os clusters
+           pela ordem de aparição na tabela (como no DBSCAN comum).
+    Saída: Array de rótulos (n,), com -1 para ruído.
+    """
+    X = np.round(X_scaled, casas_decimais) if casas_decimais is not None else np.asarray(X_scaled)
+    unicos, inverso, pesos = np.unique(X, axis=0, return_inverse=True, return_counts=True)
+    inverso = inverso.reshape(-1)
+
+    arvore = KDTree(unicos)
+    limite_bytes = memoria_max_mb * 1024 ** 2
+    bytes_por_vizinho = 16  # índice int64 + distância float64
+
+    limite_grafo_bytes = memoria_grafo_max_mb * 1024 ** 2 if memoria_grafo_max_mb is not None else None
+
+    indices, distancias, tamanhos = [], [], []
+    inicio, bloco, n_arestas = 0, 1024, 0
+
+    while inicio < len(unicos):
+        fim = min(inicio + bloco, len(unicos))
+        vizinhos, dist = arvore.query_radius(
+            unicos[inicio:fim],
+            r=eps,
+            return_distance=True,
+            sort_results=True
+        )
+
+        n_vizinhos = np.fromiter((len(v) for v in vizinhos), dtype=np.int64, count=len(vizinhos))
+        n_arestas += int(n_vizinhos.sum())
+
+        if limite_grafo_bytes is not None and n_arestas * bytes_por_vizinho > limite_grafo_bytes:
+            raise ValueError(
+                f"Grafo de vizinhança do DBSCAN passou de {memoria_grafo_max_mb} MB "
+                f"({n_arestas} pares em {fim} de {len(unicos)} amostras únicas); "
+                f"reduza 'eps' ou 'casas_decimais'."
+            )
+
+        indices.append(np.concatenate(vizinhos))
+        distancias.append(np.concatenate(dist))
+        tamanhos.append(n_vizinhos)
+
+        # Próximo bloco dimensionado para caber no teto com a densidade média observada
+        media = max(float(n_vizinhos.mean()), 1.0)
+        bloco = int(np.clip(limite_bytes / (media * bytes_por_vizinho), 1, 65536))
+        inicio = fim
+
+    indptr = np.concatenate(([0], np.cumsum(np.concatenate(tamanhos))))
+    grafo = csr_matrix(
+        (np.concatenate(distancias), np.concatenate(indices), indptr),
+        shape=(len(unicos), len(unicos))
+    )
+
+    print(
+        f"DBSCAN escalável: {len(X)} linhas -> {len(unicos)} amostras únicas, "
+        f"{grafo.nnz} pares vizinhos (~{grafo.nnz * bytes_por_vizinho / 1024 ** 2:.1f} MB)."
+    )
+
+    rotulos_unicos = DBSCAN(eps=eps, min_samples=min_samples, metric='precomputed').fit_predict(
+        grafo,
+        sample_weight=pesos
+    )
+
+    rotulos = rotulos_unicos[inverso]
+
+    agrupados = rotulos >= 0
+    if agrupados.any():
+        existentes, primeira_linha = np.unique(rotulos[agrupados], return_index=True)
+        renumeracao = np.empty(existentes.max() + 1, dtype=np.int64)
+        renumeracao[existentes[np.argsort(primeira_linha)]] = np.arange(len(existentes))
+        rotulos[agrupados] = renumeracao[rotulos[agrupados]]
+
+    return rotulos
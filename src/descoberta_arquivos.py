@@ -0,0 +1,157 @@
+import fnmatch
+import heapq
+import os
+from collections import namedtuple
+
+import pandas as pd
+
+from src.leitura_compactados import EXTENSOES_COMPACTADAS
+
+
+PADROES_GPX = ('*.gpx', '*.gpx.gz')
+PADROES_COMPACTADOS = tuple('*' + extensao for extensao in EXTENSOES_COMPACTADAS)
+
+# Item da lista de trabalho: caminho relativo à raiz (separador '/'), tamanho e mtime do stat
+ArquivoDescoberto = namedtuple('ArquivoDescoberto', ['caminho_relativo', 'tamanho_bytes', 'mtime_ns'])
+
+
+def _corresponde(caminho_relativo: str, padroes) -> bool:
+    """
+    Objetivo: Aplicar padrões glob (sem distinção de maiúsculas).
+    Regra: Padrões com '/' são comparados ao caminho relativo; os demais, apenas ao nome do arquivo.
+    """
+    caminho = caminho_relativo.lower()
+    nome = caminho.rsplit('/', 1)[-1]
+
+    for padrao in padroes:
+        padrao = padrao.lower()
+        alvo = caminho if '/' in padrao else nome
+        if fnmatch.fnmatchcase(alvo, padrao):
+            return True
+
+    return False
+
+
+def descobrir_arquivos_gpx(
+    caminho_raiz: str,
+    incluir=PADROES_GPX + PADROES_COMPACTADOS,
+    excluir=(),
+    recursivo: bool = True,
+    tamanho_min_bytes: int = 1,
+    tamanho_max_bytes: int = None
+) -> list:
+    """
+    Objetivo: Montar a lista de trabalho de um acervo GPX organizado em subpastas (ano/região).
+    Entrada:
+        - caminho_raiz: Pasta inicial da varredura.
+        - incluir / excluir: Padrões glob (ex.: '*.gpx', '2019/*', '*_backup*'). Pastas cujo nome
+          (ou caminho relativo, para padrões com '/') casa com 'excluir' não são percorridas.
+        - recursivo: Desce nas subpastas (False reproduz a varredura de um único nível).
+        - tamanho_min_bytes / tamanho_max_bytes: Pré-filtro de tamanho (vazios e gigantes são
+          descartados antes de qualquer parse).
+    Processamento:
+        1. Percorre as pastas com 'os.scandir' (pilha explícita, sem recursão de Python).
+        2. Usa o tipo em cache da entrada e um único 'stat' por arquivo para tamanho e mtime.
+        3. Ordena o resultado pelo caminho relativo, tornando a lista determinística.
+    Saída: Lista ordenada de ArquivoDescoberto(caminho_relativo, tamanho_bytes, mtime_ns).
+    """
+    encontrados = []
+    ignorados_pequenos = 0
+    ignorados_grandes = 0
+
+    pendentes = ['']
+
+    while pendentes:
+        relativo_pasta = pendentes.pop()
+        pasta = os.path.join(caminho_raiz, relativo_pasta) if relativo_pasta else caminho_raiz
+
+        try:
+            entradas = os.scandir(pasta)
+        except OSError as erro:
+            print(f"Erro ao listar {pasta}: {erro}")
+            continue
+
+        with entradas:
+            for entrada in entradas:
+                relativo = f"{relativo_pasta}/{entrada.name}" if relativo_pasta else entrada.name
+
+                if entrada.is_dir(follow_symlinks=False):
+                    if recursivo and not _corresponde(relativo, excluir):
+                        pendentes.append(relativo)
+                    continue
+
+                if not entrada.is_file():
+                    continue
+
+                if not _corresponde(relativo, incluir) or _corresponde(relativo, excluir):
+                    continue
+
+                informacoes = entrada.stat()
+                tamanho = informacoes.st_size
+
+                if tamanho < tamanho_min_bytes:
+                    ignorados_pequenos += 1
+                    continue
+
+                if tamanho_max_bytes is not None and tamanho > tamanho_max_bytes:
+                    ignorados_grandes += 1
+                    continue
+
+                encontrados.append(
+                    ArquivoDescoberto(relativo, tamanho, informacoes.st_mtime_ns)
+                )
+
+    if ignorados_pequenos or ignorados_grandes:
+        print(
+            f"Descoberta: {ignorados_pequenos} arquivo(s) vazio(s)/pequeno(s) e "
+            f"{ignorados_grandes} acima do limite ignorados."
+        )
+
+    encontrados.sort(key=lambda arquivo: arquivo.caminho_relativo)
+    return encontrados
+
+
+def salvar_lista_trabalho(arquivos: list, caminho_csv: str) -> None:
+    """
+    Objetivo: Persistir a lista de trabalho como manifesto (auditoria, reprocessamento, sharding).
+    Entrada: Lista de ArquivoDescoberto e o CSV de destino.
+    Saída: CSV com colunas ['caminho_relativo', 'tamanho_bytes', 'mtime_ns'].
+    """
+    pd.DataFrame(arquivos, columns=ArquivoDescoberto._fields).to_csv(
+        caminho_csv,
+        index=False,
+        encoding='utf-8'
+    )
+
+
+def carregar_lista_trabalho(caminho_csv: str) -> list:
+    """
+    Objetivo: Reabrir um manifesto salvo por 'salvar_lista_trabalho'.
+    Saída: Lista de ArquivoDescoberto na ordem do arquivo.
+    """
+    df = pd.read_csv(caminho_csv, dtype={'caminho_relativo': str})
+    return [ArquivoDescoberto(*linha) for linha in df.itertuples(index=False, name=None)]
+
+
+def balancear_por_tamanho(arquivos: list, n_grupos: int) -> list:
+    """
+    Objetivo: Dividir a lista de trabalho em grupos de carga (bytes) semelhante.
+    Entrada: Lista de ArquivoDescoberto e o número de grupos (workers/nós).
+    Processamento: Heurística LPT — do maior para o menor, cada arquivo vai para o grupo mais leve.
+    Saída: Lista com 'n_grupos' listas de ArquivoDescoberto (cada uma ordenada pelo caminho).
+    """
+    if n_grupos < 1:
+        raise ValueError("n_grupos deve ser >= 1.")
+
+    grupos = [[] for _ in range(n_grupos)]
+    cargas = [(0, indice) for indice in range(n_grupos)]
+
+    for arquivo in sorted(arquivos, key=lambda a: -a.tamanho_bytes):
+        carga, indice = heapq.heappop(cargas)
+        grupos[indice].append(arquivo)
+        heapq.heappush(cargas, (carga + arquivo.tamanho_bytes, indice))
+
+    for grupo in grupos:
+        grupo.sort(key=lambda a: a.caminho_relativo)
+
+    return grupos
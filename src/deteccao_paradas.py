@@ -0,0 +1,191 @@
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+from src.metricas_trilha import distancias_geodesicas_m
+from src.trilha import NAT_NS, como_trilha
+
+
+RAIO_TERRA_M = 6_371_008.8
+
+COLUNAS_PARADAS = [
+    'inicio',
+    'fim',
+    'duracao_min',
+    'latitude',
+    'longitude',
+    'raio_m',
+    'indice_inicio',
+    'indice_fim'
+]
+
+# Resultado da detecção: rótulo por ponto, tabela de paradas e agregados de movimento
+DeteccaoParadas = namedtuple('DeteccaoParadas', ['parado', 'paradas', 'resumo'])
+
+
+# ------------------------------------------------------------
+# CODIFICAÇÃO POR CORRIDAS (RUN-LENGTH)
+# ------------------------------------------------------------
+
+def corridas_verdadeiras(mascara: np.ndarray):
+    """
+    Objetivo: Localizar as sequências contínuas de True de uma máscara booleana.
+    Entrada: Array booleano 1-D.
+    Processamento: Diferença da máscara com bordas False; +1 marca início e -1 marca fim.
+    Saída: Tupla (inicios, fins) com índices inclusivos de cada corrida.
+    """
+    bordas = np.diff(np.concatenate(([0], mascara.astype(np.int8), [0])))
+    inicios = np.flatnonzero(bordas == 1)
+    fins = np.flatnonzero(bordas == -1) - 1
+    return inicios, fins
+
+
+def _marcar_intervalos(n: int, inicios: np.ndarray, fins: np.ndarray) -> np.ndarray:
+    """
+    Objetivo: Máscara booleana com True em [inicio, fim] de cada intervalo (disjuntos).
+    Processamento: +1 no início, -1 após o fim e soma acumulada (linear em n).
+    """
+    marcas = np.zeros(n + 1, dtype=np.int64)
+    np.add.at(marcas, inicios, 1)
+    np.add.at(marcas, fins + 1, -1)
+    return np.cumsum(marcas[:-1]) > 0
+
+
+# ------------------------------------------------------------
+# DETECÇÃO DE PARADAS
+# ------------------------------------------------------------
+
+def detectar_paradas(
+    dados,
+    vmin_kmh: float = 1.0,
+    duracao_min_s: float = 120.0,
+    raio_max_m: float = 30.0,
+    tolerancia_s: float = 30.0
+) -> DeteccaoParadas:
+    """
+    Objetivo: Identificar onde e por quanto tempo o caminhante ficou parado.
+    Entrada:
+        - dados: Trilha ou pd.DataFrame com ['latitude', 'longitude', 'time'] (ordenado por tempo).
+        - vmin_kmh: Abaixo desta velocidade o par de pontos é considerado parado (acima do
+          limiar de 'calcular_tempo_ativo_min' para tolerar a oscilação do GPS parado).
+        - duracao_min_s: Duração mínima para que uma sequência lenta conte como parada.
+        - raio_max_m: Todos os pontos da parada devem estar a até esta distância do seu centroide
+          (descarta deslocamentos lentos, como subidas muito íngremes).
+        - tolerancia_s: Corridas separadas por interrupções até esta duração (um salto isolado
+          do GPS) são unidas antes dos critérios de duração e raio.
+    Processamento:
+        1. Descarta pontos sem tempo e calcula distância e intervalo de todos os pares de uma vez.
+        2. Máscara de velocidade por par, codificação em corridas (run-length) e união das
+           corridas separadas por interrupções curtas.
+        3. Para cada corrida: duração, centroide (somas acumuladas) e raio máximo
+           (np.maximum.reduceat), aplicando os critérios de duração e raio.
+        4. Pares fora das paradas aceitas formam o movimento.
+    Saída: DeteccaoParadas(
+        parado: array booleano por ponto da entrada (pontos sem tempo = False),
+        paradas: pd.DataFrame com COLUNAS_PARADAS (índices referentes à entrada),
+        resumo: dict com tempos, distância e velocidade em movimento)
+    Complexidade: O(n) em tempo e memória.
+    """
+    trilha = como_trilha(dados)
+    n_total = len(trilha)
+
+    posicoes = np.flatnonzero(trilha.tempo_ns != NAT_NS)
+    latitude = np.asarray(trilha.latitude[posicoes], dtype=np.float64)
+    longitude = np.asarray(trilha.longitude[posicoes], dtype=np.float64)
+    tempo_ns = trilha.tempo_ns[posicoes]
+    n = len(posicoes)
+
+    parado = np.zeros(n_total, dtype=bool)
+    vazio = DeteccaoParadas(
+        parado,
+        pd.DataFrame(columns=COLUNAS_PARADAS),
+        _resumir(np.zeros(0), np.zeros(0), np.zeros(0, dtype=bool), 0)
+    )
+
+    if n < 2:
+        return vazio
+
+    distancias_m = distancias_geodesicas_m(latitude, longitude)
+    delta_s = np.diff(tempo_ns) / 1e9
+
+    # Par parado: velocidade abaixo do limiar (pares com o mesmo instante e sem deslocamento
+    # também contam, para não partir uma parada em duas)
+    par_lento = distancias_m <= (vmin_kmh / 3.6) * np.maximum(delta_s, 0.0)
+
+    inicios, fins = corridas_verdadeiras(par_lento)
+
+    if len(inicios) == 0:
+        return vazio._replace(resumo=_resumir(distancias_m, delta_s, np.zeros(n - 1, dtype=bool), 0))
+
+    # União de corridas separadas por interrupções curtas
+    interrupcao_s = (tempo_ns[inicios[1:]] - tempo_ns[fins[:-1] + 1]) / 1e9
+    nova_corrida = np.concatenate(([True], interrupcao_s > tolerancia_s))
+    ultima_da_corrida = np.concatenate((nova_corrida[1:], [True]))
+    inicios, fins = inicios[nova_corrida], fins[ultima_da_corrida]
+
+    # Corrida de pares [i, f] cobre os pontos [i, f + 1]
+    duracao_s = (tempo_ns[fins + 1] - tempo_ns[inicios]) / 1e9
+
+    # Centroide por corrida via somas acumuladas
+    n_pontos = (fins + 2 - inicios).astype(np.float64)
+    soma_lat = np.concatenate(([0.0], np.cumsum(latitude)))
+    soma_lon = np.concatenate(([0.0], np.cumsum(longitude)))
+    centro_lat = (soma_lat[fins + 2] - soma_lat[inicios]) / n_pontos
+    centro_lon = (soma_lon[fins + 2] - soma_lon[inicios]) / n_pontos
+
+    # Distância de cada ponto ao centroide da sua corrida (aproximação plana local)
+    ponto_em_corrida = _marcar_intervalos(n, inicios, fins + 1)
+    inicio_de_corrida = np.zeros(n, dtype=np.int64)
+    inicio_de_corrida[inicios] = 1
+    corrida_do_ponto = np.where(ponto_em_corrida, np.cumsum(inicio_de_corrida) - 1, 0)
+
+    dlat = np.radians(latitude - centro_lat[corrida_do_ponto])
+    dlon = np.radians(longitude - centro_lon[corrida_do_ponto])
+    afastamento_m = RAIO_TERRA_M * np.hypot(dlat, dlon * np.cos(np.radians(latitude)))
+    afastamento_m = np.where(ponto_em_corrida, afastamento_m, 0.0)
+
+    # Pontos entre corridas valem 0, então o máximo de [inicio_k, inicio_k+1) é o da corrida k
+    raio_m = np.maximum.reduceat(afastamento_m, inicios)
+
+    aceitas = (duracao_s >= duracao_min_s) & (raio_m <= raio_max_m)
+    inicios, fins = inicios[aceitas], fins[aceitas]
+
+    par_parado = _marcar_intervalos(n - 1, inicios, fins)
+    parado[posicoes] = _marcar_intervalos(n, inicios, fins + 1)
+
+    paradas = pd.DataFrame({
+        'inicio': pd.to_datetime(tempo_ns[inicios].view('datetime64[ns]'), utc=True),
+        'fim': pd.to_datetime(tempo_ns[fins + 1].view('datetime64[ns]'), utc=True),
+        'duracao_min': np.round(duracao_s[aceitas] / 60, 2),
+        'latitude': np.round(centro_lat[aceitas], 6),
+        'longitude': np.round(centro_lon[aceitas], 6),
+        'raio_m': np.round(raio_m[aceitas], 1),
+        'indice_inicio': posicoes[inicios],
+        'indice_fim': posicoes[fins + 1]
+    }, columns=COLUNAS_PARADAS)
+
+    return DeteccaoParadas(parado, paradas, _resumir(distancias_m, delta_s, par_parado, len(inicios)))
+
+
+def _resumir(distancias_m: np.ndarray, delta_s: np.ndarray, par_parado: np.ndarray, n_paradas: int) -> dict:
+    """
+    Objetivo: Agregados de movimento a partir da classificação dos pares.
+    """
+    em_movimento = ~par_parado & (delta_s > 0)
+
+    tempo_movimento_min = float(delta_s[em_movimento].sum() / 60)
+    tempo_parado_min = float(delta_s[par_parado].sum() / 60)
+    distancia_movimento_km = float(distancias_m[em_movimento].sum() / 1000)
+
+    velocidade_movimento_kmh = (
+        distancia_movimento_km / (tempo_movimento_min / 60) if tempo_movimento_min > 0 else 0.0
+    )
+
+    return {
+        'n_paradas': int(n_paradas),
+        'tempo_parado_min': round(tempo_parado_min, 2),
+        'tempo_movimento_min': round(tempo_movimento_min, 2),
+        'distancia_movimento_km': round(distancia_movimento_km, 3),
+        'velocidade_movimento_kmh': round(velocidade_movimento_kmh, 3)
+    }
@@ -0,0 +1,193 @@
+import numpy as np
+
+from src.trilha import como_trilha
+
+
+MODOS_DUPLICATAS = ('manter', 'sinalizar', 'ignorar')
+
+METROS_POR_GRAU = 111_320.0
+
+# Constantes do finalizador do SplitMix64 (mistura de bits em aritmética uint64)
+_MISTURA_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MISTURA_2 = np.uint64(0x94D049BB133111EB)
+
+
+# ------------------------------------------------------------
+# ASSINATURAS
+# ------------------------------------------------------------
+
+def celulas_trilha(dados, tamanho_celula_m: float = 50.0) -> np.ndarray:
+    """
+    Objetivo: Conjunto de células de grade visitadas pela trilha (independe da ordem e da
+              densidade de pontos, o que aproxima reexportações e cópias reamostradas).
+    Entrada: Trilha ou pd.DataFrame com ['latitude', 'longitude'] e o lado da célula (m).
+    Processamento: Quantiza latitude e longitude em graus na mesma resolução e combina os
+                   dois índices em um inteiro de 64 bits.
+    Saída: Array uint64 ordenado e sem repetições.
+    """
+    trilha = como_trilha(dados)
+    lado_graus = tamanho_celula_m / METROS_POR_GRAU
+
+    linha = np.floor((np.asarray(trilha.latitude, dtype=np.float64) + 90) / lado_graus).astype(np.int64)
+    coluna = np.floor((np.asarray(trilha.longitude, dtype=np.float64) + 180) / lado_graus).astype(np.int64)
+
+    return np.unique(((linha << 32) | coluna).astype(np.uint64))
+
+
+def _misturar(valores: np.ndarray) -> np.ndarray:
+    valores = (valores ^ (valores >> np.uint64(30))) * _MISTURA_1
+    valores = (valores ^ (valores >> np.uint64(27))) * _MISTURA_2
+    return valores ^ (valores >> np.uint64(31))
+
+
+def sementes_minhash(n_hashes: int, semente: int = 0) -> np.ndarray:
+    """
+    Objetivo: Sementes fixas das funções de hash (mesmas assinaturas entre execuções).
+    """
+    return np.random.default_rng(semente).integers(0, 2**63, size=n_hashes, dtype=np.uint64)
+
+
+def assinatura_minhash(celulas: np.ndarray, sementes: np.ndarray) -> np.ndarray:
+    """
+    Objetivo: Resumir o conjunto de células em 'len(sementes)' mínimos de hash (MinHash).
+    Entrada: Células (uint64) e sementes.
+    Processamento: Para cada semente, aplica o hash a todas as células de uma vez (matriz
+                   sementes x células) e guarda o mínimo. A fração de posições iguais entre
+                   duas assinaturas estima a similaridade de Jaccard dos conjuntos.
+    Saída: Array uint64 com uma posição por semente.
+    """
+    if len(celulas) == 0:
+        return np.full(len(sementes), np.iinfo(np.uint64).max, dtype=np.uint64)
+
+    with np.errstate(over='ignore'):
+        return _misturar(celulas[None, :] ^ sementes[:, None]).min(axis=1)
+
+
+def assinatura_trilha(dados, sementes: np.ndarray, tamanho_celula_m: float = 50.0):
+    """
+    Objetivo: Assinatura MinHash e número de células da trilha (pode rodar nos workers: só o
+              resultado, pequeno, volta ao processo principal).
+    Saída: Tupla (assinatura uint64, número de células visitadas).
+    """
+    celulas = celulas_trilha(dados, tamanho_celula_m)
+    return assinatura_minhash(celulas, sementes), len(celulas)
+
+
+# ------------------------------------------------------------
+# ÍNDICE LSH INCREMENTAL
+# ------------------------------------------------------------
+
+class IndiceDuplicatas:
+    """
+    Objetivo: Encontrar trilhas quase idênticas já vistas, em tempo sublinear.
+    Estrutura:
+        - Assinaturas MinHash de 'n_bandas * linhas_por_banda' posições e o número de células
+          de cada trilha.
+        - LSH por bandas: cada banda da assinatura vira a chave de um balde; trilhas que
+          compartilham ao menos um balde são candidatas, e apenas elas são comparadas.
+        - Decisão pela contenção |A ∩ B| / min(|A|, |B|), estimada a partir do Jaccard J das
+          assinaturas: |A ∩ B| = J (|A| + |B|) / (1 + J). Uma cópia cortada tem Jaccard baixo
+          (25% cortados: J = 0.75), mas contenção próxima de 1.
+        - 'razao_tamanho_min': menor razão entre as contagens de células para casar (um trecho
+          curto contido em uma travessia longa não é cópia dela).
+        - As bandas curtas (4 linhas) tornam candidatos pares com J a partir de ~0.4, faixa em
+          que caem as cópias cortadas até 'razao_tamanho_min'.
+    Uso: 'verificar_e_adicionar' em cada trilha do lote, antes das métricas; para membros de
+         pacotes, a assinatura é calculada no worker ('assinatura_trilha' com 'sementes' e
+         'tamanho_celula_m') e conferida com 'verificar_e_adicionar_assinatura'.
+    """
+
+    def __init__(
+        self,
+        limiar_contencao: float = 0.8,
+        razao_tamanho_min: float = 0.5,
+        tamanho_celula_m: float = 50.0,
+        n_bandas: int = 32,
+        linhas_por_banda: int = 4,
+        semente: int = 0
+    ):
+        self.limiar_contencao = limiar_contencao
+        self.razao_tamanho_min = razao_tamanho_min
+        self.tamanho_celula_m = tamanho_celula_m
+        self.n_bandas = n_bandas
+        self.linhas_por_banda = linhas_por_banda
+        self.sementes = sementes_minhash(n_bandas * linhas_por_banda, semente)
+
+        self.nomes = []
+        self.assinaturas = []
+        self.n_celulas = []
+        self.baldes = {}
+
+    def __len__(self) -> int:
+        return len(self.nomes)
+
+    def assinatura(self, dados):
+        """
+        Saída: Tupla (assinatura MinHash, número de células visitadas).
+        """
+        return assinatura_trilha(dados, self.sementes, self.tamanho_celula_m)
+
+    def _chaves(self, assinatura: np.ndarray):
+        bandas = assinatura.reshape(self.n_bandas, self.linhas_por_banda)
+        return [(banda, bandas[banda].tobytes()) for banda in range(self.n_bandas)]
+
+    def consultar(self, assinatura: np.ndarray, n_celulas: int):
+        """
+        Objetivo: Trilha indexada com maior contenção estimada, se atingir o limiar.
+        Entrada: Assinatura e número de células da trilha consultada.
+        Saída: Tupla (nome_original ou None, contenção estimada).
+        """
+        candidatos = set()
+        for chave in self._chaves(assinatura):
+            candidatos.update(self.baldes.get(chave, ()))
+
+        melhor, contencao = None, 0.0
+        for candidato in sorted(candidatos):
+            menor, maior = sorted((self.n_celulas[candidato], n_celulas))
+            if menor == 0 or menor < self.razao_tamanho_min * maior:
+                continue
+
+            jaccard = float(np.mean(self.assinaturas[candidato] == assinatura))
+            estimativa = min(jaccard * (menor + maior) / ((1 + jaccard) * menor), 1.0)
+            if estimativa > contencao:
+                melhor, contencao = candidato, estimativa
+
+        if melhor is None or contencao < self.limiar_contencao:
+            return None, contencao
+
+        return self.nomes[melhor], contencao
+
+    def adicionar(self, nome: str, assinatura: np.ndarray, n_celulas: int) -> None:
+        posicao = len(self.nomes)
+        self.nomes.append(nome)
+        self.assinaturas.append(assinatura)
+        self.n_celulas.append(n_celulas)
+
+        for chave in self._chaves(assinatura):
+            self.baldes.setdefault(chave, []).append(posicao)
+
+    def verificar_e_adicionar(self, nome: str, dados):
+        """
+        Objetivo: Checar uma trilha contra o índice e registrá-la se for inédita.
+        Entrada: Nome da trilha e Trilha (ou DataFrame).
+        Processamento: Duplicatas não entram no índice; cópias posteriores casam com o original.
+        Saída: Tupla (nome_original ou None, contenção estimada).
+        """
+        return self.verificar_e_adicionar_assinatura(nome, *self.assinatura(dados))
+
+    def verificar_e_adicionar_assinatura(self, nome: str, assinatura: np.ndarray, n_celulas: int):
+        """
+        Objetivo: Mesmo que 'verificar_e_adicionar', com a assinatura já calculada.
+        Saída: Tupla (nome_original ou None, contenção estimada).
+        """
+        original, contencao = self.consultar(assinatura, n_celulas)
+
+        if original is None:
+            self.adicionar(nome, assinatura, n_celulas)
+
+        return original, contencao
+
+
+def validar_modo_duplicatas(modo: str) -> None:
+    if modo not in MODOS_DUPLICATAS:
+        raise ValueError(f"Modo de duplicatas inválido '{modo}': use {MODOS_DUPLICATAS}.")
@@ -0,0 +1,208 @@
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+from src.trilha import Trilha, como_trilha
+
+
+# Valor de ausência (void) das grades SRTM
+VAZIO_HGT = -32768
+
+
+def nome_tile_hgt(lat_sw: int, lon_sw: int) -> str:
+    """
+    Objetivo: Nome SRTM do tile cujo canto sudoeste é (lat_sw, lon_sw), ex.: 'S23W046.hgt'.
+    """
+    return (
+        f"{'N' if lat_sw >= 0 else 'S'}{abs(lat_sw):02d}"
+        f"{'E' if lon_sw >= 0 else 'W'}{abs(lon_sw):03d}.hgt"
+    )
+
+
+class ModeloElevacao:
+    """
+    Objetivo: Amostrar um modelo digital de elevação local (tiles SRTM .hgt) em cada ponto das
+              trilhas, sem rede, para substituir ou suavizar a altitude do GPS.
+    Estrutura:
+        - Tiles .hgt de 1° x 1°: grade quadrada int16 big-endian (1201 ou 3601 amostras por
+          lado, linha 0 na borda norte), abertos com np.memmap (só as páginas tocadas são lidas).
+        - Cache LRU de até 'max_tiles' tiles abertos.
+        - 'peso_dem': 1.0 substitui a altitude do GPS; valores entre 0 e 1 fazem a média ponderada.
+    Uso: 'corrigir(trilha)' antes das métricas (ver 'corretor_elevacao' em 'processar_pasta_gpx').
+         A instância pode ser enviada a processos (o cache não é serializado).
+    """
+
+    def __init__(self, pasta_dem: str, max_tiles: int = 16, peso_dem: float = 1.0):
+        if not 0.0 <= peso_dem <= 1.0:
+            raise ValueError("peso_dem deve estar entre 0 e 1.")
+
+        self.pasta_dem = pasta_dem
+        self.max_tiles = max_tiles
+        self.peso_dem = peso_dem
+
+        self.arquivos = {
+            entrada.name.upper(): entrada.path
+            for entrada in os.scandir(pasta_dem)
+            if entrada.is_file() and entrada.name.lower().endswith('.hgt')
+        }
+        self._cache = OrderedDict()
+
+    def __getstate__(self):
+        estado = self.__dict__.copy()
+        estado['_cache'] = OrderedDict()
+        return estado
+
+    # ------------------------------------------------------------
+    # TILES
+    # ------------------------------------------------------------
+
+    def _abrir_tile(self, lat_sw: int, lon_sw: int):
+        """
+        Objetivo: Tile do cache ou recém-mapeado (None se não houver arquivo para a célula).
+        """
+        chave = (lat_sw, lon_sw)
+
+        if chave in self._cache:
+            self._cache.move_to_end(chave)
+            return self._cache[chave]
+
+        caminho = self.arquivos.get(nome_tile_hgt(lat_sw, lon_sw).upper())
+        tile = None
+
+        if caminho is not None:
+            amostras = int(round(np.sqrt(os.path.getsize(caminho) // 2)))
+            if amostras * amostras * 2 != os.path.getsize(caminho):
+                raise ValueError(f"Tile {caminho} não é uma grade quadrada int16.")
+
+            tile = np.memmap(caminho, dtype='>i2', mode='r', shape=(amostras, amostras))
+
+        self._cache[chave] = tile
+        if len(self._cache) > self.max_tiles:
+            self._cache.popitem(last=False)
+
+        return tile
+
+    # ------------------------------------------------------------
+    # AMOSTRAGEM
+    # ------------------------------------------------------------
+
+    def _amostrar_tile(self, tile: np.ndarray, lat_sw: int, lon_sw: int, latitude: np.ndarray, longitude: np.ndarray) -> np.ndarray:
+        """
+        Objetivo: Interpolação bilinear vetorizada dentro de um tile.
+        Processamento: Vizinhos ausentes (void) saem da média e os pesos restantes são
+                       renormalizados; se o peso restante for nulo (ponto sobre um void), usa a
+                       média simples dos vizinhos válidos; sem nenhum vizinho válido, NaN.
+        """
+        ultimo = tile.shape[0] - 1
+
+        linha = (lat_sw + 1 - latitude) * ultimo
+        coluna = (longitude - lon_sw) * ultimo
+
+        linha0 = np.clip(np.floor(linha).astype(np.int64), 0, ultimo - 1)
+        coluna0 = np.clip(np.floor(coluna).astype(np.int64), 0, ultimo - 1)
+        fracao_linha = np.clip(linha - linha0, 0.0, 1.0)
+        fracao_coluna = np.clip(coluna - coluna0, 0.0, 1.0)
+
+        soma = np.zeros(len(latitude))
+        pesos = np.zeros(len(latitude))
+        soma_validos = np.zeros(len(latitude))
+        n_validos = np.zeros(len(latitude))
+
+        for delta_linha, delta_coluna, peso in (
+            (0, 0, (1 - fracao_linha) * (1 - fracao_coluna)),
+            (0, 1, (1 - fracao_linha) * fracao_coluna),
+            (1, 0, fracao_linha * (1 - fracao_coluna)),
+            (1, 1, fracao_linha * fracao_coluna)
+        ):
+            valores = tile[linha0 + delta_linha, coluna0 + delta_coluna]
+            valido = valores != VAZIO_HGT
+            peso = np.where(valido, peso, 0.0)
+            soma += peso * valores
+            pesos += peso
+            soma_validos += np.where(valido, valores, 0.0)
+            n_validos += valido
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return np.where(
+                pesos > 0,
+                soma / pesos,
+                np.where(n_validos > 0, soma_validos / n_validos, np.nan)
+            )
+
+    def amostrar(self, latitude, longitude) -> np.ndarray:
+        """
+        Objetivo: Elevação do modelo em cada ponto.
+        Entrada: Arrays de latitude e longitude (graus).
+        Processamento: Agrupa os pontos por tile (atalho quando todos caem no mesmo tile, o caso
+                       comum de uma trilha) e interpola cada grupo de uma vez.
+        Saída: Array float64 em metros (NaN sem tile ou em áreas ausentes).
+        """
+        latitude = np.asarray(latitude, dtype=np.float64)
+        longitude = np.asarray(longitude, dtype=np.float64)
+        elevacao = np.full(len(latitude), np.nan)
+
+        validos = np.flatnonzero(np.isfinite(latitude) & np.isfinite(longitude))
+        latitude, longitude = latitude[validos], longitude[validos]
+
+        if len(validos) == 0:
+            return elevacao
+
+        lat_sw = np.floor(latitude).astype(np.int64)
+        lon_sw = np.floor(longitude).astype(np.int64)
+        chaves = (lat_sw + 90) * 360 + (lon_sw + 180)
+
+        if chaves.min() == chaves.max():
+            grupos = [np.arange(len(chaves))]
+        else:
+            ordem = np.argsort(chaves, kind='stable')
+            grupos = np.split(ordem, np.flatnonzero(np.diff(chaves[ordem])) + 1)
+
+        for membros in grupos:
+            tile_lat, tile_lon = int(lat_sw[membros[0]]), int(lon_sw[membros[0]])
+            tile = self._abrir_tile(tile_lat, tile_lon)
+
+            if tile is not None:
+                elevacao[validos[membros]] = self._amostrar_tile(
+                    tile,
+                    tile_lat,
+                    tile_lon,
+                    latitude[membros],
+                    longitude[membros]
+                )
+
+        return elevacao
+
+    # ------------------------------------------------------------
+    # CORREÇÃO DA TRILHA
+    # ------------------------------------------------------------
+
+    def corrigir(self, dados, peso_dem: float = None) -> Trilha:
+        """
+        Objetivo: Trilha com a altitude corrigida pelo modelo de elevação.
+        Entrada: Trilha (ou DataFrame) e peso opcional (padrão: o da instância).
+        Processamento:
+            1. Amostra o modelo em todos os pontos.
+            2. altitude = peso * DEM + (1 - peso) * GPS onde ambos existem; só o DEM onde o GPS
+               não tem altitude; mantém o GPS fora da cobertura do modelo.
+        Saída: Nova Trilha (latitude, longitude e tempo compartilhados com a original).
+        """
+        trilha = como_trilha(dados)
+        peso = self.peso_dem if peso_dem is None else peso_dem
+
+        dem = self.amostrar(trilha.latitude, trilha.longitude)
+        gps = np.asarray(trilha.altitude_m, dtype=np.float64)
+
+        altitude = np.where(
+            np.isnan(dem),
+            gps,
+            np.where(np.isnan(gps), dem, peso * dem + (1 - peso) * gps)
+        )
+
+        return Trilha(
+            trilha.latitude,
+            trilha.longitude,
+            altitude,
+            trilha.tempo_ns,
+            dtype=trilha.latitude.dtype
+        )
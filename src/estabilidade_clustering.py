@@ -0,0 +1,195 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from sklearn.cluster import AgglomerativeClustering, KMeans
+from sklearn.metrics import adjusted_rand_score
+from sklearn.preprocessing import StandardScaler
+
+from src.clustering_dificuldade import (
+    COLUNAS_DIFICULDADE,
+    N_INIT_KMEANS,
+    SEMENTE_KMEANS,
+    rotulos_dificuldade
+)
+from src.memoria_compartilhada import anexar_arrays, compartilhar_arrays
+
+
+METODOS_ESTABILIDADE = ('kmeans', 'hierarquico')
+
+# Matriz padronizada anexada uma única vez por worker (ver '_inicializar_worker')
+_X_WORKER = None
+_BLOCO_WORKER = None
+
+
+# ------------------------------------------------------------
+# AJUSTE E ALINHAMENTO POR SEVERIDADE
+# ------------------------------------------------------------
+
+def _ajustar_clusters(amostra: np.ndarray, metodo: str, n_clusters: int, semente: int, n_init: int):
+    """
+    Objetivo: Ajustar o método e devolver os rótulos e os centroides já convertidos em níveis.
+    Processamento:
+        1. K-Means: centroides do modelo; Hierárquico (Ward): médias de cada cluster (pseudo-centroides),
+           como em 'classificar_dificuldade_hierarquico'.
+        2. Os clusters são ordenados pela soma do centroide (mesma regra das funções de
+           classificação), de modo que o nível 0 é sempre o mais leve em qualquer ajuste.
+    Saída: Tupla (clusters da amostra, centroides, nível de cada cluster).
+    """
+    if metodo == 'kmeans':
+        modelo = KMeans(n_clusters=n_clusters, random_state=semente, n_init=n_init).fit(amostra)
+        clusters, centroides = modelo.labels_, modelo.cluster_centers_
+    elif metodo == 'hierarquico':
+        clusters = AgglomerativeClustering(n_clusters=n_clusters, linkage='ward').fit_predict(amostra)
+        centroides = np.array([amostra[clusters == i].mean(axis=0) for i in range(n_clusters)])
+    else:
+        raise ValueError(f"Método de estabilidade inválido '{metodo}': use {METODOS_ESTABILIDADE}.")
+
+    nivel_do_cluster = np.empty(n_clusters, dtype=np.int8)
+    nivel_do_cluster[centroides.sum(axis=1).argsort()] = np.arange(n_clusters)
+
+    return clusters, centroides, nivel_do_cluster
+
+
+def _niveis_referencia(X: np.ndarray, metodo: str, n_clusters: int) -> np.ndarray:
+    """
+    Objetivo: Níveis que o pipeline grava para a tabela completa.
+    Processamento: Mesmo ajuste das funções de classificação (K-Means com 'SEMENTE_KMEANS' e
+                   'N_INIT_KMEANS'; rótulos do Ward sem reatribuição ao centroide).
+    Saída: Array int8 (n,) com níveis de 0 a n_clusters - 1.
+    """
+    clusters, _, nivel_do_cluster = _ajustar_clusters(X, metodo, n_clusters, SEMENTE_KMEANS, N_INIT_KMEANS)
+    return nivel_do_cluster[clusters]
+
+
+def _ajustar_niveis(X: np.ndarray, indices: np.ndarray, metodo: str, n_clusters: int, semente: int) -> np.ndarray:
+    """
+    Objetivo: Ajustar o método em X[indices] (reamostra) e devolver o nível de TODAS as linhas.
+    Processamento: Cada linha vai para o centroide mais próximo (o hierárquico não tem 'predict'
+                   e as linhas fora da reamostra também precisam de nível).
+    Saída: Array int8 (n,) com níveis de 0 a n_clusters - 1.
+    """
+    _, centroides, nivel_do_cluster = _ajustar_clusters(X[indices], metodo, n_clusters, semente, 10)
+
+    distancias = ((X[:, None, :] - centroides[None, :, :]) ** 2).sum(axis=2)
+    return nivel_do_cluster[distancias.argmin(axis=1)]
+
+
+def _inicializar_worker(descritor: dict) -> None:
+    global _X_WORKER, _BLOCO_WORKER
+    arrays, _BLOCO_WORKER = anexar_arrays(descritor)
+    _X_WORKER = arrays['X']
+
+
+def _executar_reamostra(metodo: str, n_clusters: int, tamanho_amostra: int, semente: int) -> np.ndarray:
+    """
+    Objetivo: Uma reamostra bootstrap (executada no worker sobre a matriz compartilhada).
+    """
+    gerador = np.random.default_rng(semente)
+    indices = gerador.integers(0, len(_X_WORKER), size=tamanho_amostra)
+    return _ajustar_niveis(_X_WORKER, indices, metodo, n_clusters, semente)
+
+
+# ------------------------------------------------------------
+# ANÁLISE DE ESTABILIDADE
+# ------------------------------------------------------------
+
+def analisar_estabilidade(
+    caminho_csv_entrada: str,
+    caminho_csv_saida: str,
+    n_clusters: int = 5,
+    n_reamostras: int = 200,
+    metodos=METODOS_ESTABILIDADE,
+    tamanho_amostra: int = None,
+    max_workers: int = None,
+    semente: int = 42,
+    max_pares_ari: int = 200
+) -> dict:
+    """
+    Objetivo: Medir quão estáveis são os rótulos de dificuldade sob reamostragem bootstrap.
+    Entrada:
+        - caminho_csv_entrada: Tabela de análise (mesmas features do clustering).
+        - caminho_csv_saida: CSV com o nível de referência e a confiança de cada trilha.
+        - n_clusters / n_reamostras / metodos: Configuração da análise.
+        - tamanho_amostra: Linhas sorteadas por reamostra (padrão: todas; reduzir limita o custo
+          O(n²) do hierárquico em tabelas grandes).
+        - max_workers: Processos do pool (None = CPUs).
+        - semente: Semente base (a reamostra i usa semente + i, tornando a análise reprodutível).
+        - max_pares_ari: Pares de reamostras sorteados para o ARI entre execuções.
+    Processamento:
+        1. Padroniza as features uma vez e publica a matriz em memória compartilhada; cada worker
+           a anexa uma única vez no inicializador do pool.
+        2. Referência: o mesmo ajuste do pipeline na tabela completa (ver '_niveis_referencia').
+           Cada reamostra é ajustada e estendida a todas as linhas pelo centroide mais próximo,
+           com os rótulos alinhados pela severidade do centroide.
+        3. Confiança da trilha = fração das reamostras que repetem o nível de referência.
+        4. ARI de cada reamostra contra a referência e entre pares de reamostras.
+    Saída: Dicionário {metodo: resumo} (também impresso); grava o CSV por trilha.
+    """
+    df = pd.read_csv(caminho_csv_entrada)
+    dados_cluster = df[COLUNAS_DIFICULDADE].dropna()
+
+    X_scaled = np.ascontiguousarray(StandardScaler().fit_transform(dados_cluster))
+    n = len(X_scaled)
+    tamanho_amostra = tamanho_amostra or n
+    nomes = rotulos_dificuldade(n_clusters)
+
+    resumo = {}
+    saida = df.loc[dados_cluster.index, ['trilha']].copy()
+
+    with compartilhar_arrays({'X': X_scaled}) as descritor:
+        with ProcessPoolExecutor(
+            max_workers=max_workers,
+            initializer=_inicializar_worker,
+            initargs=(descritor,)
+        ) as executor:
+
+            for metodo in metodos:
+                inicio = time.perf_counter()
+
+                referencia = _niveis_referencia(X_scaled, metodo, n_clusters)
+
+                niveis = np.stack(list(executor.map(
+                    _executar_reamostra,
+                    [metodo] * n_reamostras,
+                    [n_clusters] * n_reamostras,
+                    [tamanho_amostra] * n_reamostras,
+                    [semente + i for i in range(n_reamostras)],
+                    chunksize=max(1, n_reamostras // (4 * (max_workers or os.cpu_count() or 1)))
+                )))
+
+                confianca = (niveis == referencia[None, :]).mean(axis=0)
+
+                ari_referencia = np.array([adjusted_rand_score(referencia, rotulos) for rotulos in niveis])
+
+                gerador = np.random.default_rng(semente)
+                pares = gerador.integers(0, n_reamostras, size=(max_pares_ari, 2))
+                pares = pares[pares[:, 0] != pares[:, 1]]
+                ari_pares = np.array([adjusted_rand_score(niveis[i], niveis[j]) for i, j in pares])
+
+                saida[f'dificuldade_{metodo}'] = [nomes[nivel] for nivel in referencia]
+                saida[f'confianca_{metodo}'] = np.round(confianca, 3)
+
+                resumo[metodo] = {
+                    'n_reamostras': n_reamostras,
+                    'ari_referencia_media': round(float(ari_referencia.mean()), 3),
+                    'ari_referencia_p05': round(float(np.percentile(ari_referencia, 5)), 3),
+                    'ari_pares_media': round(float(ari_pares.mean()), 3) if len(ari_pares) else None,
+                    'confianca_media': round(float(confianca.mean()), 3),
+                    'trilhas_instaveis': int((confianca < 0.5).sum()),
+                    'tempo_s': round(time.perf_counter() - inicio, 2)
+                }
+
+                print(
+                    f"Estabilidade {metodo} ({n_reamostras} reamostras): "
+                    f"ARI médio vs. referência {resumo[metodo]['ari_referencia_media']:.3f}, "
+                    f"ARI médio entre reamostras {resumo[metodo]['ari_pares_media']}, "
+                    f"confiança média {resumo[metodo]['confianca_media']:.3f}, "
+                    f"{resumo[metodo]['trilhas_instaveis']} trilha(s) com confiança < 0.5."
+                )
+
+    saida.to_csv(caminho_csv_saida, index=False, encoding='utf-8')
+
+    return resumo
@@ -0,0 +1,248 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+
+import pandas as pd
+
+from src.descoberta_arquivos import descobrir_arquivos_gpx
+from src.processamento_lote import processar_pasta_gpx
+from src.telemetria import Telemetria
+
+
+PADRAO_PARCIAL = re.compile(r'^parcial_(\d+)_de_(\d+)\.csv$')
+
+
+# ------------------------------------------------------------
+# ATRIBUIÇÃO DETERMINÍSTICA DE SHARDS
+# ------------------------------------------------------------
+
+def interpretar_shard(texto: str):
+    """
+    Objetivo: Converter a notação 'i/N' da linha de comando.
+    Entrada: String como '3/16' (shards numerados de 0 a N-1).
+    Saída: Tupla (i, N). Lança ValueError se o formato ou o intervalo forem inválidos.
+    """
+    try:
+        indice, total = (int(parte) for parte in texto.split('/'))
+    except ValueError:
+        raise ValueError(f"Shard inválido '{texto}': use o formato i/N.")
+
+    if total < 1 or not 0 <= indice < total:
+        raise ValueError(f"Shard inválido '{texto}': exige 0 <= i < N.")
+
+    return indice, total
+
+
+def indice_shard(caminho_relativo: str, n_shards: int) -> int:
+    """
+    Objetivo: Atribuir um arquivo a um shard de forma estável entre máquinas e execuções.
+    Entrada: Caminho relativo à raiz do acervo e o número total de shards.
+    Processamento:
+        1. Normaliza o separador para '/' (mesmo resultado em Windows e Linux).
+        2. Aplica BLAKE2b (64 bits) ao caminho; o 'hash()' do Python não serve, pois é
+           aleatorizado por processo.
+    Saída: Inteiro entre 0 e N-1.
+    """
+    caminho = caminho_relativo.replace('\\', '/')
+    resumo = hashlib.blake2b(caminho.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(resumo, 'big') % n_shards
+
+
+def filtrar_shard(arquivos: list, indice: int, n_shards: int) -> list:
+    """
+    Objetivo: Selecionar, da lista de trabalho, apenas os arquivos do shard 'indice'.
+    Entrada: Lista de ArquivoDescoberto (ou caminhos relativos), índice e total de shards.
+    Saída: Sublista preservando a ordem original.
+    """
+    return [
+        arquivo for arquivo in arquivos
+        if indice_shard(
+            arquivo if isinstance(arquivo, str) else arquivo.caminho_relativo,
+            n_shards
+        ) == indice
+    ]
+
+
+def caminho_parcial(pasta_parciais: str, indice: int, n_shards: int) -> str:
+    return os.path.join(pasta_parciais, f"parcial_{indice:05d}_de_{n_shards:05d}.csv")
+
+
+# ------------------------------------------------------------
+# PROCESSAMENTO DE UM SHARD
+# ------------------------------------------------------------
+
+def processar_shard(
+    caminho_pasta_gpx: str,
+    pasta_parciais: str,
+    indice: int,
+    n_shards: int,
+    recursivo: bool = True,
+    telemetria: Telemetria = None
+) -> str:
+    """
+    Objetivo: Processar a fatia do acervo que cabe a este nó.
+    Entrada: Pasta GPX compartilhada, pasta de parciais, índice do shard, total de shards e
+             coletor de telemetria opcional (cada nó grava o seu próprio trace).
+    Processamento:
+        1. Descobre a lista de trabalho completa (mesma em todos os nós) e filtra o shard.
+        2. Executa 'processar_pasta_gpx' apenas sobre os arquivos do shard.
+        3. Grava o CSV parcial e seu '.json' de metadados em arquivos temporários e os
+           renomeia no final, de modo que um parcial visível está sempre completo.
+    Saída: Caminho do CSV parcial gravado.
+    """
+    os.makedirs(pasta_parciais, exist_ok=True)
+
+    arquivos = filtrar_shard(
+        descobrir_arquivos_gpx(caminho_pasta_gpx, recursivo=recursivo),
+        indice,
+        n_shards
+    )
+
+    print(f"Shard {indice}/{n_shards}: {len(arquivos)} arquivo(s).")
+
+    df = processar_pasta_gpx(caminho_pasta_gpx, telemetria, arquivos=arquivos)
+
+    destino = caminho_parcial(pasta_parciais, indice, n_shards)
+    metadados = {
+        'shard': indice,
+        'n_shards': n_shards,
+        'n_arquivos': len(arquivos),
+        'n_trilhas': len(df)
+    }
+
+    df.to_csv(destino + '.tmp', index=False, encoding='utf-8')
+    with open(destino + '.json.tmp', 'w', encoding='utf-8') as saida:
+        json.dump(metadados, saida, ensure_ascii=False, indent=2)
+
+    os.replace(destino + '.json.tmp', destino + '.json')
+    os.replace(destino + '.tmp', destino)
+
+    print(f"Parcial salvo em: {destino}")
+    return destino
+
+
+# ------------------------------------------------------------
+# MESCLAGEM
+# ------------------------------------------------------------
+
+def mesclar_parciais(pasta_parciais: str, caminho_csv_saida: str, n_shards: int = None) -> pd.DataFrame:
+    """
+    Objetivo: Combinar os parciais de todos os nós na tabela canônica de análise.
+    Entrada:
+        - pasta_parciais: Pasta com os 'parcial_i_de_N.csv'.
+        - caminho_csv_saida: Destino da tabela consolidada (ex.: analise_trilhas.csv).
+        - n_shards: Total esperado (padrão: inferido dos nomes dos parciais).
+    Processamento:
+        1. Valida que todos os parciais usam o mesmo N, que nenhum shard de 0 a N-1 está faltando
+           e que cada parcial confere com seu '.json' de metadados.
+        2. Concatena na ordem dos shards e remove trilhas duplicadas (mantém a primeira ocorrência).
+        3. Ordena pelo nome da trilha, tornando a saída independente da ordem de chegada.
+    Saída: pd.DataFrame consolidado (também gravado em 'caminho_csv_saida').
+    """
+    encontrados = {}
+
+    for caminho in glob.glob(os.path.join(pasta_parciais, 'parcial_*_de_*.csv')):
+        correspondencia = PADRAO_PARCIAL.match(os.path.basename(caminho))
+        if correspondencia:
+            indice, total = int(correspondencia.group(1)), int(correspondencia.group(2))
+            encontrados.setdefault(total, {})[indice] = caminho
+
+    if not encontrados:
+        raise ValueError(f"Nenhum parcial encontrado em {pasta_parciais}.")
+
+    if n_shards is None:
+        if len(encontrados) > 1:
+            raise ValueError(f"Parciais com totais de shards diferentes: {sorted(encontrados)}.")
+        n_shards = next(iter(encontrados))
+
+    parciais = encontrados.get(n_shards, {})
+    faltando = sorted(set(range(n_shards)) - set(parciais))
+
+    if faltando:
+        raise ValueError(f"Shards ausentes (de {n_shards}): {faltando}")
+
+    tabelas = []
+    for indice in range(n_shards):
+        caminho = parciais[indice]
+
+        if not os.path.exists(caminho + '.json'):
+            raise ValueError(f"Parcial sem metadados (incompleto?): {caminho}")
+
+        with open(caminho + '.json', encoding='utf-8') as entrada:
+            metadados = json.load(entrada)
+
+        try:
+            tabela = pd.read_csv(caminho)
+        except pd.errors.EmptyDataError:
+            tabela = pd.DataFrame()
+
+        if len(tabela) != metadados['n_trilhas']:
+            raise ValueError(
+                f"Parcial {caminho} com {len(tabela)} linhas; esperado {metadados['n_trilhas']}."
+            )
+
+        if not tabela.empty:
+            tabelas.append(tabela)
+
+    df = pd.concat(tabelas, ignore_index=True) if tabelas else pd.DataFrame()
+
+    if not df.empty:
+        duplicadas = int(df['trilha'].duplicated().sum())
+        if duplicadas:
+            print(f"{duplicadas} trilha(s) duplicada(s) removida(s) na mesclagem.")
+
+        df = (
+            df.drop_duplicates(subset='trilha', keep='first')
+            .sort_values('trilha', kind='stable')
+            .reset_index(drop=True)
+        )
+
+    df.to_csv(caminho_csv_saida, index=False, encoding='utf-8')
+
+    print(f"{n_shards} parciais mesclados: {len(df)} trilhas em {caminho_csv_saida}")
+    return df
+
+
+# ------------------------------------------------------------
+# LINHA DE COMANDO
+# ------------------------------------------------------------
+
+def main(argumentos=None):
+    """
+    Uso:
+        python -m src.fragmentacao processar --shard 0/4 [--pasta dados/gpx] [--parciais ...] [--trace ...]
+        python -m src.fragmentacao mesclar [--parciais ...] [--saida dados/resultados/analise_trilhas.csv]
+    """
+    parser = argparse.ArgumentParser(description="Processamento do acervo GPX em shards.")
+    subcomandos = parser.add_subparsers(dest='comando', required=True)
+
+    processar = subcomandos.add_parser('processar', help="Processa o shard i/N deste nó.")
+    processar.add_argument('--shard', required=True, help="Shard no formato i/N (0 <= i < N).")
+    processar.add_argument('--pasta', default='dados/gpx')
+    processar.add_argument('--parciais', default='dados/resultados/parciais')
+    processar.add_argument('--trace', default=None, help="Trace JSON-lines da telemetria deste nó.")
+
+    mesclar = subcomandos.add_parser('mesclar', help="Mescla os parciais de todos os shards.")
+    mesclar.add_argument('--parciais', default='dados/resultados/parciais')
+    mesclar.add_argument('--saida', default='dados/resultados/analise_trilhas.csv')
+    mesclar.add_argument('--n-shards', type=int, default=None)
+
+    args = parser.parse_args(argumentos)
+
+    if args.comando == 'processar':
+        indice, total = interpretar_shard(args.shard)
+        telemetria = Telemetria(caminho_trace=args.trace) if args.trace else None
+        try:
+            processar_shard(args.pasta, args.parciais, indice, total, telemetria=telemetria)
+        finally:
+            if telemetria is not None:
+                telemetria.fechar()
+    else:
+        mesclar_parciais(args.parciais, args.saida, args.n_shards)
+
+
+if __name__ == "__main__":
+    main()
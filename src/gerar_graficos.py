@@ -1,10 +1,22 @@
+import hashlib
+import json
 import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
 import pandas as pd
 import matplotlib.pyplot as plt
-from sklearn.metrics import silhouette_score
-from sklearn.preprocessing import StandardScaler
+from matplotlib.collections import LineCollection
+from matplotlib.colors import ListedColormap, Normalize, to_rgba
 import seaborn as sns
 import numpy as np
+from seaborn.external import husl
+
+from src.clustering_dificuldade import carregar_metricas_clustering
+from src.densidade import densidade_binned, niveis_isoproporcao
+from src.niveis_detalhe import carregar_armazem_detalhe
+from src.telemetria import Telemetria, campos_memoria, medir_etapa, medir_rss_atual_mb
 
 # ============================================================
 # CONFIGURAÇÕES GLOBAIS DE QUALIDADE
@@ -28,31 +40,178 @@ OUT = "graficos_tcc"
 
 os.makedirs(OUT, exist_ok=True)
 
+CAT_ORDER = [
+    'Leve',
+    'Moderada',
+    'Pesada',
+    'Muito Pesada',
+    'Extrema'
+]
+
 # ============================================================
-# GERAR GRÁFICOS METODOLOGIA
+# PERFIS DE RENDERIZAÇÃO
 # ============================================================
 
-def gerar_graficos_metodologia(caminho_csv='dados/resultados/trilhas_kmeans.csv'):
+# 'rasterizar' converte as camadas densas (pontos, linhas de queda) em imagem dentro de
+# formatos vetoriais; 'dpi_3d' vale para a figura 3D, que acima de 'max_pontos_3d' trilhas passa a
+# desenhar pontos agregados por densidade. 'impressao' reproduz a saída original.
+PERFIS_RENDERIZACAO = {
+    'rascunho': {'dpi': 80, 'dpi_3d': 80, 'rasterizar': True, 'formato': 'png', 'max_pontos_3d': 2_000},
+    'tela': {'dpi': 150, 'dpi_3d': 150, 'rasterizar': True, 'formato': 'svg', 'max_pontos_3d': 10_000},
+    'impressao': {'dpi': 600, 'dpi_3d': 800, 'rasterizar': False, 'formato': 'png', 'max_pontos_3d': 20_000}
+}
 
-    df = pd.read_csv(caminho_csv)
+MANIFESTO = os.path.join(OUT, 'manifesto.json')
 
-    cat_order = [
-        'Leve',
-        'Moderada',
-        'Pesada',
-        'Muito Pesada',
-        'Extrema'
-    ]
 
-    df['dificuldade'] = pd.Categorical(
-        df['dificuldade'],
-        categories=cat_order,
-        ordered=True
+def resolver_perfil(perfil=None) -> dict:
+    """
+    Objetivo: Aceitar o nome de um perfil, um dicionário próprio ou None ('impressao').
+    """
+    if perfil is None:
+        return PERFIS_RENDERIZACAO['impressao']
+
+    if isinstance(perfil, dict):
+        return {**PERFIS_RENDERIZACAO['impressao'], **perfil}
+
+    if perfil not in PERFIS_RENDERIZACAO:
+        raise ValueError(f"Perfil de renderização inválido '{perfil}': use {tuple(PERFIS_RENDERIZACAO)}.")
+
+    return PERFIS_RENDERIZACAO[perfil]
+
+
+def caminho_figura(nome, perfil=None):
+    return os.path.join(OUT, f"{nome}.{resolver_perfil(perfil)['formato']}")
+
+
+def _salvar_figura(nome, perfil=None, chave_dpi='dpi'):
+    """
+    Objetivo: Gravar a figura atual conforme o perfil (dpi e formato) e fechá-la.
+    Saída: Caminho do arquivo gerado.
+    """
+    perfil = resolver_perfil(perfil)
+    caminho = caminho_figura(nome, perfil)
+
+    plt.savefig(
+        caminho,
+        dpi=perfil[chave_dpi],
+        format=perfil['formato'],
+        bbox_inches='tight'
     )
 
-    # ========================================================
-    # BOXPLOT INTENSIDADE
-    # ========================================================
+    plt.close()
+
+    return caminho
+
+# ============================================================
+# CARGA ÚNICA DOS DADOS
+# ============================================================
+
+def carregar_tabela_classificada(caminho_csv='dados/resultados/trilhas_kmeans.csv'):
+    """
+    Objetivo: Ler a tabela classificada e preparar a 'dificuldade' categórica ordenada.
+    Saída: pd.DataFrame pronto para todas as figuras.
+    """
+    df = pd.read_csv(caminho_csv)
+
+    if 'dificuldade' in df.columns:
+
+        df['dificuldade'] = pd.Categorical(
+            df['dificuldade'],
+            categories=CAT_ORDER,
+            ordered=True
+        )
+
+    return df
+
+
+def carregar_metricas_graficos(
+    caminho_csv='dados/resultados/trilhas_kmeans.csv',
+    caminho_hierarquico='dados/resultados/trilhas_hierarquico.csv',
+    caminho_dbscan='dados/resultados/trilhas_dbscan.csv'
+):
+    """
+    Objetivo: Métricas gravadas por cada clustering (JSON ao lado do CSV do método).
+    Saída: Dicionário {metodo: métricas ou None}.
+    """
+    return {
+        'kmeans': carregar_metricas_clustering(caminho_csv),
+        'hierarquico': carregar_metricas_clustering(caminho_hierarquico),
+        'dbscan': carregar_metricas_clustering(caminho_dbscan)
+    }
+
+
+def _silhouettes(metricas):
+    return {
+        metodo: (metricas.get(metodo) or {}).get('silhouette')
+        for metodo in ('kmeans', 'hierarquico')
+    }
+
+
+def _assinatura_arquivo(caminho):
+    """
+    Objetivo: Tamanho e mtime do arquivo (entrada do manifesto quando o conteúdo é lido no worker).
+    """
+    try:
+        estado = os.stat(caminho)
+    except FileNotFoundError:
+        return None
+
+    return {'tamanho_bytes': estado.st_size, 'mtime_ns': estado.st_mtime_ns}
+
+
+def carregar_dados_graficos(
+    caminho_csv='dados/resultados/trilhas_kmeans.csv',
+    caminho_dbscan='dados/resultados/trilhas_dbscan.csv',
+    caminho_hierarquico='dados/resultados/trilhas_hierarquico.csv',
+    caminho_detalhe='dados/resultados/trilhas_detalhe'
+):
+    """
+    Objetivo: Reunir, em uma única leitura, tudo o que as figuras consomem.
+    Saída: Dicionário {'kmeans': DataFrame, 'dbscan': DataFrame ou None, 'caminho_dbscan': str,
+           'metricas': {metodo: métricas}, 'silhouette': {metodo: score}, 'caminho_detalhe': str,
+           'detalhe': assinatura do armazém de níveis de detalhe ou None}.
+           O armazém em si só é aberto pelo worker do mapa.
+    """
+    try:
+        df_dbscan = pd.read_csv(caminho_dbscan)
+    except FileNotFoundError:
+        df_dbscan = None
+
+    metricas = carregar_metricas_graficos(caminho_csv, caminho_hierarquico, caminho_dbscan)
+
+    return {
+        'kmeans': carregar_tabela_classificada(caminho_csv),
+        'dbscan': df_dbscan,
+        'caminho_dbscan': caminho_dbscan,
+        'metricas': metricas,
+        'silhouette': _silhouettes(metricas),
+        'caminho_detalhe': caminho_detalhe,
+        'detalhe': _assinatura_arquivo(caminho_detalhe + '.npz')
+    }
+
+
+def _scores_silhouette(dados):
+    """
+    Objetivo: Silhouette do K-Means e do Hierárquico lidos das métricas do clustering.
+    Saída: Lista [kmeans, hierarquico] ou None (com aviso) se algum método não tiver métricas.
+    """
+    silhouette = dados.get('silhouette') or {}
+    scores = [silhouette.get('kmeans'), silhouette.get('hierarquico')]
+
+    if None in scores:
+        print("Erro: Métricas de Silhouette do K-Means/Hierárquico não encontradas (execute o clustering).")
+        return None
+
+    return scores
+
+# ============================================================
+# FIGURAS DA METODOLOGIA
+# ============================================================
+
+def figura_boxplot_intensidade(dados, perfil=None):
+
+    df = dados['kmeans']
 
     plt.figure(figsize=(14, 8))
 
@@ -81,17 +240,12 @@ def gerar_graficos_metodologia(caminho_csv='dados/resultados/trilhas_kmeans.csv'
 
     plt.tight_layout()
 
-    plt.savefig(
-        'graficos_tcc/boxplot_intensidade_dificuldade.png',
-        dpi=600,
-        bbox_inches='tight'
-    )
+    _salvar_figura('boxplot_intensidade_dificuldade', perfil)
 
-    plt.close()
 
-    # ========================================================
-    # HEATMAP
-    # ========================================================
+def figura_heatmap_correlacao(dados, perfil=None):
+
+    df = dados['kmeans']
 
     plt.figure(figsize=(12, 9))
 
@@ -129,13 +283,15 @@ def gerar_graficos_metodologia(caminho_csv='dados/resultados/trilhas_kmeans.csv'
 
     plt.tight_layout()
 
-    plt.savefig(
-        'graficos_tcc/heatmap_correlacao.png',
-        dpi=600,
-        bbox_inches='tight'
-    )
+    _salvar_figura('heatmap_correlacao', perfil)
 
-    plt.close()
+
+def gerar_graficos_metodologia(caminho_csv='dados/resultados/trilhas_kmeans.csv'):
+
+    dados = {'kmeans': carregar_tabela_classificada(caminho_csv)}
+
+    figura_boxplot_intensidade(dados)
+    figura_heatmap_correlacao(dados)
 
     print("Gráficos da metodologia gerados.")
 
@@ -144,16 +300,17 @@ def gerar_graficos_metodologia(caminho_csv='dados/resultados/trilhas_kmeans.csv'
 # VALIDAÇÃO
 # ============================================================
 
-def gerar_graficos_validacao(
-    caminho_dbscan='dados/resultados/trilhas_dbscan.csv'
-):
+def figura_silhouette_comparacao(dados, perfil=None):
 
     # ========================================================
     # SILHOUETTE
     # ========================================================
 
+    scores = _scores_silhouette(dados)
+    if scores is None:
+        return
+
     modelos = ['K-Means', 'Hierárquico']
-    scores = [0.442, 0.405]
 
     plt.figure(figsize=(10, 6))
 
@@ -165,7 +322,7 @@ def gerar_graficos_validacao(
 
     plt.ylabel('Silhouette Score')
 
-    plt.ylim(0, 0.55)
+    plt.ylim(min(0, min(scores)), max(0.55, max(scores) * 1.15))
 
     plt.grid(
         axis='y',
@@ -189,99 +346,176 @@ def gerar_graficos_validacao(
 
     plt.tight_layout()
 
-    plt.savefig(
-        'graficos_tcc/silhouette_comparacao.png',
-        dpi=600,
-        bbox_inches='tight'
-    )
+    _salvar_figura('silhouette_comparacao', perfil)
 
-    plt.close()
+
+def figura_dbscan_outliers(dados, perfil=None):
 
     # ========================================================
     # DBSCAN
     # ========================================================
 
-    try:
+    if dados.get('dbscan') is None:
+        print(f"Erro: Arquivo {dados.get('caminho_dbscan')} não encontrado.")
+        return
 
-        df_dbscan = pd.read_csv(caminho_dbscan)
+    perfil = resolver_perfil(perfil)
+    df_dbscan = dados['dbscan'].copy()
 
-        df_dbscan['Status'] = df_dbscan['cluster'].apply(
-            lambda x: 'Outlier'
-            if x == -1
-            else 'Padrão'
-        )
+    df_dbscan['Status'] = df_dbscan['cluster'].apply(
+        lambda x: 'Outlier'
+        if x == -1
+        else 'Padrão'
+    )
 
-        paleta = {
-            'Outlier': '#d73027',
-            'Padrão': '#74add1'
-        }
+    paleta = {
+        'Outlier': '#d73027',
+        'Padrão': '#74add1'
+    }
 
-        plt.figure(figsize=(14, 8))
-
-        sns.scatterplot(
-            data=df_dbscan,
-            x='intensidade_diaria',
-            y='indice_concentracao_esforco',
-            hue='Status',
-            palette=paleta,
-            s=120,
-            alpha=0.85,
-            edgecolor='black',
-            linewidth=1.2
-        )
+    plt.figure(figsize=(14, 8))
 
-        plt.xlabel('Intensidade Diária')
-        plt.ylabel('IC')
+    sns.scatterplot(
+        data=df_dbscan,
+        x='intensidade_diaria',
+        y='indice_concentracao_esforco',
+        hue='Status',
+        palette=paleta,
+        s=120,
+        alpha=0.85,
+        edgecolor='black',
+        linewidth=1.2,
+        rasterized=perfil['rasterizar']
+    )
 
-        plt.legend(title='DBSCAN')
+    plt.xlabel('Intensidade Diária')
+    plt.ylabel('IC')
 
-        plt.grid(
-            True,
-            linestyle='--',
-            alpha=0.6
-        )
+    plt.legend(title='DBSCAN')
 
-        plt.tight_layout()
+    plt.grid(
+        True,
+        linestyle='--',
+        alpha=0.6
+    )
 
-        plt.savefig(
-            'graficos_tcc/dbscan_outliers.png',
-            dpi=600,
-            bbox_inches='tight'
-        )
+    plt.tight_layout()
 
-        plt.close()
+    _salvar_figura('dbscan_outliers', perfil)
 
-        print("Gráficos de validação gerados.")
 
+def gerar_graficos_validacao(
+    caminho_dbscan='dados/resultados/trilhas_dbscan.csv'
+):
+
+    try:
+        df_dbscan = pd.read_csv(caminho_dbscan)
     except FileNotFoundError:
-        print(f"Erro: Arquivo {caminho_dbscan} não encontrado.")
+        df_dbscan = None
+
+    dados = {
+        'dbscan': df_dbscan,
+        'caminho_dbscan': caminho_dbscan,
+        'silhouette': _silhouettes(carregar_metricas_graficos(caminho_dbscan=caminho_dbscan))
+    }
+
+    figura_silhouette_comparacao(dados)
+    figura_dbscan_outliers(dados)
+
+    if df_dbscan is not None:
+        print("Gráficos de validação gerados.")
 
 
 # ============================================================
-# DISCUSSÃO
+# DENSIDADE (KDE EM GRADE)
 # ============================================================
 
-def gerar_graficos_discussao_avancados(
-    caminho_csv='dados/resultados/trilhas_kmeans.csv'
+def mapa_cor_sequencial(cor):
+    """
+    Objetivo: Colormap claro -> escuro derivado de uma cor (mesma rampa HUSL do seaborn).
+    """
+    r, g, b, _ = to_rgba(cor)
+    matiz, saturacao, _ = husl.rgb_to_husl(r, g, b)
+
+    xx = np.linspace(-1, 1, int(1.15 * 256))[:256]
+    rampa = np.zeros((256, 3))
+    rampa[:, 0] = matiz
+    rampa[:, 1] = saturacao * np.cos(xx)
+    rampa[:, 2] = np.linspace(35, 80, 256)
+
+    cores = np.clip([husl.husl_to_rgb(*hsl) for hsl in rampa], 0, 1)
+    return ListedColormap(cores[::-1])
+
+
+def desenhar_densidade(
+    ax,
+    df,
+    x,
+    y,
+    hue,
+    palette='viridis',
+    fill=True,
+    niveis=10,
+    limiar=0.05,
+    tamanho_grade=200,
+    **estilo
 ):
+    """
+    Objetivo: Substituto do 'sns.kdeplot(hue=...)' bivariado com custo quase constante.
+    Entrada:
+        - ax, df, x, y, hue, palette: Como no seaborn (hue numérico usa o colormap contínuo).
+        - fill: Áreas preenchidas (contourf) ou apenas contornos (contour).
+        - niveis / limiar: Contornos de isoproporção, como 'levels' e 'thresh' do seaborn.
+        - tamanho_grade: Nós por eixo da grade de densidade.
+        - estilo: Repassado a contourf/contour (alpha, rasterized, linewidths...).
+    Processamento:
+        1. Uma densidade por grupo via 'densidade_binned' (binning + FFT), ponderada pela
+           fração do grupo (normalização comum).
+        2. Níveis de isoproporção comuns a todos os grupos.
+        3. Preenchimento com a rampa sequencial da cor de cada grupo.
+    """
+    dados = df[[x, y, hue]].dropna()
+    grupos = np.sort(dados[hue].unique())
+
+    if pd.api.types.is_numeric_dtype(dados[hue]):
+        mapa = sns.color_palette(palette, as_cmap=True)
+        normalizar = Normalize(grupos.min(), grupos.max())
+        cores = {grupo: mapa(normalizar(grupo)) for grupo in grupos}
+    else:
+        cores = dict(zip(grupos, sns.color_palette(palette, len(grupos))))
+
+    densidades = {}
+    for grupo, subset in dados.groupby(hue):
+        resultado = densidade_binned(subset[x], subset[y], tamanho_grade)
+
+        if resultado is not None:
+            nos_x, nos_y, densidade = resultado
+            densidades[grupo] = (nos_x, nos_y, densidade * len(subset) / len(dados))
+
+    if not densidades:
+        return
+
+    niveis_desenho = niveis_isoproporcao(
+        [densidade for _, _, densidade in densidades.values()],
+        np.linspace(limiar, 1, niveis)
+    )
 
-    df = pd.read_csv(caminho_csv)
+    for grupo, (nos_x, nos_y, densidade) in densidades.items():
 
-    cat_order = [
-        'Leve',
-        'Moderada',
-        'Pesada',
-        'Muito Pesada',
-        'Extrema'
-    ]
+        if fill:
+            ax.contourf(nos_x, nos_y, densidade, levels=niveis_desenho, cmap=mapa_cor_sequencial(cores[grupo]), **estilo)
+        else:
+            ax.contour(nos_x, nos_y, densidade, levels=niveis_desenho, colors=[cores[grupo]], **estilo)
 
-    if 'dificuldade' in df.columns:
 
-        df['dificuldade'] = pd.Categorical(
-            df['dificuldade'],
-            categories=cat_order,
-            ordered=True
-        )
+# ============================================================
+# DISCUSSÃO
+# ============================================================
+
+def figura_dispersao_kde(dados, perfil=None):
+
+    perfil = resolver_perfil(perfil)
+    df = dados['kmeans']
 
     # ========================================================
     # KDE + SCATTER
@@ -289,15 +523,16 @@ def gerar_graficos_discussao_avancados(
 
     plt.figure(figsize=(16, 9))
 
-    sns.kdeplot(
-        data=df,
+    desenhar_densidade(
+        plt.gca(),
+        df,
         x='intensidade_diaria',
         y='indice_concentracao_esforco',
         hue='cluster',
         fill=True,
         alpha=0.15,
         palette='viridis',
-        legend=False
+        rasterized=perfil['rasterizar']
     )
 
     sns.scatterplot(
@@ -310,7 +545,8 @@ def gerar_graficos_discussao_avancados(
         sizes=(80, 450),
         alpha=0.9,
         edgecolor='black',
-        linewidth=1
+        linewidth=1,
+        rasterized=perfil['rasterizar']
     )
 
     plt.xlabel('Intensidade Diária (ID)')
@@ -324,13 +560,13 @@ def gerar_graficos_discussao_avancados(
 
     plt.tight_layout()
 
-    plt.savefig(
-        'graficos_tcc/figura_x_dispersao_kde.png',
-        dpi=600,
-        bbox_inches='tight'
-    )
+    _salvar_figura('figura_x_dispersao_kde', perfil)
 
-    plt.close()
+
+def figura_boxplot_stripplot(dados, perfil=None):
+
+    perfil = resolver_perfil(perfil)
+    df = dados['kmeans']
 
     # ========================================================
     # BOXPLOT + STRIPPLOT
@@ -354,7 +590,8 @@ def gerar_graficos_discussao_avancados(
         color='black',
         alpha=0.7,
         jitter=True,
-        size=8
+        size=8,
+        rasterized=perfil['rasterizar']
     )
 
     plt.xlabel('Nível de Dificuldade')
@@ -362,20 +599,20 @@ def gerar_graficos_discussao_avancados(
 
     plt.tight_layout()
 
-    plt.savefig(
-        'graficos_tcc/figura_y_boxplot_stripplot.png',
-        dpi=600,
-        bbox_inches='tight'
-    )
+    _salvar_figura('figura_y_boxplot_stripplot', perfil)
 
-    plt.close()
+
+def figura_silhouette_horizontal(dados, perfil=None):
 
     # ========================================================
     # SILHOUETTE HORIZONTAL
     # ========================================================
 
+    scores = _scores_silhouette(dados)
+    if scores is None:
+        return
+
     modelos = ['K-Means\n(Escolhido)', 'Hierárquico']
-    scores = [0.442, 0.405]
 
     plt.figure(figsize=(10, 5))
 
@@ -397,7 +634,7 @@ def gerar_graficos_discussao_avancados(
 
     plt.ylabel('')
 
-    plt.xlim(0, 0.55)
+    plt.xlim(min(0, min(scores)), max(0.55, max(scores) * 1.15))
 
     plt.legend(loc='lower right')
 
@@ -418,13 +655,21 @@ def gerar_graficos_discussao_avancados(
 
     plt.tight_layout()
 
-    plt.savefig(
-        'graficos_tcc/figura_z_silhouette_horizontal.png',
-        dpi=600,
-        bbox_inches='tight'
-    )
+    _salvar_figura('figura_z_silhouette_horizontal', perfil)
 
-    plt.close()
+
+def gerar_graficos_discussao_avancados(
+    caminho_csv='dados/resultados/trilhas_kmeans.csv'
+):
+
+    dados = {
+        'kmeans': carregar_tabela_classificada(caminho_csv),
+        'silhouette': _silhouettes(carregar_metricas_graficos(caminho_csv))
+    }
+
+    figura_dispersao_kde(dados)
+    figura_boxplot_stripplot(dados)
+    figura_silhouette_horizontal(dados)
 
     print("Figuras da discussão geradas.")
 
@@ -433,29 +678,52 @@ def gerar_graficos_discussao_avancados(
 # GRÁFICO 3D
 # ============================================================
 
-def gerar_grafico_3d_kmeans(
-    caminho_csv='dados/resultados/trilhas_kmeans.csv'
-):
+def agregar_pontos_3d(pontos, limite, limites_eixos):
+    """
+    Objetivo: Reduzir uma nuvem 3D a no máximo 'limite' pontos preservando a distribuição.
+    Entrada:
+        - pontos: Array (n, 3).
+        - limite: Número máximo de pontos desenhados.
+        - limites_eixos: Array (2, 3) com mínimo e máximo de cada eixo na tabela inteira
+          (a mesma grade vale para todas as categorias).
+    Processamento: Agrupa os pontos em uma grade 3D regular, começando fina e reduzindo a
+                   resolução pela metade até caber no limite; cada célula ocupada vira um
+                   ponto na média de seus membros. Pontos isolados (outliers) continuam visíveis.
+    Saída: Tupla (pontos agregados (m, 3), contagem de trilhas por ponto).
+    """
+    if len(pontos) <= limite:
+        return pontos, np.ones(len(pontos), dtype=np.int64)
 
-    from mpl_toolkits.mplot3d import Axes3D
+    minimo, maximo = limites_eixos
+    amplitude = np.where(maximo > minimo, maximo - minimo, 1.0)
+    normalizados = (pontos - minimo) / amplitude
 
-    df = pd.read_csv(caminho_csv)
+    divisoes = 512
+    while True:
+        celulas = np.minimum((normalizados * divisoes).astype(np.int64), divisoes - 1)
+        chaves = (celulas[:, 0] * divisoes + celulas[:, 1]) * divisoes + celulas[:, 2]
+        _, inverso, contagens = np.unique(chaves, return_inverse=True, return_counts=True)
 
-    cat_order = [
-        'Leve',
-        'Moderada',
-        'Pesada',
-        'Muito Pesada',
-        'Extrema'
-    ]
+        if len(contagens) <= limite or divisoes <= 2:
+            break
 
-    if 'dificuldade' in df.columns:
+        divisoes //= 2
+
+    medias = np.column_stack([
+        np.bincount(inverso, weights=pontos[:, eixo]) / contagens
+        for eixo in range(3)
+    ])
+
+    return medias, contagens
 
-        df['dificuldade'] = pd.Categorical(
-            df['dificuldade'],
-            categories=cat_order,
-            ordered=True
-        )
+
+def figura_3d_kmeans(dados, perfil=None):
+
+    from mpl_toolkits.mplot3d import Axes3D
+    from mpl_toolkits.mplot3d.art3d import Line3DCollection
+
+    perfil = resolver_perfil(perfil)
+    df = dados['kmeans']
 
     color_map = {
         'Leve': '#2ca02c',
@@ -472,41 +740,49 @@ def gerar_grafico_3d_kmeans(
         projection='3d'
     )
 
-    for cat in cat_order:
+    colunas_3d = ['intensidade_diaria', 'indice_concentracao_esforco', 'dias_trilha']
+    limites_eixos = df[colunas_3d].agg(['min', 'max']).to_numpy()
+    agregar = len(df) > perfil['max_pontos_3d']
 
-        subset = df[df['dificuldade'] == cat]
+    for cat in CAT_ORDER:
+
+        subset = df.loc[df['dificuldade'] == cat, colunas_3d].dropna().to_numpy(dtype=np.float64)
 
         color = color_map[cat]
 
+        if agregar:
+            limite = max(1, int(perfil['max_pontos_3d'] * len(subset) / len(df)))
+            subset, contagens = agregar_pontos_3d(subset, limite, limites_eixos)
+            tamanhos = 180 * (1 + np.log10(contagens))
+        else:
+            tamanhos = 180
+
 
         ax.scatter(
-            subset['intensidade_diaria'],
-            subset['indice_concentracao_esforco'],
-            subset['dias_trilha'],
-            s=180,
+            subset[:, 0],
+            subset[:, 1],
+            subset[:, 2],
+            s=tamanhos,
             label=cat,
             alpha=0.95,
             edgecolors='black',
             linewidths=1.5,
-            color=color
+            color=color,
+            rasterized=perfil['rasterizar']
         )
 
-        for _, row in subset.iterrows():
-
-            ax.plot(
-                [row['intensidade_diaria'],
-                 row['intensidade_diaria']],
+        # Linhas de queda: um único artista por categoria
+        base = subset.copy()
+        base[:, 2] = 0
 
-                [row['indice_concentracao_esforco'],
-                 row['indice_concentracao_esforco']],
-
-                [0, row['dias_trilha']],
-
-                linestyle='--',
-                alpha=0.45,
-                color=color,
-                linewidth=2
-            )
+        ax.add_collection3d(Line3DCollection(
+            np.stack([base, subset], axis=1),
+            linestyles='--',
+            alpha=0.45,
+            colors=color,
+            linewidths=2,
+            rasterized=perfil['rasterizar']
+        ))
 
 
     ax.set_xlabel(
@@ -549,28 +825,311 @@ def gerar_grafico_3d_kmeans(
 
 
 
-    plt.savefig(
-        'graficos_tcc/kmeans_3d_ultra_hd.png',
-        dpi=800,
-        bbox_inches='tight'
+    _salvar_figura('kmeans_3d_ultra_hd', perfil, chave_dpi='dpi_3d')
+
+
+def gerar_grafico_3d_kmeans(
+    caminho_csv='dados/resultados/trilhas_kmeans.csv'
+):
+
+    figura_3d_kmeans({'kmeans': carregar_tabela_classificada(caminho_csv)})
+
+# ============================================================
+# MAPA DO ACERVO (NÍVEIS DE DETALHE)
+# ============================================================
+
+def figura_mapa_trilhas(dados, perfil=None, janela=None):
+    """
+    Objetivo: Mapa de visão geral com todas as trilhas visíveis, coloridas pela dificuldade.
+    Entrada: Dados das figuras, perfil e janela opcional (lat_min, lat_max, lon_min, lon_max);
+             sem janela, usa 'dados["janela_mapa"]' ou a extensão do acervo.
+    Processamento:
+        1. Escolhe o nível de detalhe cujo erro cabe em um pixel na largura final da figura.
+        2. Consulta no índice de tiles só as trilhas que cruzam a janela.
+        3. Desenha um único LineCollection por classe de dificuldade.
+    """
+    perfil = resolver_perfil(perfil)
+
+    if dados.get('detalhe') is None:
+        print("Erro: Armazém de níveis de detalhe não encontrado (execute o processamento GPX).")
+        return
+
+    armazem = carregar_armazem_detalhe(dados['caminho_detalhe'])
+    if len(armazem) == 0:
+        print("Erro: Armazém de níveis de detalhe vazio.")
+        return
+
+    color_map = {
+        'Leve': '#2ca02c',
+        'Moderada': '#1f77b4',
+        'Pesada': '#ff7f00',
+        'Muito Pesada': '#d62728',
+        'Extrema': '#9467bd',
+        'Sem classe': '#7f7f7f'
+    }
+
+    lat_min, lat_max, lon_min, lon_max = janela or dados.get('janela_mapa') or armazem.extensao()
+    margem_lat = max(lat_max - lat_min, 0.01) * 0.02
+    margem_lon = max(lon_max - lon_min, 0.01) * 0.02
+    janela = (lat_min - margem_lat, lat_max + margem_lat, lon_min - margem_lon, lon_max + margem_lon)
+
+    aspecto = 1 / np.cos(np.radians((janela[0] + janela[1]) / 2))
+    largura_pol = 14
+    altura_pol = float(np.clip(
+        largura_pol * aspecto * (janela[1] - janela[0]) / (janela[3] - janela[2]),
+        4,
+        20
+    ))
+
+    nivel = armazem.escolher_nivel(janela, largura_pol * perfil['dpi'])
+    ids, segmentos = armazem.consultar(janela, nivel)
+
+    df = dados['kmeans']
+    dificuldade = dict(zip(df['trilha'], df['dificuldade'].astype(str)))
+    rotulos = np.array([dificuldade.get(armazem.nomes[i], 'Sem classe') for i in ids])
+    rotulos[~np.isin(rotulos, list(color_map))] = 'Sem classe'
+
+    fig, ax = plt.subplots(figsize=(largura_pol, altura_pol))
+
+    for cat in CAT_ORDER + ['Sem classe']:
+
+        membros = np.flatnonzero(rotulos == cat)
+        if len(membros) == 0:
+            continue
+
+        ax.add_collection(LineCollection(
+            [segmentos[i] for i in membros],
+            colors=color_map[cat],
+            linewidths=0.8,
+            alpha=0.8,
+            label=f"{cat} ({len(membros)})",
+            rasterized=perfil['rasterizar']
+        ))
+
+    ax.set_xlim(janela[2], janela[3])
+    ax.set_ylim(janela[0], janela[1])
+    ax.set_aspect(aspecto)
+
+    ax.set_xlabel('Longitude')
+    ax.set_ylabel('Latitude')
+    ax.set_title(
+        f"Trilhas do acervo ({len(ids)} na janela, tolerância {armazem.tolerancias_m[nivel]:.0f} m)",
+        fontsize=14
     )
 
-    plt.close()
+    ax.legend(
+        title='Dificuldade',
+        loc='upper left',
+        bbox_to_anchor=(1.02, 1),
+        frameon=True
+    )
+
+    plt.tight_layout()
+
+    _salvar_figura('mapa_trilhas', perfil)
 
 # ============================================================
-# MAIN
+# REGISTRO DE FIGURAS E RENDERIZAÇÃO PARALELA
 # ============================================================
 
-def main():
+FIGURAS = {
+    'boxplot_intensidade_dificuldade': figura_boxplot_intensidade,
+    'heatmap_correlacao': figura_heatmap_correlacao,
+    'silhouette_comparacao': figura_silhouette_comparacao,
+    'dbscan_outliers': figura_dbscan_outliers,
+    'figura_x_dispersao_kde': figura_dispersao_kde,
+    'figura_y_boxplot_stripplot': figura_boxplot_stripplot,
+    'figura_z_silhouette_horizontal': figura_silhouette_horizontal,
+    'kmeans_3d_ultra_hd': figura_3d_kmeans,
+    'mapa_trilhas': figura_mapa_trilhas
+}
+
+# Entradas de 'carregar_dados_graficos' consumidas por cada figura (base do hash do manifesto)
+ENTRADAS_FIGURAS = {
+    'boxplot_intensidade_dificuldade': ('kmeans',),
+    'heatmap_correlacao': ('kmeans',),
+    'silhouette_comparacao': ('silhouette',),
+    'dbscan_outliers': ('dbscan',),
+    'figura_x_dispersao_kde': ('kmeans',),
+    'figura_y_boxplot_stripplot': ('kmeans',),
+    'figura_z_silhouette_horizontal': ('silhouette',),
+    'kmeans_3d_ultra_hd': ('kmeans',),
+    'mapa_trilhas': ('kmeans', 'detalhe', 'janela_mapa')
+}
+
+# Dados recebidos uma única vez por worker (ver '_inicializar_worker')
+_DADOS_WORKER = None
+
+
+def hash_entradas(dados, nome):
+    """
+    Objetivo: Resumo (SHA-256) dos dados que alimentam a figura.
+    Processamento: Combina, para cada entrada, o nome das colunas e o hash de linha do pandas
+                   (tabelas) ou o JSON ordenado (métricas).
+    Saída: String hexadecimal.
+    """
+    resumo = hashlib.sha256()
+
+    for chave in ENTRADAS_FIGURAS.get(nome, ()):
+        tabela = dados.get(chave)
+        resumo.update(chave.encode())
+
+        if tabela is None:
+            resumo.update(b'ausente')
+            continue
+
+        if not isinstance(tabela, pd.DataFrame):
+            resumo.update(json.dumps(tabela, sort_keys=True, default=str).encode())
+            continue
+
+        resumo.update('|'.join(map(str, tabela.columns)).encode())
+        resumo.update(pd.util.hash_pandas_object(tabela, index=False).values.tobytes())
+
+    return resumo.hexdigest()
+
+
+def carregar_manifesto(caminho=MANIFESTO):
+    try:
+        with open(caminho, 'r', encoding='utf-8') as arquivo:
+            return json.load(arquivo)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def salvar_manifesto(manifesto, caminho=MANIFESTO):
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(manifesto, arquivo, ensure_ascii=False, indent=2)
+
+
+def _inicializar_worker(dados):
+    global _DADOS_WORKER
+    plt.switch_backend('Agg')
+    _DADOS_WORKER = dados
+
+
+def _renderizar_figura(nome, perfil):
+    """
+    Objetivo: Renderizar uma figura do registro no worker e medir o custo.
+    Saída: Dicionário no formato de registro 'etapa' da telemetria.
+    """
+    rss_inicio = medir_rss_atual_mb()
+    inicio_parede = time.perf_counter()
+    inicio_cpu = time.process_time()
+
+    FIGURAS[nome](_DADOS_WORKER, perfil)
+
+    return {
+        'evento': 'etapa',
+        'etapa': 'graficos',
+        'arquivo': nome,
+        'n_pontos': len(_DADOS_WORKER['kmeans']),
+        'tempo_parede_s': round(time.perf_counter() - inicio_parede, 6),
+        'tempo_cpu_s': round(time.process_time() - inicio_cpu, 6),
+        **campos_memoria(rss_inicio),
+        'timestamp': time.time()
+    }
 
-    gerar_graficos_metodologia()
 
-    gerar_graficos_validacao()
+def renderizar_figuras(
+    dados,
+    nomes=None,
+    max_workers=None,
+    telemetria: Telemetria = None,
+    perfil='impressao',
+    forcar=False
+):
+    """
+    Objetivo: Gerar as figuras em paralelo a partir de dados carregados uma única vez.
+    Entrada:
+        - dados: Dicionário de 'carregar_dados_graficos'.
+        - nomes: Figuras do registro FIGURAS a gerar (padrão: todas).
+        - max_workers: Processos do pool (padrão: uma por figura, limitado às CPUs).
+        - telemetria: Coletor opcional (um registro 'graficos' por figura).
+        - perfil: 'rascunho', 'tela', 'impressao' ou dicionário (ver PERFIS_RENDERIZACAO).
+        - forcar: Regerar mesmo as figuras inalteradas.
+    Processamento:
+        1. Figuras cujo hash de entrada e perfil coincidem com o manifesto, e cujo arquivo
+           existe, são puladas.
+        2. Os dados são entregues a cada worker uma vez, pelo inicializador do pool.
+        3. Cada worker usa o backend não interativo 'Agg' e renderiza uma figura por tarefa.
+        4. O manifesto é atualizado com as figuras efetivamente gravadas.
+    Saída: Lista de registros (figura, tempo de parede, CPU), na ordem de conclusão.
+    """
+    perfil = resolver_perfil(perfil)
+    nomes = list(FIGURAS) if nomes is None else list(nomes)
+    manifesto = carregar_manifesto()
+
+    pendentes = {}
+    for nome in nomes:
+        entrada = {'hash': hash_entradas(dados, nome), 'perfil': perfil}
+        anterior = manifesto.get(nome)
+
+        if (
+            not forcar
+            and anterior is not None
+            and {'hash': anterior.get('hash'), 'perfil': anterior.get('perfil')} == entrada
+            and os.path.exists(caminho_figura(nome, perfil))
+        ):
+            print(f"{nome}: inalterada")
+            continue
+
+        pendentes[nome] = entrada
+
+    registros = []
+    if not pendentes:
+        return registros
+
+    max_workers = max_workers or min(len(pendentes), os.cpu_count() or 1)
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers,
+        initializer=_inicializar_worker,
+        initargs=(dados,)
+    ) as executor:
+
+        futuros = {executor.submit(_renderizar_figura, nome, perfil): nome for nome in pendentes}
+
+        for futuro in as_completed(futuros):
+            nome = futuros[futuro]
+
+            try:
+                registro = futuro.result()
+            except Exception as erro:
+                print(f"Erro ao gerar {nome}: {erro}")
+                continue
+
+            print(f"{nome}: {registro['tempo_parede_s']:.2f} s")
+            registros.append(registro)
+
+            if telemetria is not None:
+                telemetria.registrar(registro)
+
+            if os.path.exists(caminho_figura(nome, perfil)):
+                manifesto[nome] = {**pendentes[nome], 'arquivo': caminho_figura(nome, perfil)}
+
+    salvar_manifesto(manifesto)
+
+    return registros
 
-    gerar_graficos_discussao_avancados()
+# ============================================================
+# MAIN
+# ============================================================
 
-    gerar_grafico_3d_kmeans()
+def main(telemetria: Telemetria = None, max_workers=None, perfil='impressao', forcar=False):
+
+    with medir_etapa(telemetria, 'graficos', 'carga'):
+        dados = carregar_dados_graficos()
+
+    inicio = time.perf_counter()
+    renderizar_figuras(
+        dados,
+        max_workers=max_workers,
+        telemetria=telemetria,
+        perfil=perfil,
+        forcar=forcar
+    )
+    print(f"Figuras geradas em {time.perf_counter() - inicio:.2f} s.")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main(perfil=sys.argv[1] if len(sys.argv) > 1 else 'impressao')
@@ -0,0 +1,294 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.trilha import como_trilha
+
+
+KM_POR_GRAU = 111.32
+RAIO_TERRA_KM = 6371.0088
+
+
+def caixa_trilha(dados) -> tuple:
+    """
+    Objetivo: Retângulo envolvente (bounding box) da trilha.
+    Entrada: Trilha ou pd.DataFrame com ['latitude', 'longitude'].
+    Saída: Tupla (lat_min, lat_max, lon_min, lon_max) em graus.
+    """
+    trilha = como_trilha(dados)
+    return (
+        float(np.min(trilha.latitude)),
+        float(np.max(trilha.latitude)),
+        float(np.min(trilha.longitude)),
+        float(np.max(trilha.longitude))
+    )
+
+
+class IndiceEspacial:
+    """
+    Objetivo: Localizar rapidamente as linhas da tabela de análise próximas de um ponto
+              ou que cruzam um retângulo, sem varrer a tabela inteira.
+    Estrutura:
+        - caixas: array (n, 4) com o retângulo de cada trilha; linhas: posição na tabela de análise.
+        - Grade regular de 'tamanho_celula_graus': cada trilha é registrada em todas as células que
+          sua caixa cobre. As chaves (linha_grade * n_colunas + coluna_grade) ficam ordenadas, com
+          os ids da trilha em um array paralelo (layout CSR), de modo que uma faixa de células
+          vizinhas é uma fatia contígua encontrada com 'searchsorted'.
+        - Caixas que cobririam mais de 'max_celulas_por_trilha' células (ex.: trilha com um salto
+          espúrio do GPS) ficam fora da grade e entram como candidatas em toda consulta.
+    Limitação: Trilhas que cruzam o antimeridiano (±180°) não são tratadas de forma especial.
+    """
+
+    def __init__(self, tamanho_celula_graus: float = 0.05, max_celulas_por_trilha: int = 4096):
+        self.tamanho_celula_graus = tamanho_celula_graus
+        self.max_celulas_por_trilha = max_celulas_por_trilha
+        self.n_colunas = int(np.ceil(360 / tamanho_celula_graus)) + 1
+
+        self.nomes = []
+        self._caixas = []
+        self._linhas = []
+
+        self.caixas = np.zeros((0, 4), dtype=np.float64)
+        self.linhas = np.zeros(0, dtype=np.int64)
+        self.chaves = np.zeros(0, dtype=np.int64)
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.abrangentes = np.zeros(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.nomes)
+
+    # ------------------------------------------------------------
+    # CONSTRUÇÃO
+    # ------------------------------------------------------------
+
+    def adicionar(self, nome: str, caixa: tuple, linha: int = None) -> None:
+        """
+        Objetivo: Registrar uma trilha (construção incremental durante o lote).
+        Entrada: Nome, caixa (lat_min, lat_max, lon_min, lon_max) e posição na tabela
+                 (padrão: ordem de inserção).
+        """
+        self.nomes.append(nome)
+        self._caixas.append(caixa)
+        self._linhas.append(len(self.nomes) - 1 if linha is None else linha)
+
+    def adicionar_trilha(self, nome: str, dados, linha: int = None) -> None:
+        self.adicionar(nome, caixa_trilha(dados), linha)
+
+    def substituir(self, nome: str, caixa: tuple, linha: int) -> None:
+        """
+        Objetivo: Trocar a caixa da trilha registrada em 'linha' (GPX alterado que manteve sua
+                  posição na tabela, ver 'atualizar_csv' no monitoramento).
+        Processamento: Atualiza a caixa e reconstrói a grade.
+        Saída: Lança ValueError se a linha não estiver no índice.
+        """
+        self._construir()
+
+        ids = np.flatnonzero(self.linhas == linha)
+        if not len(ids):
+            raise ValueError(f"Linha {linha} não está no índice espacial.")
+
+        self.caixas = self.caixas.copy()
+        self.caixas[ids[0]] = caixa
+        self.nomes[ids[0]] = nome
+        self._construir(reconstruir=True)
+
+    def _celulas(self, latitudes: np.ndarray, longitudes: np.ndarray):
+        linha = np.floor((latitudes + 90) / self.tamanho_celula_graus).astype(np.int64)
+        coluna = np.floor((longitudes + 180) / self.tamanho_celula_graus).astype(np.int64)
+        return linha, coluna
+
+    def _construir(self, reconstruir: bool = False) -> None:
+        """
+        Objetivo: Consolidar as inserções pendentes na grade (feito antes de consultar ou salvar).
+        Processamento: Expande cada caixa nas células cobertas de forma vetorizada (np.repeat)
+                       e ordena as chaves. 'reconstruir' refaz a grade mesmo sem pendências.
+        """
+        if not self._caixas and not reconstruir:
+            return
+
+        if self._caixas:
+            self.caixas = np.vstack([self.caixas, np.asarray(self._caixas, dtype=np.float64)])
+            self.linhas = np.concatenate([self.linhas, np.asarray(self._linhas, dtype=np.int64)])
+            self._caixas, self._linhas = [], []
+
+        linha_min, coluna_min = self._celulas(self.caixas[:, 0], self.caixas[:, 2])
+        linha_max, coluna_max = self._celulas(self.caixas[:, 1], self.caixas[:, 3])
+
+        altura = linha_max - linha_min + 1
+        largura = coluna_max - coluna_min + 1
+        n_celulas = altura * largura
+
+        abrangentes = n_celulas > self.max_celulas_por_trilha
+        self.abrangentes = np.flatnonzero(abrangentes)
+        n_celulas = np.where(abrangentes, 0, n_celulas)
+
+        ids = np.repeat(np.arange(len(self.caixas), dtype=np.int64), n_celulas)
+        posicao = np.arange(len(ids), dtype=np.int64) - np.repeat(np.cumsum(n_celulas) - n_celulas, n_celulas)
+
+        linhas_grade = linha_min[ids] + posicao // largura[ids]
+        colunas_grade = coluna_min[ids] + posicao % largura[ids]
+        chaves = linhas_grade * self.n_colunas + colunas_grade
+
+        ordem = np.argsort(chaves, kind='stable')
+        self.chaves = chaves[ordem]
+        self.ids = ids[ordem]
+
+    # ------------------------------------------------------------
+    # CONSULTAS
+    # ------------------------------------------------------------
+
+    def _candidatos(self, caixa: tuple) -> np.ndarray:
+        self._construir()
+
+        lat_min, lat_max, lon_min, lon_max = caixa
+        (linha_min, linha_max), (coluna_min, coluna_max) = self._celulas(
+            np.array([lat_min, lat_max]),
+            np.array([lon_min, lon_max])
+        )
+
+        # Uma fatia contígua de chaves por linha da grade
+        linhas_grade = np.arange(linha_min, linha_max + 1, dtype=np.int64) * self.n_colunas
+        inicios = np.searchsorted(self.chaves, linhas_grade + coluna_min, side='left')
+        fins = np.searchsorted(self.chaves, linhas_grade + coluna_max, side='right')
+
+        fatias = [self.ids[i:f] for i, f in zip(inicios, fins)]
+        return np.unique(np.concatenate(fatias + [self.abrangentes]))
+
+    def consultar_caixa(self, caixa: tuple) -> np.ndarray:
+        """
+        Objetivo: Trilhas cuja caixa intersecta o retângulo (lat_min, lat_max, lon_min, lon_max).
+        Saída: Array com as posições na tabela de análise, em ordem crescente.
+        """
+        lat_min, lat_max, lon_min, lon_max = caixa
+        candidatos = self._candidatos(caixa)
+        caixas = self.caixas[candidatos]
+
+        intersecta = (
+            (caixas[:, 0] <= lat_max) & (caixas[:, 1] >= lat_min)
+            & (caixas[:, 2] <= lon_max) & (caixas[:, 3] >= lon_min)
+        )
+
+        return np.sort(self.linhas[candidatos[intersecta]])
+
+    def consultar_raio(self, latitude: float, longitude: float, raio_km: float):
+        """
+        Objetivo: Trilhas que passam a até 'raio_km' do ponto (pela caixa envolvente).
+        Processamento:
+            1. Converte o círculo em retângulo e obtém os candidatos da grade.
+            2. Calcula a distância (haversine) do ponto ao ponto mais próximo de cada caixa.
+        Saída: Tupla (posições na tabela, distâncias em km), ordenada pela distância.
+        """
+        delta_lat = raio_km / KM_POR_GRAU
+        delta_lon = raio_km / (KM_POR_GRAU * max(np.cos(np.radians(latitude)), 1e-6))
+
+        candidatos = self._candidatos((
+            latitude - delta_lat,
+            latitude + delta_lat,
+            longitude - delta_lon,
+            longitude + delta_lon
+        ))
+        caixas = self.caixas[candidatos]
+
+        lat_proxima = np.clip(latitude, caixas[:, 0], caixas[:, 1])
+        lon_proxima = np.clip(longitude, caixas[:, 2], caixas[:, 3])
+
+        phi1, phi2 = np.radians(latitude), np.radians(lat_proxima)
+        a = (
+            np.sin((phi2 - phi1) / 2) ** 2
+            + np.cos(phi1) * np.cos(phi2) * np.sin(np.radians(lon_proxima - longitude) / 2) ** 2
+        )
+        distancias_km = 2 * RAIO_TERRA_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+        dentro = distancias_km <= raio_km
+        ordem = np.argsort(distancias_km[dentro], kind='stable')
+
+        return self.linhas[candidatos[dentro]][ordem], distancias_km[dentro][ordem]
+
+    # ------------------------------------------------------------
+    # PERSISTÊNCIA
+    # ------------------------------------------------------------
+
+    def salvar(self, caminho_npz: str) -> None:
+        """
+        Objetivo: Gravar o índice já construído (carregamento sem reconstrução).
+        """
+        self._construir()
+
+        pasta = os.path.dirname(caminho_npz)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+
+        np.savez(
+            caminho_npz,
+            tamanho_celula_graus=self.tamanho_celula_graus,
+            max_celulas_por_trilha=self.max_celulas_por_trilha,
+            nomes=np.asarray(self.nomes, dtype=str),
+            caixas=self.caixas,
+            linhas=self.linhas,
+            chaves=self.chaves,
+            ids=self.ids,
+            abrangentes=self.abrangentes
+        )
+
+
+def carregar_indice_espacial(caminho_npz: str) -> IndiceEspacial:
+    """
+    Objetivo: Reabrir um índice salvo por 'IndiceEspacial.salvar'.
+    """
+    with np.load(caminho_npz) as arquivo:
+        indice = IndiceEspacial(
+            float(arquivo['tamanho_celula_graus']),
+            int(arquivo['max_celulas_por_trilha'])
+        )
+        indice.nomes = arquivo['nomes'].tolist()
+        indice.caixas = arquivo['caixas']
+        indice.linhas = arquivo['linhas']
+        indice.chaves = arquivo['chaves']
+        indice.ids = arquivo['ids']
+        indice.abrangentes = arquivo['abrangentes']
+
+    return indice
+
+
+# ------------------------------------------------------------
+# CONSULTAS SOBRE A TABELA DE ANÁLISE
+# ------------------------------------------------------------
+
+def _validar_tabela(tabela: pd.DataFrame, indice: IndiceEspacial) -> None:
+    if len(tabela) != len(indice):
+        raise ValueError(
+            f"Tabela com {len(tabela)} linhas e índice com {len(indice)} trilhas: "
+            "reconstrua o índice junto com a tabela."
+        )
+
+
+def trilhas_proximas(
+    tabela: pd.DataFrame,
+    indice: IndiceEspacial,
+    latitude: float,
+    longitude: float,
+    raio_km: float
+) -> pd.DataFrame:
+    """
+    Objetivo: Linhas da tabela de análise com trilhas a até 'raio_km' do ponto.
+    Entrada: Tabela (ex.: analise_trilhas.csv carregado), índice gerado no mesmo lote, ponto e raio.
+    Saída: pd.DataFrame com as linhas encontradas e a coluna 'distancia_km', da mais próxima à
+           mais distante.
+    """
+    _validar_tabela(tabela, indice)
+    linhas, distancias_km = indice.consultar_raio(latitude, longitude, raio_km)
+
+    resultado = tabela.iloc[linhas].copy()
+    resultado['distancia_km'] = np.round(distancias_km, 3)
+    return resultado
+
+
+def trilhas_na_caixa(tabela: pd.DataFrame, indice: IndiceEspacial, caixa: tuple) -> pd.DataFrame:
+    """
+    Objetivo: Linhas da tabela de análise cujas trilhas intersectam o retângulo.
+    Entrada: Tabela, índice e caixa (lat_min, lat_max, lon_min, lon_max).
+    Saída: pd.DataFrame com as linhas encontradas, na ordem da tabela.
+    """
+    _validar_tabela(tabela, indice)
+    return tabela.iloc[indice.consultar_caixa(caixa)]
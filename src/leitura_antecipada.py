@@ -0,0 +1,152 @@
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Dicas ao kernel disponíveis só em POSIX (Linux, BSD); no Windows/macOS viram no-op
+TEM_FADVISE = hasattr(os, 'posix_fadvise')
+
+
+def aconselhar_leitura(caminho: str, sequencial: bool = False) -> None:
+    """
+    Objetivo: Avisar o kernel que o arquivo será lido em breve (POSIX_FADV_WILLNEED), para que a
+              leitura antecipada do sistema operacional comece sem ocupar memória do processo.
+    Entrada: Caminho e se a leitura será sequencial (POSIX_FADV_SEQUENTIAL, janela maior).
+    """
+    if not TEM_FADVISE:
+        return
+
+    descritor = os.open(caminho, os.O_RDONLY)
+    try:
+        if sequencial:
+            os.posix_fadvise(descritor, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        os.posix_fadvise(descritor, 0, 0, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(descritor)
+
+
+def ler_bytes(caminho: str, aconselhar_kernel: bool = False) -> bytes:
+    """
+    Objetivo: Ler o arquivo inteiro em memória (executado nas threads de pré-leitura).
+    """
+    with open(caminho, 'rb') as arquivo:
+        if aconselhar_kernel and TEM_FADVISE:
+            os.posix_fadvise(arquivo.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        return arquivo.read()
+
+
+class LeitorAntecipado:
+    """
+    Objetivo: Sobrepor a leitura do disco (ou do armazenamento de rede) ao parse e às métricas.
+    Estrutura:
+        - Pool de 'max_threads' threads lendo os próximos arquivos para buffers em memória
+          (a leitura libera o GIL, então a CPU segue parseando enquanto as threads aguardam I/O).
+        - Fila limitada em número de arquivos ('max_arquivos') e em bytes ('max_bytes'): um
+          arquivo só é enviado se couber no orçamento (um arquivo maior que o orçamento inteiro
+          ainda é lido quando a fila está vazia, para não travar).
+        - 'aconselhar_kernel': além da janela em memória, os 'max_arquivos' arquivos seguintes
+          recebem POSIX_FADV_WILLNEED, aquecendo o cache de páginas sem custo de RAM do processo.
+    Uso: 'iterar' entrega (arquivo, bytes, erro) na ordem da lista; o consumidor lê com
+         'ler_gpx_trilha_bytes' (ver 'leitor_antecipado' em 'processar_pasta_gpx').
+    """
+
+    def __init__(
+        self,
+        max_threads: int = 4,
+        max_arquivos: int = 16,
+        max_bytes: int = 64 * 1024 * 1024,
+        aconselhar_kernel: bool = True
+    ):
+        if max_threads < 1 or max_arquivos < 1 or max_bytes < 1:
+            raise ValueError("max_threads, max_arquivos e max_bytes devem ser >= 1.")
+
+        self.max_threads = max_threads
+        self.max_arquivos = max_arquivos
+        self.max_bytes = max_bytes
+        self.aconselhar_kernel = aconselhar_kernel and TEM_FADVISE
+
+    def iterar(self, caminho_pasta: str, arquivos: list):
+        """
+        Objetivo: Gerar os arquivos já lidos, na ordem da lista.
+        Entrada: Pasta raiz e lista de caminhos relativos (strings ou ArquivoDescoberto, cujo
+                 tamanho evita um 'stat' por arquivo).
+        Processamento:
+            1. Envia leituras ao pool enquanto couberem nos limites de arquivos e bytes.
+            2. Entrega o arquivo mais antigo assim que lido; seus bytes só saem do orçamento
+               quando o consumidor pede o próximo (o buffer entregue ainda está em uso).
+            3. Erros de leitura são entregues ao consumidor (que decide como reportá-los).
+        Saída: Gerador de tuplas (caminho relativo, bytes ou None, exceção ou None).
+        """
+        itens = []
+        for arquivo in arquivos:
+            if isinstance(arquivo, str):
+                itens.append((arquivo, None))
+            else:
+                itens.append((arquivo.caminho_relativo, arquivo.tamanho_bytes))
+
+        def tamanho(indice):
+            relativo, tamanho_bytes = itens[indice]
+            if tamanho_bytes is None:
+                try:
+                    tamanho_bytes = os.path.getsize(os.path.join(caminho_pasta, relativo))
+                except OSError:
+                    tamanho_bytes = 0
+                itens[indice] = (relativo, tamanho_bytes)
+            return tamanho_bytes
+
+        with ThreadPoolExecutor(max_workers=self.max_threads, thread_name_prefix='pre_leitura') as executor:
+            pendentes = deque()
+            bytes_pendentes = 0
+            proximo = 0
+            aconselhado = 0
+
+            try:
+                while proximo < len(itens) or pendentes:
+
+                    while (
+                        proximo < len(itens)
+                        and len(pendentes) < self.max_arquivos
+                        and (not pendentes or bytes_pendentes + tamanho(proximo) <= self.max_bytes)
+                    ):
+                        relativo = itens[proximo][0]
+                        futuro = executor.submit(
+                            ler_bytes,
+                            os.path.join(caminho_pasta, relativo),
+                            self.aconselhar_kernel
+                        )
+                        pendentes.append((relativo, futuro, tamanho(proximo)))
+                        bytes_pendentes += tamanho(proximo)
+                        proximo += 1
+
+                    if self.aconselhar_kernel:
+                        aconselhado = max(aconselhado, proximo)
+                        while aconselhado < min(proximo + self.max_arquivos, len(itens)):
+                            executor.submit(
+                                _aconselhar_silenciosamente,
+                                os.path.join(caminho_pasta, itens[aconselhado][0])
+                            )
+                            aconselhado += 1
+
+                    relativo, futuro, tamanho_bytes = pendentes.popleft()
+
+                    try:
+                        item = (relativo, futuro.result(), None)
+                    except Exception as erro:
+                        item = (relativo, None, erro)
+
+                    yield item
+                    del item
+
+                    bytes_pendentes -= tamanho_bytes
+
+            finally:
+                # Consumidor encerrado antes do fim: descarta as leituras ainda não iniciadas
+                for _, futuro, _ in pendentes:
+                    futuro.cancel()
+
+
+def _aconselhar_silenciosamente(caminho: str) -> None:
+    try:
+        aconselhar_leitura(caminho, sequencial=True)
+    except OSError:
+        pass
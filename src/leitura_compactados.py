@@ -0,0 +1,237 @@
+import gzip
+import os
+import tarfile
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from src.leitura_gpx import ler_gpx_trilha_bytes, nome_trilha
+from src.analise_trilha import calcular_metricas_trilha
+from src.duplicatas import assinatura_trilha
+from src.indice_espacial import caixa_trilha
+from src.niveis_detalhe import simplificar_niveis
+from src.telemetria import Telemetria, medir_etapa
+
+
+EXTENSOES_TAR = ('.tar', '.tar.gz', '.tgz', '.tar.bz2', '.tbz2', '.tar.xz', '.txz')
+EXTENSOES_COMPACTADAS = ('.zip',) + EXTENSOES_TAR
+
+
+def eh_arquivo_compactado(caminho: str) -> bool:
+    """
+    Objetivo: Identificar pacotes (.zip / .tar[.gz|.bz2|.xz]) pela extensão.
+    """
+    return caminho.lower().endswith(EXTENSOES_COMPACTADAS)
+
+
+def eh_membro_gpx(nome: str) -> bool:
+    """
+    Objetivo: Identificar arquivos GPX, soltos ou compactados individualmente com gzip.
+    """
+    return nome.lower().endswith(('.gpx', '.gpx.gz'))
+
+
+def iterar_membros_gpx(caminho_arquivo: str):
+    """
+    Objetivo: Percorrer os GPX de um pacote sem extraí-lo para o disco.
+    Entrada: Caminho de um .zip ou .tar (compactado ou não).
+    Processamento:
+        1. ZIP: lê cada membro diretamente do diretório central.
+        2. TAR: abre em modo stream ('r|*'), lendo os membros sequencialmente, sem seek.
+        3. Membros '.gpx.gz' são descompactados em memória.
+    Saída: Gerador de tuplas (nome_do_membro, bytes_do_xml).
+    """
+    if caminho_arquivo.lower().endswith('.zip'):
+        with zipfile.ZipFile(caminho_arquivo) as pacote:
+            for info in pacote.infolist():
+                if info.is_dir() or not eh_membro_gpx(info.filename):
+                    continue
+
+                conteudo = pacote.read(info)
+                if info.filename.lower().endswith('.gz'):
+                    conteudo = gzip.decompress(conteudo)
+
+                yield info.filename, conteudo
+        return
+
+    with tarfile.open(caminho_arquivo, mode='r|*') as pacote:
+        for info in pacote:
+            if not info.isfile() or not eh_membro_gpx(info.name):
+                continue
+
+            conteudo = pacote.extractfile(info).read()
+            if info.name.lower().endswith('.gz'):
+                conteudo = gzip.decompress(conteudo)
+
+            yield info.name, conteudo
+
+
+def analisar_membro_gpx(
+    nome_membro: str,
+    conteudo: bytes,
+    corretor_elevacao=None,
+    com_caixa: bool = False,
+    tolerancias_detalhe: tuple = None,
+    parametros_assinatura: tuple = None,
+    com_telemetria: bool = False
+):
+    """
+    Objetivo: Calcular as métricas de um GPX recebido como bytes (executado nos workers).
+    Entrada:
+        - nome_membro / conteudo: Nome do membro no pacote e o XML em bytes.
+        - corretor_elevacao: Modelo de elevação opcional ('ModeloElevacao'; cada worker abre os
+          tiles que usar).
+        - com_caixa: A caixa envolvente acompanha o resultado (índice espacial).
+        - tolerancias_detalhe: Tolerâncias do armazém de níveis de detalhe; a geometria
+          simplificada (e a caixa) acompanha o resultado.
+        - parametros_assinatura: (sementes, tamanho_celula_m) do 'IndiceDuplicatas'; a assinatura
+          MinHash acompanha o resultado e a consulta ao índice fica no processo principal.
+        - com_telemetria: As etapas são medidas no worker (Telemetria em memória) e os registros
+          acompanham o resultado, para o processo principal gravá-los no seu trace.
+        A trilha completa nunca sai do worker.
+    Saída: Dicionário no mesmo formato de 'analisar_trilha' ou, com algum extra pedido, tupla
+           (dicionário, extras) com 'caixa' e, se pedidos, 'niveis' (saída de 'simplificar_niveis'),
+           'assinatura' (saída de 'assinatura_trilha') e 'registros' (telemetria).
+    """
+    telemetria = Telemetria() if com_telemetria else None
+    nome = nome_trilha(nome_membro)
+
+    with medir_etapa(telemetria, 'parse', nome) as registro:
+        dados = ler_gpx_trilha_bytes(conteudo, nome_membro)
+        registro['n_pontos'] = len(dados)
+
+    # Assinatura antes da correção de elevação, como no lote (só depende de latitude/longitude)
+    assinatura = None
+    if parametros_assinatura is not None:
+        with medir_etapa(telemetria, 'duplicatas', nome, len(dados)):
+            assinatura = assinatura_trilha(dados, *parametros_assinatura)
+
+    if corretor_elevacao is not None:
+        with medir_etapa(telemetria, 'elevacao', nome, len(dados)):
+            dados = corretor_elevacao.corrigir(dados)
+
+    resultado = calcular_metricas_trilha(nome, dados, telemetria)
+    if not com_caixa and tolerancias_detalhe is None and assinatura is None and telemetria is None:
+        return resultado
+
+    extras = {'caixa': caixa_trilha(dados)}
+    if tolerancias_detalhe is not None:
+        with medir_etapa(telemetria, 'detalhe', nome, len(dados)):
+            extras['niveis'] = simplificar_niveis(dados, tolerancias_detalhe)
+    if assinatura is not None:
+        extras['assinatura'] = assinatura
+    if telemetria is not None:
+        extras['registros'] = telemetria.registros
+
+    return resultado, extras
+
+
+def iterar_resultados_compactado(
+    caminho_arquivo: str,
+    max_workers: int = None,
+    max_pendentes: int = None,
+    corretor_elevacao=None,
+    com_caixa: bool = False,
+    executor: ProcessPoolExecutor = None,
+    tolerancias_detalhe: tuple = None,
+    parametros_assinatura: tuple = None,
+    com_telemetria: bool = False
+):
+    """
+    Objetivo: Processar os membros de um pacote em paralelo, com leitura sequencial do pacote.
+    Entrada:
+        - caminho_arquivo: Pacote .zip/.tar.
+        - max_workers: Processos do pool (None = número de CPUs).
+        - max_pendentes: Máximo de membros lidos aguardando processamento (padrão: 2x workers),
+          o que limita a memória mesmo em pacotes com milhares de GPX.
+        - corretor_elevacao: Modelo de elevação opcional aplicado a cada membro.
+        - com_caixa / tolerancias_detalhe / parametros_assinatura / com_telemetria: Extras
+          calculados no worker junto com as métricas (ver 'analisar_membro_gpx').
+        - executor: Pool a reaproveitar entre pacotes (ver 'processar_pasta_gpx'); sem ele, um
+          pool de 'max_workers' processos é criado e encerrado para este pacote.
+    Processamento:
+        1. O processo principal lê os membros em ordem e os envia ao pool.
+        2. Ao atingir o limite de pendentes, aguarda o membro mais antigo antes de ler o próximo.
+        3. Erros de um membro são reportados sem interromper o pacote.
+    Saída: Gerador de dicionários de resultados (ou tuplas (dicionário, extras), ver
+           'analisar_membro_gpx'), na ordem dos membros no pacote.
+    """
+    if executor is None:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            yield from iterar_resultados_compactado(
+                caminho_arquivo,
+                max_workers,
+                max_pendentes,
+                corretor_elevacao,
+                com_caixa,
+                executor,
+                tolerancias_detalhe,
+                parametros_assinatura,
+                com_telemetria
+            )
+        return
+
+    limite = max_pendentes or 2 * (max_workers or os.cpu_count() or 1)
+    pendentes = deque()
+
+    def coletar(nome_membro, futuro):
+        try:
+            return futuro.result()
+        except Exception as erro:
+            print(f"Erro ao processar {caminho_arquivo}:{nome_membro}: {erro}")
+            return None
+
+    try:
+        for nome_membro, conteudo in iterar_membros_gpx(caminho_arquivo):
+            pendentes.append((nome_membro, executor.submit(
+                analisar_membro_gpx,
+                nome_membro,
+                conteudo,
+                corretor_elevacao,
+                com_caixa,
+                tolerancias_detalhe,
+                parametros_assinatura,
+                com_telemetria
+            )))
+            del conteudo
+
+            if len(pendentes) >= limite:
+                resultado = coletar(*pendentes.popleft())
+                if resultado is not None:
+                    yield resultado
+
+        while pendentes:
+            resultado = coletar(*pendentes.popleft())
+            if resultado is not None:
+                yield resultado
+    finally:
+        # Pacote abandonado ou com erro: o pool compartilhado não deve herdar membros pendentes
+        for _, futuro in pendentes:
+            futuro.cancel()
+
+
+def processar_arquivo_compactado(
+    caminho_arquivo: str,
+    max_workers: int = None,
+    corretor_elevacao=None,
+    com_caixa: bool = False,
+    executor: ProcessPoolExecutor = None,
+    tolerancias_detalhe: tuple = None,
+    parametros_assinatura: tuple = None,
+    com_telemetria: bool = False
+) -> list:
+    """
+    Objetivo: Versão em lista de 'iterar_resultados_compactado'.
+    Saída: Lista de resultados de todos os GPX do pacote (tuplas (dicionário, extras) quando
+           algum extra é pedido).
+    """
+    return list(iterar_resultados_compactado(
+        caminho_arquivo,
+        max_workers,
+        corretor_elevacao=corretor_elevacao,
+        com_caixa=com_caixa,
+        executor=executor,
+        tolerancias_detalhe=tolerancias_detalhe,
+        parametros_assinatura=parametros_assinatura,
+        com_telemetria=com_telemetria
+    ))
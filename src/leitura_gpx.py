@@ -1,23 +1,75 @@
+import gzip
+import mmap
+import os
+import re
+from datetime import datetime, timezone
+
 import gpxpy
+import numpy as np
 import pandas as pd
 
+from src.trilha import Trilha, NAT_NS
 
-def ler_gpx(caminho_gpx: str) -> pd.DataFrame:
+
+EPOCA_UTC = datetime(1970, 1, 1)
+
+# Leitura rápida: layout regular <trkpt lat lon><ele/><time/></trkpt> (ele e time opcionais,
+# tempo ISO em UTC ou sem fuso); qualquer outra forma de trkpt desvia para o gpxpy
+_PADRAO_TRKPT = re.compile(
+    rb'<trkpt\s+lat="([^"]+)"\s+lon="([^"]+)"\s*>\s*'
+    rb'(?:<ele>([^<]+)</ele>\s*)?'
+    rb'(?:<time>(\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d(?:\.\d+)?)Z?</time>\s*)?'
+    rb'</trkpt>'
+)
+_PADRAO_ABERTURA_TRKPT = re.compile(rb'<trkpt\b')
+
+# Comentários e seções CDATA podem conter trkpt que o XML ignora; nesses arquivos só o gpxpy
+_MARCADORES_SEM_LEITURA_RAPIDA = (b'<!--', b'<![CDATA[')
+
+
+def _datetime_para_ns(momento: datetime) -> int:
     """
-    Objetivo: Extrair e normalizar dados brutos de arquivos GPX.
-    Entrada: String com o caminho do arquivo .gpx.
-    Processamento: 
-        1. Parseia o XML usando gpxpy.
-        2. Navega pela hierarquia Tracks -> Segments -> Points.
-        3. Filtra apenas pontos com Latitude, Longitude e Elevação válidas.
-        4. Cria um DataFrame Pandas e converte timestamps para UTC.
-        5. Ordena os pontos cronologicamente para garantir integridade física da trilha.
-    Saída: pd.DataFrame com colunas ['latitude', 'longitude', 'altitude_m', 'time'].
+    Objetivo: Converter um datetime do gpxpy em nanossegundos UTC desde a época.
+    Entrada: datetime com ou sem fuso (sem fuso é interpretado como UTC, como no pd.to_datetime(utc=True)).
+    Saída: Inteiro em nanossegundos, ou NAT_NS quando o ponto não possui tempo.
     """
-    with open(caminho_gpx, 'r', encoding='utf-8') as arquivo:
-        gpx = gpxpy.parse(arquivo)
+    if momento is None:
+        return NAT_NS
+
+    if momento.tzinfo is not None:
+        momento = momento.astimezone(timezone.utc).replace(tzinfo=None)
 
-    pontos = []
+    delta = momento - EPOCA_UTC
+    return (delta.days * 86_400 + delta.seconds) * 10**9 + delta.microseconds * 1000
+
+
+def nome_trilha(caminho_gpx: str) -> str:
+    """
+    Objetivo: Derivar o identificador da trilha a partir do nome do arquivo.
+    Entrada: Caminho ou nome de membro ('x.gpx', 'x.gpx.gz', 'pasta/x.GPX').
+    Saída: Nome base sem as extensões '.gz' e '.gpx'.
+    """
+    nome = os.path.basename(caminho_gpx)
+
+    if nome.lower().endswith('.gz'):
+        nome = nome[:-3]
+
+    return os.path.splitext(nome)[0]
+
+
+def _extrair_trilha(gpx, origem: str, dtype) -> Trilha:
+    """
+    Objetivo: Converter o objeto GPX do gpxpy em Trilha.
+    Processamento:
+        1. Navega pela hierarquia Tracks -> Segments -> Points.
+        2. Filtra apenas pontos com Latitude, Longitude e Elevação válidas.
+        3. Preenche listas planas e converte timestamps para int64 (ns UTC), sem DataFrame intermediário.
+        4. Ordena os pontos cronologicamente (ordenação estável, pontos sem tempo ao final).
+    """
+    latitudes = []
+    longitudes = []
+    altitudes = []
+    tempos = []
 
     for trilha in gpx.tracks:
         for segmento in trilha.segments:
@@ -29,37 +81,160 @@ def ler_gpx(caminho_gpx: str) -> pd.DataFrame:
                 ):
                     continue
 
-                pontos.append({
-                    'latitude': ponto.latitude,
-                    'longitude': ponto.longitude,
-                    'altitude_m': ponto.elevation,
-                    'time': ponto.time
-                })
+                latitudes.append(ponto.latitude)
+                longitudes.append(ponto.longitude)
+                altitudes.append(ponto.elevation)
+                tempos.append(_datetime_para_ns(ponto.time))
+
+    if not latitudes:
+        raise ValueError(f"GPX sem pontos válidos: {origem}")
+
+    trilha = Trilha(
+        latitudes,
+        longitudes,
+        altitudes,
+        np.array(tempos, dtype=np.int64),
+        dtype=dtype
+    )
 
-    df = pd.DataFrame(pontos)
+    return trilha.ordenar_por_tempo()
 
-    if df.empty:
-        raise ValueError(f"GPX sem pontos válidos: {caminho_gpx}")
 
-    # ------------------------------------------------------------------
-    # Normalização temporal
-    # ------------------------------------------------------------------
-    df['time'] = pd.to_datetime(df['time'], utc=True, errors='coerce')
-    df = df.sort_values('time').reset_index(drop=True)
+def _ler_trilha_rapida(conteudo, origem: str, dtype):
+    """
+    Objetivo: Extrair os pontos sem parser XML, quando o GPX segue o layout regular dos
+              aparelhos mais comuns.
+    Entrada: Bytes ou mmap do XML, nome para mensagens de erro e precisão das coordenadas.
+    Processamento:
+        1. Arquivos com comentário ou CDATA vão direto para o gpxpy; nos demais, uma expressão
+           regular compilada (bytes) captura lat, lon, ele e time de cada trkpt.
+        2. Validação: o número de capturas deve ser igual ao de aberturas '<trkpt' (trkpt com
+           extensões, atributos em outra ordem, fuso horário etc. invalidam a leitura rápida).
+        3. Conversão em bloco: coordenadas e altitude via cast de strings para float64, tempos
+           via 'datetime64[us]' (mesma truncagem em microssegundos do gpxpy; vazio = NaT).
+        4. Descarta pontos sem elevação e ordena por tempo, como '_extrair_trilha'.
+    Saída: Trilha, ou None quando o arquivo não tem a forma esperada (usar o gpxpy).
+    """
+    if any(conteudo.find(marcador) != -1 for marcador in _MARCADORES_SEM_LEITURA_RAPIDA):
+        return None
+
+    capturas = _PADRAO_TRKPT.findall(conteudo)
 
-    return df
+    if not capturas or len(capturas) != len(_PADRAO_ABERTURA_TRKPT.findall(conteudo)):
+        return None
+
+    colunas = np.array(capturas, dtype=bytes)
+    del capturas
 
+    try:
+        com_elevacao = colunas[:, 2] != b''
+        colunas = colunas[com_elevacao]
+
+        latitudes = colunas[:, 0].astype(np.float64)
+        longitudes = colunas[:, 1].astype(np.float64)
+        altitudes = colunas[:, 2].astype(np.float64)
+        tempos = colunas[:, 3].astype('datetime64[us]').astype('datetime64[ns]').view(np.int64)
+    except ValueError:
+        return None
 
-def calcular_tempo_total_minutos(dados: pd.DataFrame) -> float:
+    if len(latitudes) == 0:
+        raise ValueError(f"GPX sem pontos válidos: {origem}")
+
+    trilha = Trilha(latitudes, longitudes, altitudes, tempos, dtype=dtype)
+
+    return trilha.ordenar_por_tempo()
+
+
+def ler_gpx_trilha(caminho_gpx: str, dtype=np.float64, leitura_rapida: bool = True) -> Trilha:
+    """
+    Objetivo: Extrair os pontos de um arquivo GPX diretamente para o formato colunar (Trilha).
+    Entrada:
+        - caminho_gpx: String com o caminho do arquivo .gpx (ou .gpx.gz, descompactado em memória).
+        - dtype: Precisão das coordenadas (float64 padrão; float32 reduz a memória pela metade).
+        - leitura_rapida: Tentar antes a varredura de bytes ('_ler_trilha_rapida') no arquivo
+          mapeado em memória.
+    Processamento:
+        1. Leitura rápida sobre o mmap do arquivo; se o layout não for o esperado:
+        2. Parseia o XML usando gpxpy.
+        3. Converte os pontos válidos em arrays via '_extrair_trilha'.
+    Saída: Trilha com arrays contíguos de latitude, longitude, altitude e tempo.
+    """
+    if caminho_gpx.lower().endswith('.gz'):
+        with gzip.open(caminho_gpx, 'rb') as arquivo:
+            return ler_gpx_trilha_bytes(arquivo.read(), caminho_gpx, dtype, leitura_rapida)
+
+    if leitura_rapida and os.path.getsize(caminho_gpx) > 0:
+        with open(caminho_gpx, 'rb') as arquivo:
+            with mmap.mmap(arquivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+                trilha = _ler_trilha_rapida(mapa, caminho_gpx, dtype)
+
+        if trilha is not None:
+            return trilha
+
+    with open(caminho_gpx, 'r', encoding='utf-8') as arquivo:
+        gpx = gpxpy.parse(arquivo)
+
+    return _extrair_trilha(gpx, caminho_gpx, dtype)
+
+
+def ler_gpx_trilha_bytes(
+    conteudo: bytes,
+    origem: str = '<memória>',
+    dtype=np.float64,
+    leitura_rapida: bool = True
+) -> Trilha:
+    """
+    Objetivo: Ler um GPX já carregado em memória (membro de arquivo compactado, buffer pré-lido).
+    Entrada:
+        - conteudo: Bytes do XML (ou do XML compactado com gzip, detectado pelo cabeçalho).
+        - origem: Nome usado nas mensagens de erro.
+        - dtype: Precisão das coordenadas.
+        - leitura_rapida: Tentar antes a varredura de bytes (ver 'ler_gpx_trilha').
+    Saída: Trilha, idêntica à produzida por 'ler_gpx_trilha' para o mesmo arquivo.
+    """
+    if conteudo[:2] == b'\x1f\x8b':
+        conteudo = gzip.decompress(conteudo)
+
+    if leitura_rapida:
+        trilha = _ler_trilha_rapida(conteudo, origem, dtype)
+        if trilha is not None:
+            return trilha
+
+    gpx = gpxpy.parse(conteudo.decode('utf-8'))
+
+    return _extrair_trilha(gpx, origem, dtype)
+
+
+def ler_gpx(caminho_gpx: str) -> pd.DataFrame:
+    """
+    Objetivo: Extrair e normalizar dados brutos de arquivos GPX.
+    Entrada: String com o caminho do arquivo .gpx.
+    Processamento:
+        1. Lê a trilha no formato colunar via 'ler_gpx_trilha'.
+        2. Materializa o DataFrame com timestamps em UTC, já ordenado cronologicamente.
+    Saída: pd.DataFrame com colunas ['latitude', 'longitude', 'altitude_m', 'time'].
+    """
+    return ler_gpx_trilha(caminho_gpx).to_frame()
+
+
+def calcular_tempo_total_minutos(dados) -> float:
     """
     Objetivo: Calcular a duração total da atividade (tempo de relógio).
-    Entrada: pd.DataFrame contendo a coluna 'time' com objetos datetime.
-    Processamento: 
+    Entrada: Trilha ou pd.DataFrame contendo a coluna 'time' com objetos datetime.
+    Processamento:
         1. Verifica a existência da coluna 'time'.
         2. Extrai o timestamp inicial (primeiro ponto) e o final (último ponto).
         3. Calcula a diferença temporal absoluta.
     Saída: Float representando o tempo total em minutos. Retorna None se não houver dados temporais suficientes.
     """
+    if isinstance(dados, Trilha):
+        tempos_validos = dados.tempo_ns[dados.mascara_tempo_valido()]
+
+        if len(tempos_validos) < 2:
+            return None
+
+        return int(tempos_validos[-1] - tempos_validos[0]) / 6e10
+
     if 'time' not in dados.columns:
         return None
 
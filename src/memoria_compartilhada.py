@@ -0,0 +1,185 @@
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+from src.trilha import Trilha
+
+
+# Alinhamento de cada array dentro do bloco (evita acessos desalinhados com float32 + int64)
+ALINHAMENTO_BYTES = 64
+
+CAMPOS_TRILHA = ('latitude', 'longitude', 'altitude_m', 'tempo_ns')
+
+
+# ------------------------------------------------------------
+# ARRAYS GENÉRICOS
+# ------------------------------------------------------------
+
+def publicar_arrays(arrays: dict):
+    """
+    Objetivo: Copiar um conjunto de arrays NumPy para um único bloco de memória compartilhada.
+    Entrada: Dicionário {nome: np.ndarray}.
+    Processamento:
+        1. Calcula o layout (offset alinhado, dtype e shape de cada array).
+        2. Cria o bloco 'multiprocessing.shared_memory' e copia os dados uma única vez.
+    Saída: Tupla (SharedMemory, descritor). O descritor é um dicionário pequeno e serializável
+           que os workers usam para mapear os mesmos bytes sem cópia. Quem publica é
+           responsável por 'close()' e 'unlink()' (ver 'compartilhar_arrays').
+    """
+    campos = []
+    offset = 0
+
+    for nome, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        offset = -(-offset // ALINHAMENTO_BYTES) * ALINHAMENTO_BYTES
+        campos.append((nome, array.dtype.str, array.shape, offset))
+        offset += array.nbytes
+
+    bloco = shared_memory.SharedMemory(create=True, size=max(offset, 1))
+
+    for (nome, dtype, shape, inicio), array in zip(campos, arrays.values()):
+        destino = np.ndarray(shape, dtype=dtype, buffer=bloco.buf, offset=inicio)
+        destino[...] = array
+
+    descritor = {
+        'bloco': bloco.name,
+        'campos': campos
+    }
+
+    return bloco, descritor
+
+
+def _anexar_bloco(nome_bloco: str) -> shared_memory.SharedMemory:
+    """
+    Objetivo: Abrir um bloco existente sem registrá-lo no resource_tracker do worker.
+    Motivo: Antes do Python 3.13 o tracker do processo que apenas anexa o bloco tenta
+            removê-lo ao encerrar, destruindo a memória que ainda pertence ao publicador.
+    """
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=nome_bloco, track=False)
+
+    registrar = resource_tracker.register
+    resource_tracker.register = lambda *args, **kwargs: None
+    try:
+        return shared_memory.SharedMemory(name=nome_bloco)
+    finally:
+        resource_tracker.register = registrar
+
+
+def anexar_arrays(descritor: dict):
+    """
+    Objetivo: Mapear, em outro processo, os arrays publicados por 'publicar_arrays'.
+    Entrada: Descritor retornado por 'publicar_arrays'.
+    Saída: Tupla (dicionário {nome: np.ndarray somente leitura}, SharedMemory).
+           Os arrays são views do bloco: o SharedMemory deve permanecer aberto enquanto forem usados.
+    """
+    bloco = _anexar_bloco(descritor['bloco'])
+
+    arrays = {}
+    for nome, dtype, shape, inicio in descritor['campos']:
+        array = np.ndarray(tuple(shape), dtype=dtype, buffer=bloco.buf, offset=inicio)
+        array.flags.writeable = False
+        arrays[nome] = array
+
+    return arrays, bloco
+
+
+@contextmanager
+def compartilhar_arrays(arrays: dict):
+    """
+    Objetivo: Publicar arrays durante um bloco 'with' e liberar a memória ao final.
+    Saída: Descritor para ser enviado aos workers.
+    """
+    bloco, descritor = publicar_arrays(arrays)
+    try:
+        yield descritor
+    finally:
+        bloco.close()
+        bloco.unlink()
+
+
+# ------------------------------------------------------------
+# TRILHAS
+# ------------------------------------------------------------
+
+def publicar_trilha(trilha: Trilha):
+    """
+    Objetivo: Colocar os arrays de uma Trilha em memória compartilhada.
+    Entrada: Trilha.
+    Saída: Tupla (SharedMemory, descritor).
+    """
+    return publicar_arrays({
+        campo: getattr(trilha, campo) for campo in CAMPOS_TRILHA
+    })
+
+
+def anexar_trilha(descritor: dict):
+    """
+    Objetivo: Reconstruir, sem cópia, a Trilha publicada por outro processo.
+    Entrada: Descritor retornado por 'publicar_trilha'.
+    Saída: Tupla (Trilha somente leitura, SharedMemory).
+    """
+    arrays, bloco = anexar_arrays(descritor)
+
+    trilha = Trilha(
+        arrays['latitude'],
+        arrays['longitude'],
+        arrays['altitude_m'],
+        arrays['tempo_ns'],
+        dtype=arrays['latitude'].dtype
+    )
+
+    return trilha, bloco
+
+
+@contextmanager
+def compartilhar_trilha(trilha: Trilha):
+    """
+    Objetivo: Versão 'with' de 'publicar_trilha', com liberação garantida do bloco.
+    Saída: Descritor da trilha.
+    """
+    with compartilhar_arrays({campo: getattr(trilha, campo) for campo in CAMPOS_TRILHA}) as descritor:
+        yield descritor
+
+
+def _executar_sobre_trilha(descritor: dict, funcao, kwargs: dict):
+    """
+    Objetivo: Ponto de entrada do worker: anexa a trilha, executa a função e solta o bloco.
+    """
+    trilha, bloco = anexar_trilha(descritor)
+    try:
+        return funcao(trilha, **kwargs)
+    finally:
+        del trilha
+        bloco.close()
+
+
+def executar_em_paralelo(trilha: Trilha, tarefas: list, max_workers: int = None) -> list:
+    """
+    Objetivo: Executar várias análises sobre a mesma trilha em processos distintos, sem copiá-la.
+    Entrada:
+        - trilha: Trilha a compartilhar.
+        - tarefas: Lista de funções 'f(trilha)' ou tuplas (funcao, kwargs). As funções devem ser
+          definidas no nível do módulo (serializáveis por pickle) e retornar resultados pequenos.
+        - max_workers: Número de processos (padrão do ProcessPoolExecutor).
+    Processamento:
+        1. Publica os arrays uma única vez em memória compartilhada.
+        2. Envia a cada worker apenas o descritor (algumas dezenas de bytes).
+        3. Libera o bloco ao final, mesmo em caso de erro.
+    Saída: Lista com o resultado de cada tarefa, na ordem recebida.
+    """
+    tarefas = [
+        tarefa if isinstance(tarefa, tuple) else (tarefa, {})
+        for tarefa in tarefas
+    ]
+
+    with compartilhar_trilha(trilha) as descritor:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futuros = [
+                executor.submit(_executar_sobre_trilha, descritor, funcao, kwargs)
+                for funcao, kwargs in tarefas
+            ]
+            return [futuro.result() for futuro in futuros]
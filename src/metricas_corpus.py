@@ -0,0 +1,296 @@
+import os
+import numpy as np
+import pandas as pd
+
+from src.leitura_gpx import ler_gpx_trilha, nome_trilha
+from src.metricas_trilha import distancias_geodesicas_m
+from src.modelos_tempo import estimar_tempo_tobler_min
+from src.trilha import Trilha, NAT_NS, NS_POR_DIA
+from src.descoberta_arquivos import descobrir_arquivos_gpx
+from src.leitura_compactados import eh_membro_gpx
+
+
+COLUNAS_RESULTADO = [
+    'trilha',
+    'latitude_inicio',
+    'longitude_inicio',
+    'distancia_km',
+    'ganho_elevacao_m',
+    'inclinacao_media_graus',
+    'dias_trilha',
+    'tipo_trilha',
+    'intensidade_diaria',
+    'indice_concentracao_esforco'
+]
+
+
+# ------------------------------------------------------------
+# LAYOUT IRREGULAR (RAGGED)
+# ------------------------------------------------------------
+
+class CorpusTrilhas:
+    """
+    Objetivo: Guardar muitas trilhas em arrays planos únicos (layout irregular / ragged).
+    Estrutura:
+        - latitude, longitude, altitude_m, tempo_ns: pontos de todas as trilhas concatenados.
+        - offsets: array int64 com N+1 posições; a trilha k ocupa [offsets[k], offsets[k+1]).
+        - nomes: lista com o identificador de cada trilha.
+    """
+
+    __slots__ = ('nomes', 'latitude', 'longitude', 'altitude_m', 'tempo_ns', 'offsets')
+
+    def __init__(self, nomes, latitude, longitude, altitude_m, tempo_ns, offsets):
+        self.nomes = list(nomes)
+        self.latitude = latitude
+        self.longitude = longitude
+        self.altitude_m = altitude_m
+        self.tempo_ns = tempo_ns
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def trilha(self, indice: int) -> Trilha:
+        """
+        Objetivo: Obter a trilha 'indice' como Trilha (views dos arrays planos, sem cópia).
+        """
+        inicio, fim = self.offsets[indice], self.offsets[indice + 1]
+        segmento = Trilha.__new__(Trilha)
+        segmento.latitude = self.latitude[inicio:fim]
+        segmento.longitude = self.longitude[inicio:fim]
+        segmento.altitude_m = self.altitude_m[inicio:fim]
+        segmento.tempo_ns = self.tempo_ns[inicio:fim]
+        return segmento
+
+    def indice_trilha_por_ponto(self) -> np.ndarray:
+        """
+        Objetivo: Rótulo da trilha de cada ponto (base das reduções segmentadas).
+        """
+        return np.repeat(np.arange(len(self), dtype=np.int64), np.diff(self.offsets))
+
+
+def concatenar_trilhas(nomes: list, trilhas: list) -> CorpusTrilhas:
+    """
+    Objetivo: Montar o corpus irregular a partir de uma lista de Trilhas.
+    Entrada: Nomes e Trilhas (mesma ordem).
+    Saída: CorpusTrilhas com arrays planos e índice de offsets.
+    """
+    tamanhos = np.fromiter((len(trilha) for trilha in trilhas), dtype=np.int64, count=len(trilhas))
+    offsets = np.concatenate(([0], np.cumsum(tamanhos)))
+
+    def juntar(campo, dtype):
+        if not trilhas:
+            return np.zeros(0, dtype=dtype)
+        return np.concatenate([getattr(trilha, campo) for trilha in trilhas]).astype(dtype, copy=False)
+
+    return CorpusTrilhas(
+        nomes,
+        juntar('latitude', np.float64),
+        juntar('longitude', np.float64),
+        juntar('altitude_m', np.float64),
+        juntar('tempo_ns', np.int64),
+        offsets
+    )
+
+
+# ------------------------------------------------------------
+# MÉTRICAS EM LOTE
+# ------------------------------------------------------------
+
+def _ganhos_diarios_corpus(corpus: CorpusTrilhas, rotulos: np.ndarray, delta_min_m: float):
+    """
+    Objetivo: Ganho de elevação de cada par (trilha, dia UTC), apenas pontos com tempo válido.
+    Saída: Tupla (trilha_de_cada_grupo, ganho_de_cada_grupo).
+    """
+    validos = corpus.tempo_ns != NAT_NS
+
+    trilha = rotulos[validos]
+    dia = corpus.tempo_ns[validos] // NS_POR_DIA
+    altitudes = corpus.altitude_m[validos]
+
+    # Ordenação estável por (trilha, dia): preserva a ordem dos pontos dentro de cada dia
+    ordem = np.lexsort((dia, trilha))
+    trilha, dia, altitudes = trilha[ordem], dia[ordem], altitudes[ordem]
+
+    if len(trilha) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float64)
+
+    novo_grupo = np.concatenate((
+        [True],
+        (trilha[1:] != trilha[:-1]) | (dia[1:] != dia[:-1])
+    ))
+    grupo = np.cumsum(novo_grupo) - 1
+
+    delta = np.diff(altitudes)
+    contribuicao = np.where((~novo_grupo[1:]) & (delta >= delta_min_m), delta, 0.0)
+
+    ganhos = np.bincount(grupo[1:], weights=contribuicao, minlength=int(grupo[-1]) + 1)
+
+    return trilha[novo_grupo], ganhos
+
+
+def _arredondar(valores: np.ndarray, casas: int) -> list:
+    # round() do Python, idêntico ao usado em 'calcular_metricas_trilha'
+    return [round(valor, casas) for valor in valores.tolist()]
+
+
+def calcular_metricas_corpus(
+    corpus: CorpusTrilhas,
+    distancia_min_m: float = 1.0,
+    delta_min_m: float = 3.0
+) -> pd.DataFrame:
+    """
+    Objetivo: Calcular os indicadores de todas as trilhas do corpus em uma única chamada.
+    Entrada: CorpusTrilhas e os mesmos limiares de ruído do motor por trilha.
+    Processamento:
+        1. Distâncias geodésicas e desníveis de todos os pares consecutivos do array plano;
+           pares que cruzam a fronteira entre trilhas são descartados.
+        2. Distância e ganho por trilha via bincount (redução segmentada).
+        3. Dias e Índice de Concentração a partir dos ganhos por (trilha, dia).
+        4. Inclinação, Tobler e Intensidade Diária como operações vetoriais por trilha.
+    Saída: pd.DataFrame com as mesmas colunas (e arredondamentos) de 'calcular_metricas_trilha'.
+    """
+    n = len(corpus)
+    if n == 0:
+        return pd.DataFrame(columns=COLUNAS_RESULTADO)
+
+    if np.any(np.diff(corpus.offsets) == 0):
+        raise ValueError("Corpus contém trilha sem pontos.")
+
+    rotulos = corpus.indice_trilha_por_ponto()
+    mesma_trilha = rotulos[1:] == rotulos[:-1]
+    trilha_do_par = rotulos[1:]
+
+    # ------------------------------------------------------------
+    # DISTÂNCIA E GANHO
+    # ------------------------------------------------------------
+
+    distancias_m = distancias_geodesicas_m(corpus.latitude, corpus.longitude)
+    distancia_km = np.bincount(
+        trilha_do_par,
+        weights=np.where(mesma_trilha & (distancias_m >= distancia_min_m), distancias_m, 0.0),
+        minlength=n
+    ) / 1000
+
+    delta = np.diff(corpus.altitude_m)
+    ganho_elevacao_m = np.bincount(
+        trilha_do_par,
+        weights=np.where(mesma_trilha & (delta >= delta_min_m), delta, 0.0),
+        minlength=n
+    )
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        inclinacao_media = np.where(
+            distancia_km > 0,
+            np.degrees(np.arctan(ganho_elevacao_m / (distancia_km * 1000))),
+            0.0
+        )
+
+    # ------------------------------------------------------------
+    # DIAS E ÍNDICE DE CONCENTRAÇÃO
+    # ------------------------------------------------------------
+
+    trilha_do_grupo, ganhos_dia = _ganhos_diarios_corpus(corpus, rotulos, delta_min_m)
+
+    n_dias = np.bincount(trilha_do_grupo, minlength=n)
+    n_tempos_validos = np.bincount(rotulos[corpus.tempo_ns != NAT_NS], minlength=n)
+    dias_trilha = np.where(n_tempos_validos < 2, 1, np.maximum(n_dias, 1))
+
+    soma = np.bincount(trilha_do_grupo, weights=ganhos_dia, minlength=n)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        media = np.where(n_dias > 0, soma / n_dias, 0.0)
+        variancia = np.bincount(
+            trilha_do_grupo,
+            weights=(ganhos_dia - media[trilha_do_grupo]) ** 2,
+            minlength=n
+        ) / np.maximum(n_dias, 1)
+        indice_concentracao = np.where(
+            (n_dias > 1) & (media != 0),
+            np.sqrt(variancia) / media,
+            0.0
+        )
+
+    # ------------------------------------------------------------
+    # TOBLER E INTENSIDADE DIÁRIA
+    # ------------------------------------------------------------
+
+    distancia_por_dia = distancia_km / dias_trilha
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ganho_por_km = np.where(distancia_km > 0, ganho_elevacao_m / distancia_km, 0.0)
+
+        tempo_estimado_dia_min = estimar_tempo_tobler_min(distancia_por_dia, inclinacao_media)
+
+        tempo_por_km_dia = np.where(
+            distancia_por_dia > 0,
+            tempo_estimado_dia_min / distancia_por_dia,
+            0.0
+        )
+
+    intensidade_diaria = tempo_por_km_dia + ganho_por_km / 100 + inclinacao_media
+
+    inicios = corpus.offsets[:-1]
+
+    return pd.DataFrame({
+        'trilha': corpus.nomes,
+        'latitude_inicio': _arredondar(corpus.latitude[inicios], 6),
+        'longitude_inicio': _arredondar(corpus.longitude[inicios], 6),
+        'distancia_km': _arredondar(distancia_km, 3),
+        'ganho_elevacao_m': _arredondar(ganho_elevacao_m, 1),
+        'inclinacao_media_graus': _arredondar(inclinacao_media, 2),
+        'dias_trilha': dias_trilha.astype(int),
+        'tipo_trilha': np.where(dias_trilha == 1, 'single_day', 'multi_day'),
+        'intensidade_diaria': _arredondar(intensidade_diaria, 3),
+        'indice_concentracao_esforco': _arredondar(indice_concentracao, 3)
+    }, columns=COLUNAS_RESULTADO)
+
+
+# ------------------------------------------------------------
+# PIPELINE EM BLOCOS
+# ------------------------------------------------------------
+
+def processar_corpus_gpx(
+    caminho_pasta_gpx: str,
+    arquivos: list = None,
+    trilhas_por_bloco: int = 5000
+) -> pd.DataFrame:
+    """
+    Objetivo: Alternativa a 'processar_pasta_gpx' para acervos com muitas trilhas curtas.
+    Entrada:
+        - caminho_pasta_gpx: Pasta raiz dos GPX.
+        - arquivos: Lista de trabalho (padrão: varredura recursiva).
+        - trilhas_por_bloco: Quantas trilhas são concatenadas por chamada ao motor em lote
+          (limita a memória do array plano).
+    Processamento:
+        1. Lê as trilhas do bloco (o parse continua sendo por arquivo).
+        2. Concatena no layout irregular e calcula todas as métricas de uma vez.
+    Saída: pd.DataFrame no mesmo formato de 'processar_pasta_gpx'.
+    """
+    if arquivos is None:
+        arquivos = descobrir_arquivos_gpx(caminho_pasta_gpx)
+
+    caminhos = [
+        arquivo if isinstance(arquivo, str) else arquivo.caminho_relativo
+        for arquivo in arquivos
+    ]
+    caminhos = [caminho for caminho in caminhos if eh_membro_gpx(caminho)]
+
+    blocos = []
+
+    for inicio in range(0, len(caminhos), trilhas_por_bloco):
+        nomes = []
+        trilhas = []
+
+        for caminho in caminhos[inicio:inicio + trilhas_por_bloco]:
+            try:
+                trilhas.append(ler_gpx_trilha(os.path.join(caminho_pasta_gpx, caminho)))
+                nomes.append(nome_trilha(caminho))
+            except Exception as erro:
+                print(f"Erro ao processar {caminho}: {erro}")
+
+        blocos.append(calcular_metricas_corpus(concatenar_trilhas(nomes, trilhas)))
+
+    if not blocos:
+        return pd.DataFrame(columns=COLUNAS_RESULTADO)
+
+    return pd.concat(blocos, ignore_index=True)
@@ -1,110 +1,226 @@
 from geopy.distance import geodesic
+import numpy as np
 import pandas as pd
 
+from src.trilha import Trilha, NAT_NS, como_trilha
 
 
+# Elipsoide WGS-84 (o mesmo utilizado por padrão no geopy.distance.geodesic)
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = WGS84_A * (1 - WGS84_F)
+
+
+def distancias_geodesicas_m(
+    latitudes: np.ndarray,
+    longitudes: np.ndarray,
+    max_iteracoes: int = 200,
+    tolerancia: float = 1e-12
+) -> np.ndarray:
+    """
+    Objetivo: Calcular, de forma vetorizada, a distância geodésica entre pontos consecutivos.
+    Entrada: Arrays de latitude e longitude (graus) com N pontos.
+    Processamento:
+        1. Resolve o problema inverso de Vincenty sobre o elipsoide WGS-84 para todos
+           os pares (i-1, i) simultaneamente, iterando apenas os pares não convergidos.
+        2. Pares que não convergem (quase antipodais) são recalculados com o geopy.
+    Saída: Array float64 com N-1 distâncias em metros.
+    """
+    lat = np.asarray(latitudes, dtype=np.float64)
+    lon = np.asarray(longitudes, dtype=np.float64)
+
+    if len(lat) < 2:
+        return np.zeros(0, dtype=np.float64)
+
+    U = np.arctan((1 - WGS84_F) * np.tan(np.radians(lat)))
+    sinU, cosU = np.sin(U), np.cos(U)
+    sinU1, cosU1 = sinU[:-1], cosU[:-1]
+    sinU2, cosU2 = sinU[1:], cosU[1:]
+
+    L = np.radians(np.diff(lon))
+    L = (L + np.pi) % (2 * np.pi) - np.pi
+
+    lam = L.copy()
+    sin_sigma = np.zeros_like(L)
+    cos_sigma = np.ones_like(L)
+    sigma = np.zeros_like(L)
+    cos2_alpha = np.ones_like(L)
+    cos_2sigma_m = np.zeros_like(L)
+
+    pendentes = np.arange(len(L))
+
+    for _ in range(max_iteracoes):
+        if len(pendentes) == 0:
+            break
+
+        s1, c1, s2, c2 = sinU1[pendentes], cosU1[pendentes], sinU2[pendentes], cosU2[pendentes]
+        lam_p = lam[pendentes]
+        sin_lam, cos_lam = np.sin(lam_p), np.cos(lam_p)
+
+        sin_sig = np.hypot(c2 * sin_lam, c1 * s2 - s1 * c2 * cos_lam)
+        cos_sig = s1 * s2 + c1 * c2 * cos_lam
+        sig = np.arctan2(sin_sig, cos_sig)
+
+        coincidentes = sin_sig == 0
+        sin_sig_seguro = np.where(coincidentes, 1.0, sin_sig)
+
+        sin_alpha = np.where(coincidentes, 0.0, c1 * c2 * sin_lam / sin_sig_seguro)
+        c2a = 1 - sin_alpha ** 2
+        c2sm = np.where(c2a != 0, cos_sig - 2 * s1 * s2 / np.where(c2a != 0, c2a, 1.0), 0.0)
+
+        C = WGS84_F / 16 * c2a * (4 + WGS84_F * (4 - 3 * c2a))
+        lam_novo = L[pendentes] + (1 - C) * WGS84_F * sin_alpha * (
+            sig + C * sin_sig * (c2sm + C * cos_sig * (-1 + 2 * c2sm ** 2))
+        )
+
+        sin_sigma[pendentes] = sin_sig
+        cos_sigma[pendentes] = cos_sig
+        sigma[pendentes] = sig
+        cos2_alpha[pendentes] = c2a
+        cos_2sigma_m[pendentes] = c2sm
+
+        convergiu = (np.abs(lam_novo - lam_p) <= tolerancia) | coincidentes
+        lam[pendentes] = lam_novo
+        pendentes = pendentes[~convergiu]
+
+    u2 = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+    A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+    B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+    delta_sigma = B * sin_sigma * (
+        cos_2sigma_m + B / 4 * (
+            cos_sigma * (-1 + 2 * cos_2sigma_m ** 2)
+            - B / 6 * cos_2sigma_m * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sigma_m ** 2)
+        )
+    )
+
+    distancias = WGS84_B * A * (sigma - delta_sigma)
+
+    for i in pendentes:
+        distancias[i] = geodesic((lat[i], lon[i]), (lat[i + 1], lon[i + 1])).meters
+
+    return distancias
+
 
 def calcular_tempo_ativo_min(
-    dados: pd.DataFrame,
+    dados,
     vmin_kmh: float = 0.5,
     vmax_kmh: float = 7.0
 ) -> float:
     """
     Objetivo: Calcular o tempo de movimento efetivo dentro de padrões biomecânicos.
-    Entrada: 
-        - dados: pd.DataFrame com colunas ['latitude', 'longitude', 'time'].
+    Entrada:
+        - dados: Trilha ou pd.DataFrame com colunas ['latitude', 'longitude', 'time'].
         - vmin_kmh: Velocidade mínima (humanamente plausível para trilha).
         - vmax_kmh: Velocidade máxima (limite de corrida/movimento rápido).
-    Processamento: 
-        1. Itera entre pontos consecutivos calculando a distância geodésica.
+    Processamento:
+        1. Calcula a distância geodésica de todos os pares consecutivos de uma vez.
         2. Calcula a velocidade instantânea entre os pontos.
         3. Acumula o delta temporal apenas se a velocidade estiver no intervalo [vmin, vmax].
     Saída: Float representando o tempo ativo acumulado em minutos.
     """
-    if 'time' not in dados.columns:
+    if isinstance(dados, pd.DataFrame) and 'time' not in dados.columns:
         return None
 
-    tempo_ativo_min = 0.0
-
-    for i in range(1, len(dados)):
-        p0 = dados.iloc[i - 1]
-        p1 = dados.iloc[i]
+    trilha = como_trilha(dados)
 
-        if pd.isna(p0['time']) or pd.isna(p1['time']):
-            continue
+    tempos = trilha.tempo_ns
+    validos = (tempos[1:] != NAT_NS) & (tempos[:-1] != NAT_NS)
+    delta_t_h = np.where(validos, np.diff(tempos), 0) / 3.6e12
 
-        delta_t_h = (p1['time'] - p0['time']).total_seconds() / 3600
-        if delta_t_h <= 0:
-            continue
+    distancia_km = distancias_geodesicas_m(trilha.latitude, trilha.longitude) / 1000
 
-        distancia_km = geodesic(
-            (p0['latitude'], p0['longitude']),
-            (p1['latitude'], p1['longitude'])
-        ).km
+    positivos = delta_t_h > 0
+    velocidade_kmh = np.divide(
+        distancia_km,
+        delta_t_h,
+        out=np.zeros_like(distancia_km),
+        where=positivos
+    )
 
-        velocidade_kmh = distancia_km / delta_t_h if delta_t_h > 0 else 0
-
-        if vmin_kmh <= velocidade_kmh <= vmax_kmh:
-            tempo_ativo_min += delta_t_h * 60
+    ativos = positivos & (velocidade_kmh >= vmin_kmh) & (velocidade_kmh <= vmax_kmh)
+    tempo_ativo_min = float(delta_t_h[ativos].sum() * 60)
 
     return round(tempo_ativo_min, 2)
 
 def calcular_distancia_total_km(
-    dados: pd.DataFrame,
+    dados,
     distancia_min_m: float = 1.0
 ) -> float:
     """
     Objetivo: Determinar a quilometragem total percorrida no plano horizontal.
-    Entrada: 
-        - dados: pd.DataFrame com ['latitude', 'longitude'].
+    Entrada:
+        - dados: Trilha ou pd.DataFrame com ['latitude', 'longitude'].
         - distancia_min_m: Filtro de ruído (ignora micro-movimentos do sinal GPS).
-    Processamento: 
-        1. Utiliza a biblioteca geopy para calcular a distância geodésica entre pontos 'i' e 'i-1'.
+    Processamento:
+        1. Calcula a distância geodésica (WGS-84) entre todos os pares 'i' e 'i-1' de forma vetorizada.
         2. Soma as distâncias que superam o limiar de ruído configurado.
     Saída: Float representando a distância total em quilômetros.
     """
-    distancia_total_m = 0.0
-
-    for i in range(1, len(dados)):
-        ponto_anterior = (
-            dados.loc[i - 1, 'latitude'],
-            dados.loc[i - 1, 'longitude']
-        )
-        ponto_atual = (
-            dados.loc[i, 'latitude'],
-            dados.loc[i, 'longitude']
-        )
+    if isinstance(dados, Trilha):
+        latitudes, longitudes = dados.latitude, dados.longitude
+    else:
+        latitudes, longitudes = dados['latitude'].to_numpy(), dados['longitude'].to_numpy()
 
-        d = geodesic(ponto_anterior, ponto_atual).meters
+    d = distancias_geodesicas_m(latitudes, longitudes)
 
-        if d >= distancia_min_m:
-            distancia_total_m += d
+    distancia_total_m = float(d[d >= distancia_min_m].sum())
 
     return distancia_total_m / 1000
 
 
 def calcular_ganho_elevacao_m(
-    dados: pd.DataFrame,
+    dados,
     delta_min_m: float = 3.0
 ) -> float:
     """
     Objetivo: Calcular o ganho acumulado de elevação positiva (desnível positivo).
-    Entrada: 
-        - dados: pd.DataFrame com a coluna 'altitude_m'.
+    Entrada:
+        - dados: Trilha ou pd.DataFrame com a coluna 'altitude_m'.
         - delta_min_m: Limiar de variação para filtrar ruídos de sensores barométricos.
-    Processamento: 
+    Processamento:
         1. Analisa a série temporal de altitudes.
         2. Soma apenas as variações positivas (subidas) que excedem o limiar de 3m.
     Saída: Float representando o ganho total em metros.
     """
-    ganho = 0.0
-    altitudes = dados['altitude_m'].values
+    if isinstance(dados, Trilha):
+        altitudes = dados.altitude_m
+    else:
+        altitudes = dados['altitude_m'].to_numpy()
+
+    delta = np.diff(np.asarray(altitudes, dtype=np.float64))
+
+    return float(delta[delta >= delta_min_m].sum())
+
+
+def calcular_ganhos_diarios_m(
+    dados,
+    delta_min_m: float = 3.0
+) -> np.ndarray:
+    """
+    Objetivo: Calcular o ganho de elevação de cada dia (UTC) da trilha.
+    Entrada: Trilha ou pd.DataFrame com colunas 'time' e 'altitude_m'.
+    Processamento:
+        1. Descarta pontos sem tempo e agrupa os demais por dia, preservando a ordem original.
+        2. Soma as subidas acima do limiar apenas entre pontos consecutivos do mesmo dia
+           (redução segmentada via bincount).
+    Saída: Array float64 com um ganho por dia, em ordem cronológica.
+    """
+    trilha = como_trilha(dados)
+
+    validos = trilha.mascara_tempo_valido()
+    dias = trilha.tempo_ns[validos] // (86_400 * 10**9)
+
+    if len(dias) == 0:
+        return np.zeros(0, dtype=np.float64)
 
-    for i in range(1, len(altitudes)):
-        delta = altitudes[i] - altitudes[i - 1]
+    ordem = np.argsort(dias, kind='stable')
+    dias = dias[ordem]
+    altitudes = np.asarray(trilha.altitude_m[validos], dtype=np.float64)[ordem]
 
-        if delta >= delta_min_m:
-            ganho += delta
+    novo_dia = np.concatenate(([True], dias[1:] != dias[:-1]))
+    grupo = np.cumsum(novo_dia) - 1
 
-    return float(ganho)
+    delta = np.diff(altitudes)
+    contribuicao = np.where((~novo_dia[1:]) & (delta >= delta_min_m), delta, 0.0)
 
+    return np.bincount(grupo[1:], weights=contribuicao, minlength=int(grupo[-1]) + 1)
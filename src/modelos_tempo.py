@@ -19,7 +19,7 @@ def estimar_tempo_naismith_min(distancia_km: float, ganho_elevacao_m: float) ->
 def estimar_tempo_tobler_min(distancia_km: float, inclinacao_media_graus: float) -> float:
     """
     Objetivo: Estimar o tempo baseado na fisiologia de deslocamento (Tobler's Hiking Function).
-    Entrada: Distância em km e Inclinação média em graus.
+    Entrada: Distância em km e Inclinação média em graus (escalares ou arrays, um valor por trilha).
     Mecânica: 
         - Calcula a velocidade exponencial: V = 6 * exp(-3.5 * |tan(theta) + 0.05|).
         - Aplica limite mínimo de 0.1 km/h para evitar divisões por zero ou valores absurdos.
@@ -32,7 +32,7 @@ def estimar_tempo_tobler_min(distancia_km: float, inclinacao_media_graus: float)
     velocidade_kmh = 6 * np.exp(-3.5 * np.abs(np.tan(inclinacao_rad) + 0.05))
 
     # Evita velocidades irrealistas
-    velocidade_kmh = max(velocidade_kmh, 0.1)
+    velocidade_kmh = np.maximum(velocidade_kmh, 0.1)
 
     # Tempo = distância / velocidade
     tempo_horas = distancia_km / velocidade_kmh
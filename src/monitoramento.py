@@ -0,0 +1,510 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.analise_trilha import calcular_metricas_trilha, ler_trilha_corrigida
+from src.clustering_dificuldade import (
+    classificar_dificuldade_kmeans,
+    carregar_modelo_dificuldade,
+    prever_dificuldade
+)
+from src.descoberta_arquivos import (
+    PADROES_GPX,
+    ArquivoDescoberto,
+    carregar_lista_trabalho,
+    descobrir_arquivos_gpx,
+    salvar_lista_trabalho
+)
+from src.indice_espacial import IndiceEspacial, caixa_trilha, carregar_indice_espacial
+from src.leitura_gpx import nome_trilha
+from src.niveis_detalhe import ArmazemNiveisDetalhe, carregar_armazem_detalhe, simplificar_niveis
+from src.similaridade import carregar_indice_similaridade, construir_indice_similaridade
+from src.telemetria import Telemetria, medir_arquivo, medir_etapa
+
+
+# ------------------------------------------------------------
+# GRAVAÇÃO INCREMENTAL DOS CSVs
+# ------------------------------------------------------------
+
+def atualizar_csv(caminho_csv: str, novos: pd.DataFrame) -> np.ndarray:
+    """
+    Objetivo: Incorporar linhas novas a um CSV de trilhas.
+    Processamento:
+        1. Arquivo inexistente: grava com cabeçalho.
+        2. Só trilhas inéditas: anexa ao final (sem reler a tabela inteira), nas colunas do cabeçalho.
+        3. Alguma trilha já presente (GPX alterado): reescreve a tabela trocando a linha antiga no
+           mesmo lugar (as posições registradas no índice espacial continuam válidas), via arquivo
+           temporário + 'os.replace' (quem lê o CSV nunca vê um arquivo pela metade).
+    Saída: Array com a linha de cada trilha de 'novos' na tabela gravada.
+    """
+    if not os.path.exists(caminho_csv):
+        novos.to_csv(caminho_csv, index=False, encoding='utf-8')
+        return np.arange(len(novos))
+
+    existentes = pd.read_csv(caminho_csv, usecols=['trilha'])['trilha']
+
+    if not existentes.isin(novos['trilha']).any():
+        colunas = pd.read_csv(caminho_csv, nrows=0).columns
+        novos.reindex(columns=colunas).to_csv(
+            caminho_csv,
+            mode='a',
+            header=False,
+            index=False,
+            encoding='utf-8'
+        )
+        return len(existentes) + np.arange(len(novos))
+
+    tabela = pd.read_csv(caminho_csv)
+
+    posicoes = {}
+    for linha, trilha in enumerate(tabela['trilha']):
+        posicoes.setdefault(trilha, linha)
+
+    linhas = np.array([posicoes.get(trilha, -1) for trilha in novos['trilha']], dtype=np.int64)
+    alteradas = linhas >= 0
+    linhas[~alteradas] = len(tabela) + np.arange((~alteradas).sum())
+
+    tabela = pd.concat([tabela, novos[~alteradas]], ignore_index=True)
+    tabela.loc[linhas[alteradas], novos.columns] = novos[alteradas].to_numpy()
+
+    temporario = caminho_csv + '.tmp'
+    tabela.to_csv(temporario, index=False, encoding='utf-8')
+    os.replace(temporario, caminho_csv)
+
+    return linhas
+
+
+# ------------------------------------------------------------
+# MONITOR DA PASTA GPX
+# ------------------------------------------------------------
+
+class MonitorPasta:
+    """
+    Objetivo: Ingerir e classificar continuamente os GPX que chegam à pasta, sem reexecutar o
+              pipeline inteiro.
+    Estrutura:
+        - Polling: a cada ciclo, um instantâneo (caminho -> tamanho, mtime) via
+          'descobrir_arquivos_gpx' é comparado ao estado processado; funciona em sistemas de
+          arquivos de rede, onde notificações do sistema operacional não são confiáveis.
+        - Debounce: um arquivo novo/alterado só é lido depois de manter tamanho e mtime por
+          'debounce_s' segundos (cópias e uploads ainda em andamento são aguardados).
+        - Estado: CSV no formato de 'salvar_lista_trabalho' com o stat de cada GPX já
+          processado (retomada após reinício sem reprocessar a pasta).
+        - Classificação: novas trilhas recebem a dificuldade do modelo K-Means salvo.
+        - Índices: quando informados, o índice espacial, o armazém de níveis de detalhe e o índice
+          de similaridade salvos pelo pipeline são atualizados a cada ingestão (GPX alterado
+          mantém sua linha na tabela e sua posição no armazém).
+        - Elevação: 'corretor_elevacao' opcional, o mesmo do lote (métricas comparáveis às do treino).
+        - Reajuste completo do K-Means: por agenda ('intervalo_reajuste_s') ou por drift
+          (distância quadrática média das trilhas novas ao centroide mais próximo acima de
+          'limiar_drift' vezes a média do treino).
+    Limitações:
+        - Pacotes .zip/.tar não são monitorados (apenas .gpx e .gpx.gz).
+        - Quase duplicatas não são verificadas na ingestão: o pipeline não salva o
+          'IndiceDuplicatas', então não há acervo contra o qual comparar as trilhas novas.
+    """
+
+    def __init__(
+        self,
+        pasta_gpx: str,
+        caminho_analise: str,
+        caminho_classificado: str,
+        caminho_modelo: str,
+        caminho_estado: str = None,
+        n_clusters: int = 5,
+        debounce_s: float = 30.0,
+        intervalo_reajuste_s: float = 24 * 3600,
+        limiar_drift: float = 1.5,
+        min_trilhas_drift: int = 50,
+        caminho_indice_similaridade: str = None,
+        telemetria: Telemetria = None,
+        recursivo: bool = True,
+        corretor_elevacao=None,
+        caminho_indice_espacial: str = None,
+        caminho_detalhe: str = None
+    ):
+        self.pasta_gpx = pasta_gpx
+        self.caminho_analise = caminho_analise
+        self.caminho_classificado = caminho_classificado
+        self.caminho_modelo = caminho_modelo
+        self.caminho_estado = caminho_estado or os.path.splitext(caminho_analise)[0] + '_monitor.csv'
+        self.n_clusters = n_clusters
+        self.debounce_s = debounce_s
+        self.intervalo_reajuste_s = intervalo_reajuste_s
+        self.limiar_drift = limiar_drift
+        self.min_trilhas_drift = min_trilhas_drift
+        self.caminho_indice_similaridade = caminho_indice_similaridade
+        self.telemetria = telemetria
+        self.recursivo = recursivo
+        self.corretor_elevacao = corretor_elevacao
+        self.caminho_indice_espacial = caminho_indice_espacial
+        self.caminho_detalhe = caminho_detalhe
+
+        # Arquivo -> (tamanho, mtime) já processado / aguardando estabilizar (stat, desde quando)
+        self.processados = {}
+        self.candidatos = {}
+
+        self.modelo = None
+        self.referencia_drift = None
+        self.distancias_novas = []
+        self.novas_desde_reajuste = 0
+        self.ultimo_reajuste = time.time()
+
+        self._carregar_estado()
+        self._carregar_modelo()
+
+    # ------------------------------------------------------------
+    # ESTADO E MODELO
+    # ------------------------------------------------------------
+
+    def _instantaneo(self) -> dict:
+        arquivos = descobrir_arquivos_gpx(
+            self.pasta_gpx,
+            incluir=PADROES_GPX,
+            recursivo=self.recursivo,
+            tamanho_min_bytes=0
+        )
+        return {
+            arquivo.caminho_relativo: (arquivo.tamanho_bytes, arquivo.mtime_ns)
+            for arquivo in arquivos
+        }
+
+    def _carregar_estado(self) -> None:
+        """
+        Objetivo: Retomar o estado salvo ou, na primeira execução, considerar processados os GPX
+                  cujas trilhas já constam no CSV de análise (saída do pipeline completo).
+        """
+        if os.path.exists(self.caminho_estado):
+            self.processados = {
+                arquivo.caminho_relativo: (arquivo.tamanho_bytes, arquivo.mtime_ns)
+                for arquivo in carregar_lista_trabalho(self.caminho_estado)
+            }
+            return
+
+        if not os.path.exists(self.caminho_analise):
+            return
+
+        conhecidas = set(pd.read_csv(self.caminho_analise, usecols=['trilha'])['trilha'])
+        self.processados = {
+            caminho: stat
+            for caminho, stat in self._instantaneo().items()
+            if nome_trilha(caminho) in conhecidas
+        }
+        self._salvar_estado()
+
+    def _salvar_estado(self) -> None:
+        salvar_lista_trabalho(
+            [ArquivoDescoberto(caminho, *stat) for caminho, stat in sorted(self.processados.items())],
+            self.caminho_estado
+        )
+
+    def _carregar_modelo(self) -> None:
+        if not os.path.exists(self.caminho_modelo):
+            self.modelo = None
+            return
+
+        self.modelo = carregar_modelo_dificuldade(self.caminho_modelo)
+
+        # Referência do drift: distância quadrática média ao centroide no próprio treino
+        kmeans = self.modelo['kmeans']
+        self.referencia_drift = kmeans.inertia_ / len(kmeans.labels_)
+
+    # ------------------------------------------------------------
+    # CICLO DE POLLING
+    # ------------------------------------------------------------
+
+    def ciclo(self, agora: float = None) -> int:
+        """
+        Objetivo: Uma rodada de polling.
+        Processamento:
+            1. Compara o instantâneo da pasta com os arquivos processados.
+            2. Atualiza o debounce dos candidatos e processa os que estabilizaram.
+            3. Decide se o K-Means deve ser reajustado.
+        Saída: Número de trilhas novas ou alteradas incorporadas neste ciclo.
+        """
+        agora = time.time() if agora is None else agora
+        instantaneo = self._instantaneo()
+
+        for caminho in set(self.processados) - set(instantaneo):
+            print(f"Monitor: {caminho} removido da pasta (linhas existentes mantidas).")
+            del self.processados[caminho]
+
+        for caminho in set(self.candidatos) - set(instantaneo):
+            del self.candidatos[caminho]
+
+        prontos = []
+        for caminho, stat in instantaneo.items():
+            # Vazios são ignorados como no lote (um arquivo recém-criado ainda vai crescer)
+            if stat[0] == 0 or self.processados.get(caminho) == stat:
+                continue
+
+            anterior = self.candidatos.get(caminho)
+            if anterior is None or anterior[0] != stat:
+                self.candidatos[caminho] = (stat, agora)
+            elif agora - anterior[1] >= self.debounce_s:
+                prontos.append(caminho)
+
+        incorporadas = self._processar(prontos, instantaneo) if prontos else 0
+
+        motivo = self._motivo_reajuste(agora)
+        if motivo is not None:
+            self.reajustar(motivo, agora)
+
+        return incorporadas
+
+    def _processar(self, prontos: list, instantaneo: dict) -> int:
+        """
+        Objetivo: Analisar os arquivos estáveis, gravar as métricas e rotulá-las com o modelo.
+        Processamento:
+            1. Arquivos com erro também entram no estado (só são relidos se mudarem).
+            2. Métricas, caixa e níveis de detalhe de cada trilha são calculados juntos; a trilha
+               só entra na ingestão quando todos foram obtidos (tabela, índice espacial e armazém
+               recebem sempre as mesmas trilhas, na mesma ordem).
+            3. A geometria das trilhas aceitas vai ao armazém de níveis de detalhe e, com a linha
+               que cada uma recebeu no CSV de análise, ao índice espacial.
+        """
+        ingeridas = []
+        armazem = self._carregar_armazem()
+
+        with medir_etapa(self.telemetria, 'monitoramento', 'ingestao'):
+            for caminho in prontos:
+                try:
+                    with medir_arquivo(self.telemetria, caminho):
+                        nome, dados = ler_trilha_corrigida(
+                            os.path.join(self.pasta_gpx, caminho),
+                            self.telemetria,
+                            self.corretor_elevacao
+                        )
+                        resultado = calcular_metricas_trilha(nome, dados, self.telemetria)
+                        caixa = caixa_trilha(dados)
+
+                        niveis = None
+                        if armazem is not None:
+                            with medir_etapa(self.telemetria, 'detalhe', nome, len(dados)):
+                                niveis = simplificar_niveis(dados, armazem.tolerancias_m)
+
+                    ingeridas.append((resultado, caixa, niveis))
+                except Exception as erro:
+                    print(f"Erro ao processar {caminho}: {erro}")
+
+                self.processados[caminho] = instantaneo[caminho]
+                del self.candidatos[caminho]
+
+            if ingeridas:
+                resultados, caixas, niveis = zip(*ingeridas)
+                novos = pd.DataFrame(list(resultados))
+
+                if armazem is not None:
+                    for nome, niveis_trilha, caixa in zip(novos['trilha'], niveis, caixas):
+                        self._registrar_detalhe(armazem, nome, niveis_trilha, caixa)
+
+                linhas = atualizar_csv(self.caminho_analise, novos)
+                self._atualizar_indice_espacial(novos['trilha'], caixas, linhas)
+                self._classificar(novos)
+
+                if armazem is not None:
+                    armazem.salvar(self.caminho_detalhe)
+
+        self._salvar_estado()
+
+        if ingeridas:
+            print(f"Monitor: {len(ingeridas)} trilha(s) incorporada(s).")
+
+        return len(ingeridas)
+
+    # ------------------------------------------------------------
+    # ÍNDICES SALVOS PELO PIPELINE
+    # ------------------------------------------------------------
+
+    def _carregar_armazem(self) -> ArmazemNiveisDetalhe:
+        if not self.caminho_detalhe:
+            return None
+
+        if os.path.exists(self.caminho_detalhe + '.npz'):
+            return carregar_armazem_detalhe(self.caminho_detalhe)
+
+        return ArmazemNiveisDetalhe()
+
+    @staticmethod
+    def _registrar_detalhe(armazem: ArmazemNiveisDetalhe, nome: str, niveis: list, caixa: tuple) -> None:
+        if nome in armazem.nomes:
+            armazem.substituir_niveis(armazem.nomes.index(nome), nome, niveis, caixa)
+        else:
+            armazem.adicionar_niveis(nome, niveis, caixa)
+
+    def _atualizar_indice_espacial(self, nomes: pd.Series, caixas: list, linhas: np.ndarray) -> None:
+        """
+        Objetivo: Registrar as trilhas ingeridas no índice espacial com sua linha no CSV de análise.
+        Processamento: Linha já indexada (GPX alterado) tem a caixa substituída; as demais são
+                       inseridas.
+        """
+        if not self.caminho_indice_espacial:
+            return
+
+        if os.path.exists(self.caminho_indice_espacial):
+            indice = carregar_indice_espacial(self.caminho_indice_espacial)
+        else:
+            indice = IndiceEspacial()
+
+        indexadas = set(indice.linhas.tolist())
+        for nome, caixa, linha in zip(nomes, caixas, linhas.tolist()):
+            if linha in indexadas:
+                indice.substituir(nome, caixa, linha)
+            else:
+                indice.adicionar(nome, caixa, linha)
+
+        indice.salvar(self.caminho_indice_espacial)
+
+    def _atualizar_similaridade(self, classificados: pd.DataFrame) -> None:
+        """
+        Objetivo: Incluir as trilhas classificadas no índice de similaridade salvo.
+        Processamento: Trilhas inéditas entram no buffer do índice; se alguma já estava indexada
+                       (GPX alterado), o índice é reconstruído a partir do CSV classificado.
+        """
+        if os.path.exists(self.caminho_indice_similaridade):
+            indice = carregar_indice_similaridade(self.caminho_indice_similaridade, self.modelo)
+
+            if not classificados['trilha'].isin(indice.trilhas).any():
+                indice.adicionar(classificados)
+                indice.salvar(self.caminho_indice_similaridade)
+                return
+
+        construir_indice_similaridade(
+            self.caminho_classificado,
+            self.caminho_modelo,
+            self.caminho_indice_similaridade
+        )
+
+    def _classificar(self, novos: pd.DataFrame) -> None:
+        self.novas_desde_reajuste += len(novos)
+
+        if self.modelo is None:
+            return
+
+        classificados = novos.copy()
+        classificados['dificuldade'] = prever_dificuldade(self.modelo, novos)
+
+        cluster_do_rotulo = {rotulo: cluster for cluster, rotulo in self.modelo['mapa'].items()}
+        classificados['cluster'] = classificados['dificuldade'].map(cluster_do_rotulo)
+
+        atualizar_csv(self.caminho_classificado, classificados)
+
+        if self.caminho_indice_similaridade:
+            self._atualizar_similaridade(classificados)
+
+        features = novos[self.modelo['colunas']].dropna()
+        if not features.empty:
+            distancias = self.modelo['kmeans'].transform(self.modelo['scaler'].transform(features))
+            self.distancias_novas.extend((distancias.min(axis=1) ** 2).tolist())
+
+    # ------------------------------------------------------------
+    # REAJUSTE
+    # ------------------------------------------------------------
+
+    def indice_drift(self) -> float:
+        """
+        Objetivo: Razão entre a distância quadrática média das trilhas novas ao centroide mais
+                  próximo e a do treino (1.0 = mesma dispersão; acima, dados fora do modelo).
+        Saída: Float ou None sem modelo/trilhas novas (ou com treino sem dispersão).
+        """
+        if not self.referencia_drift or not self.distancias_novas:
+            return None
+
+        return float(np.mean(self.distancias_novas) / self.referencia_drift)
+
+    def _motivo_reajuste(self, agora: float) -> str:
+        if self.novas_desde_reajuste == 0:
+            return None
+
+        if self.modelo is None:
+            return 'sem modelo'
+
+        if self.intervalo_reajuste_s is not None and agora - self.ultimo_reajuste >= self.intervalo_reajuste_s:
+            return 'agendado'
+
+        drift = self.indice_drift()
+        if (
+            drift is not None
+            and len(self.distancias_novas) >= self.min_trilhas_drift
+            and drift >= self.limiar_drift
+        ):
+            return f'drift {drift:.2f}'
+
+        return None
+
+    def reajustar(self, motivo: str = 'manual', agora: float = None) -> None:
+        """
+        Objetivo: Reajustar o K-Means em toda a tabela de análise e recarregar o modelo.
+        Processamento: Reclassifica o CSV (e grava as métricas), salva o novo modelo e, se
+                       configurado, reconstrói o índice de similaridade (o scaler mudou).
+        """
+        total = len(pd.read_csv(self.caminho_analise, usecols=['trilha']))
+        if total < self.n_clusters:
+            return
+
+        print(f"Monitor: reajustando K-Means ({motivo}, {total} trilhas)...")
+
+        with medir_etapa(self.telemetria, 'monitoramento', 'reajuste'):
+            classificar_dificuldade_kmeans(
+                caminho_csv_entrada=self.caminho_analise,
+                caminho_csv_saida=self.caminho_classificado,
+                n_clusters=self.n_clusters,
+                caminho_modelo=self.caminho_modelo
+            )
+
+            if self.caminho_indice_similaridade:
+                construir_indice_similaridade(
+                    self.caminho_classificado,
+                    self.caminho_modelo,
+                    self.caminho_indice_similaridade
+                )
+
+        self._carregar_modelo()
+        self.distancias_novas = []
+        self.novas_desde_reajuste = 0
+        self.ultimo_reajuste = time.time() if agora is None else agora
+
+    # ------------------------------------------------------------
+    # EXECUÇÃO CONTÍNUA
+    # ------------------------------------------------------------
+
+    def executar(self, intervalo_s: float = 10.0, max_ciclos: int = None) -> None:
+        """
+        Objetivo: Laço de polling até Ctrl+C (ou 'max_ciclos' rodadas).
+        """
+        print(f"Monitorando {self.pasta_gpx} a cada {intervalo_s:.0f} s (Ctrl+C para encerrar)...")
+        ciclos = 0
+
+        try:
+            while max_ciclos is None or ciclos < max_ciclos:
+                try:
+                    self.ciclo()
+                except Exception as erro:
+                    print(f"Erro no ciclo de monitoramento: {erro}")
+
+                ciclos += 1
+                if max_ciclos is None or ciclos < max_ciclos:
+                    time.sleep(intervalo_s)
+
+        except KeyboardInterrupt:
+            pass
+
+        print("Monitoramento encerrado.")
+
+
+def monitorar_pasta(
+    pasta_gpx: str,
+    caminho_analise: str,
+    caminho_classificado: str,
+    caminho_modelo: str,
+    intervalo_s: float = 10.0,
+    **opcoes
+) -> MonitorPasta:
+    """
+    Objetivo: Atalho para criar o monitor e executá-lo (ver 'MonitorPasta' para as opções).
+    """
+    monitor = MonitorPasta(pasta_gpx, caminho_analise, caminho_classificado, caminho_modelo, **opcoes)
+    monitor.executar(intervalo_s)
+    return monitor
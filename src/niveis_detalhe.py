@@ -0,0 +1,314 @@
+import os
+
+import numpy as np
+
+from src.indice_espacial import KM_POR_GRAU, IndiceEspacial, caixa_trilha, carregar_indice_espacial
+from src.trilha import como_trilha
+
+
+M_POR_GRAU = KM_POR_GRAU * 1000
+
+# Tolerâncias de Douglas-Peucker (m) de cada nível, do mais detalhado ao mais grosseiro
+TOLERANCIAS_DETALHE_M = (10.0, 40.0, 160.0, 640.0, 2560.0)
+
+
+# ------------------------------------------------------------
+# SIMPLIFICAÇÃO (DOUGLAS-PEUCKER)
+# ------------------------------------------------------------
+
+def importancia_douglas_peucker(latitude, longitude, tolerancia_min_m: float = 0.0) -> np.ndarray:
+    """
+    Objetivo: Calcular, em uma única passada, a maior tolerância em que cada ponto sobrevive à
+              simplificação de Douglas-Peucker.
+    Entrada: Arrays de latitude e longitude (graus) e a menor tolerância de interesse (m).
+    Processamento:
+        1. Projeta os pontos no plano local (equiretangular na latitude média, em metros).
+        2. Divide cada trecho no ponto mais distante do segmento entre suas pontas; a importância
+           desse ponto é o mínimo entre essa distância e a importância do ponto que originou o
+           trecho (a divisão só ocorre se a do pai ocorreu).
+        3. Todos os trechos abertos de uma mesma profundidade são resolvidos juntos (distâncias
+           vetorizadas e máximo por trecho com 'np.maximum.reduceat'): o laço Python percorre as
+           profundidades da recursão, não os pontos escolhidos.
+        4. Trechos cujo desvio máximo não passa de 'tolerancia_min_m' são fechados.
+    Saída: Array float64 (m); as pontas valem inf e pontos nunca escolhidos valem 0. A trilha
+           simplificada com tolerância t é 'importancia > t', para qualquer t >= tolerancia_min_m.
+    """
+    latitude = np.asarray(latitude, dtype=np.float64)
+    longitude = np.asarray(longitude, dtype=np.float64)
+    n = len(latitude)
+
+    importancia = np.zeros(n)
+    if n == 0:
+        return importancia
+
+    importancia[0] = importancia[-1] = np.inf
+
+    y = latitude * M_POR_GRAU
+    x = longitude * M_POR_GRAU * np.cos(np.radians(np.nanmean(latitude)))
+
+    # Estado de cada trecho indexado pelo ponto onde ele começa
+    limite = np.full(n, np.inf)
+    aberto = np.zeros(n, dtype=bool)
+    aberto[0] = True
+    cortes = np.array([0, n - 1], dtype=np.int64)
+
+    while True:
+        inicio, fim = cortes[:-1], cortes[1:]
+        ativos = aberto[inicio] & (fim - inicio >= 2)
+        if not ativos.any():
+            break
+
+        inicio, fim = inicio[ativos], fim[ativos]
+        tamanhos = fim - inicio - 1
+        primeiros = np.cumsum(tamanhos) - tamanhos
+        trecho = np.repeat(np.arange(len(inicio)), tamanhos)
+        pontos = inicio[trecho] + 1 + np.arange(len(trecho)) - primeiros[trecho]
+
+        a, b = inicio[trecho], fim[trecho]
+        dx, dy = x[b] - x[a], y[b] - y[a]
+        px, py = x[pontos] - x[a], y[pontos] - y[a]
+        comprimento2 = dx * dx + dy * dy
+
+        # Distância ao segmento (não à reta: trilhas circulares têm pontas coincidentes)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            t = np.where(comprimento2 > 0, np.clip((px * dx + py * dy) / comprimento2, 0.0, 1.0), 0.0)
+        distancias = np.hypot(px - t * dx, py - t * dy)
+
+        maximos = np.maximum.reduceat(distancias, primeiros)
+        posicoes = np.flatnonzero(distancias == maximos[trecho])
+        _, primeira = np.unique(trecho[posicoes], return_index=True)
+        meios = pontos[posicoes[primeira]]
+
+        dividir = maximos > tolerancia_min_m
+        aberto[inicio[~dividir]] = False
+
+        inicio, meios = inicio[dividir], meios[dividir]
+        importancia[meios] = np.minimum(maximos[dividir], limite[inicio])
+        limite[inicio] = limite[meios] = importancia[meios]
+        aberto[meios] = True
+
+        cortes = np.sort(np.concatenate([cortes, meios]))
+
+    return importancia
+
+
+def simplificar_niveis(dados, tolerancias_m=TOLERANCIAS_DETALHE_M) -> list:
+    """
+    Objetivo: Pontos (longitude, latitude) float32 da trilha em cada nível de tolerância.
+    Entrada: Trilha (ou pd.DataFrame) e tolerâncias (m) em ordem crescente.
+    Processamento: Uma única passada de Douglas-Peucker (ver 'importancia_douglas_peucker');
+                   cada nível é um corte da importância dos pontos.
+    Saída: Lista com um array (pontos, 2) por nível.
+    """
+    trilha = como_trilha(dados)
+    importancia = importancia_douglas_peucker(trilha.latitude, trilha.longitude, tolerancias_m[0])
+
+    pontos = np.column_stack([trilha.longitude, trilha.latitude]).astype(np.float32)
+    return [pontos[importancia > tolerancia] for tolerancia in tolerancias_m]
+
+
+# ------------------------------------------------------------
+# ARMAZÉM MULTIRRESOLUÇÃO
+# ------------------------------------------------------------
+
+class ArmazemNiveisDetalhe:
+    """
+    Objetivo: Guardar a geometria de todo o acervo em várias resoluções para mapas de visão geral
+              (plotar as trilhas em resolução total é inviável com dezenas de milhares delas).
+    Estrutura:
+        - Um nível por tolerância de 'tolerancias_m' (nível 0 = mais detalhado).
+        - Cada nível no layout irregular de 'CorpusTrilhas': 'coordenadas[nivel]' (pontos, 2)
+          float32 com (longitude, latitude) e 'offsets[nivel]' com N+1 posições.
+        - 'indice': IndiceEspacial (grade de tiles) com a caixa de cada trilha; a linha registrada
+          é a posição da trilha no armazém.
+        - Armazém reaberto do disco: cada nível só é lido do '.npz' na primeira consulta que o usa.
+    Uso: 'adicionar_trilha' durante a ingestão (ver 'armazem_detalhe' em 'processar_pasta_gpx'),
+         'substituir_trilha' para GPX alterados (ver 'MonitorPasta'), 'consultar' para as trilhas visíveis em uma janela no nível adequado à resolução.
+    """
+
+    def __init__(self, tolerancias_m=TOLERANCIAS_DETALHE_M, tamanho_celula_graus: float = 0.05):
+        self.tolerancias_m = tuple(sorted(float(tolerancia) for tolerancia in tolerancias_m))
+        self.indice = IndiceEspacial(tamanho_celula_graus)
+        self.nomes = []
+
+        self.coordenadas = [np.zeros((0, 2), dtype=np.float32) for _ in self.tolerancias_m]
+        self.offsets = [np.zeros(1, dtype=np.int64) for _ in self.tolerancias_m]
+        self._pendentes = [[] for _ in self.tolerancias_m]
+        self._caminho_npz = None
+
+    def __len__(self) -> int:
+        return len(self.nomes)
+
+    # ------------------------------------------------------------
+    # CONSTRUÇÃO
+    # ------------------------------------------------------------
+
+    def adicionar_trilha(self, nome: str, dados) -> None:
+        """
+        Objetivo: Simplificar a trilha em todos os níveis e registrá-la no índice de tiles.
+        """
+        trilha = como_trilha(dados)
+        self.adicionar_niveis(nome, simplificar_niveis(trilha, self.tolerancias_m), caixa_trilha(trilha))
+
+    def adicionar_niveis(self, nome: str, niveis: list, caixa: tuple) -> None:
+        """
+        Objetivo: Registrar uma trilha já simplificada (ex.: membros de pacotes, simplificados
+                  nos workers com 'simplificar_niveis' e as mesmas 'tolerancias_m').
+        Entrada: Nome, um array (pontos, 2) por nível e a caixa (lat_min, lat_max, lon_min, lon_max).
+        """
+        if len(niveis) != len(self.tolerancias_m):
+            raise ValueError(f"Esperados {len(self.tolerancias_m)} níveis de detalhe, recebidos {len(niveis)}.")
+
+        for nivel, pontos in enumerate(niveis):
+            self._pendentes[nivel].append(pontos)
+
+        self.indice.adicionar(nome, caixa, len(self.nomes))
+        self.nomes.append(nome)
+
+    def substituir_trilha(self, posicao: int, nome: str, dados) -> None:
+        """
+        Objetivo: Trocar a geometria de uma trilha já armazenada (GPX alterado no monitoramento),
+                  mantendo sua posição no armazém.
+        """
+        trilha = como_trilha(dados)
+        self.substituir_niveis(posicao, nome, simplificar_niveis(trilha, self.tolerancias_m), caixa_trilha(trilha))
+
+    def substituir_niveis(self, posicao: int, nome: str, niveis: list, caixa: tuple) -> None:
+        """
+        Objetivo: Versão de 'substituir_trilha' para uma trilha já simplificada (ver 'adicionar_niveis').
+        Processamento: Reescreve o trecho da trilha em cada nível, desloca os offsets seguintes e
+                       atualiza a caixa no índice de tiles.
+        """
+        if len(niveis) != len(self.tolerancias_m):
+            raise ValueError(f"Esperados {len(self.tolerancias_m)} níveis de detalhe, recebidos {len(niveis)}.")
+
+        self._consolidar()
+
+        for nivel, pontos in enumerate(niveis):
+            self._carregar_nivel(nivel)
+            coordenadas, offsets = self.coordenadas[nivel], self.offsets[nivel].copy()
+            inicio, fim = offsets[posicao], offsets[posicao + 1]
+
+            self.coordenadas[nivel] = np.concatenate([coordenadas[:inicio], pontos, coordenadas[fim:]])
+            offsets[posicao + 1:] += len(pontos) - (fim - inicio)
+            self.offsets[nivel] = offsets
+
+        self.indice.substituir(nome, caixa, posicao)
+        self.nomes[posicao] = nome
+
+    def _consolidar(self) -> None:
+        """
+        Objetivo: Concatenar as trilhas pendentes aos arrays planos de cada nível.
+        """
+        if not self._pendentes[0]:
+            return
+
+        for nivel, pendentes in enumerate(self._pendentes):
+            self._carregar_nivel(nivel)
+            tamanhos = np.array([len(pontos) for pontos in pendentes], dtype=np.int64)
+            self.offsets[nivel] = np.concatenate([
+                self.offsets[nivel],
+                self.offsets[nivel][-1] + np.cumsum(tamanhos)
+            ])
+            self.coordenadas[nivel] = np.concatenate([self.coordenadas[nivel]] + pendentes)
+
+        self._pendentes = [[] for _ in self.tolerancias_m]
+
+    def _carregar_nivel(self, nivel: int) -> None:
+        if self.coordenadas[nivel] is None:
+            with np.load(self._caminho_npz) as arquivo:
+                self.coordenadas[nivel] = arquivo[f'coordenadas_{nivel}']
+                self.offsets[nivel] = arquivo[f'offsets_{nivel}']
+
+    # ------------------------------------------------------------
+    # CONSULTAS
+    # ------------------------------------------------------------
+
+    def escolher_nivel(self, caixa: tuple, largura_px: float, pixels_tolerancia: float = 1.0) -> int:
+        """
+        Objetivo: Nível mais grosseiro cujo erro de simplificação não passa de
+                  'pixels_tolerancia' pixels na janela.
+        Entrada: Janela (lat_min, lat_max, lon_min, lon_max) e largura do desenho em pixels.
+        Saída: Índice do nível (0 quando até o mais detalhado é grosseiro demais).
+        """
+        lat_min, lat_max, lon_min, lon_max = caixa
+        largura_m = (lon_max - lon_min) * M_POR_GRAU * np.cos(np.radians((lat_min + lat_max) / 2))
+        metros_por_pixel = largura_m / max(largura_px, 1.0)
+
+        nivel = np.searchsorted(self.tolerancias_m, metros_por_pixel * pixels_tolerancia, side='right') - 1
+        return int(max(nivel, 0))
+
+    def consultar(self, caixa: tuple, nivel: int = 0):
+        """
+        Objetivo: Geometria das trilhas cuja caixa intersecta a janela.
+        Entrada: Janela (lat_min, lat_max, lon_min, lon_max) e nível de detalhe.
+        Saída: Tupla (posições no armazém, lista de arrays (pontos, 2) com longitude/latitude).
+        """
+        self._consolidar()
+        self._carregar_nivel(nivel)
+
+        ids = self.indice.consultar_caixa(caixa)
+        coordenadas, offsets = self.coordenadas[nivel], self.offsets[nivel]
+
+        return ids, [coordenadas[offsets[i]:offsets[i + 1]] for i in ids]
+
+    def extensao(self) -> tuple:
+        """
+        Objetivo: Caixa (lat_min, lat_max, lon_min, lon_max) que contém todo o acervo.
+        """
+        self._consolidar()
+        self.indice._construir()
+        caixas = self.indice.caixas
+
+        return (
+            float(caixas[:, 0].min()),
+            float(caixas[:, 1].max()),
+            float(caixas[:, 2].min()),
+            float(caixas[:, 3].max())
+        )
+
+    # ------------------------------------------------------------
+    # PERSISTÊNCIA
+    # ------------------------------------------------------------
+
+    def salvar(self, caminho_saida: str) -> None:
+        """
+        Objetivo: Gravar o armazém em '<base>.npz' (níveis) e '<base>_indice.npz' (tiles).
+        """
+        self._consolidar()
+
+        pasta = os.path.dirname(caminho_saida)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+
+        niveis = {}
+        for nivel in range(len(self.tolerancias_m)):
+            self._carregar_nivel(nivel)
+            niveis[f'coordenadas_{nivel}'] = self.coordenadas[nivel]
+            niveis[f'offsets_{nivel}'] = self.offsets[nivel]
+
+        np.savez(
+            caminho_saida + '.npz',
+            tolerancias_m=np.asarray(self.tolerancias_m),
+            nomes=np.asarray(self.nomes, dtype=str),
+            **niveis
+        )
+        self.indice.salvar(caminho_saida + '_indice.npz')
+
+
+def carregar_armazem_detalhe(caminho_saida: str) -> ArmazemNiveisDetalhe:
+    """
+    Objetivo: Reabrir um armazém salvo por 'ArmazemNiveisDetalhe.salvar'.
+    Processamento: Lê apenas nomes e tolerâncias; os níveis são lidos sob demanda.
+    """
+    with np.load(caminho_saida + '.npz') as arquivo:
+        armazem = ArmazemNiveisDetalhe(arquivo['tolerancias_m'].tolist())
+        armazem.nomes = arquivo['nomes'].tolist()
+
+    armazem._caminho_npz = caminho_saida + '.npz'
+    armazem.coordenadas = [None] * len(armazem.tolerancias_m)
+    armazem.offsets = [None] * len(armazem.tolerancias_m)
+
+    armazem.indice = carregar_indice_espacial(caminho_saida + '_indice.npz')
+
+    return armazem
@@ -0,0 +1,252 @@
+import os
+
+import numpy as np
+import pandas as pd
+
+from src.descoberta_arquivos import descobrir_arquivos_gpx
+from src.leitura_compactados import eh_membro_gpx
+from src.leitura_gpx import ler_gpx_trilha, nome_trilha
+from src.metricas_corpus import CorpusTrilhas, concatenar_trilhas
+from src.metricas_trilha import distancias_geodesicas_m
+
+
+LIMITES_GRADE_PCT = (-np.inf, -20, -10, -5, 0, 5, 10, 20, np.inf)
+
+
+# ------------------------------------------------------------
+# REAMOSTRAGEM
+# ------------------------------------------------------------
+
+def distancia_acumulada_corpus(corpus: CorpusTrilhas) -> np.ndarray:
+    """
+    Objetivo: Distância horizontal acumulada (m) de cada ponto desde o início da sua trilha.
+    Entrada: CorpusTrilhas.
+    Processamento: Distâncias geodésicas do array plano, zeradas nas fronteiras entre trilhas,
+                   seguidas de um cumsum global do qual se subtrai o valor no início de cada trilha.
+    Saída: Array float64 com um valor por ponto.
+    """
+    rotulos = corpus.indice_trilha_por_ponto()
+
+    passos = np.zeros(len(rotulos), dtype=np.float64)
+    passos[1:] = distancias_geodesicas_m(corpus.latitude, corpus.longitude)
+    passos[1:][rotulos[1:] != rotulos[:-1]] = 0.0
+
+    acumulada = np.cumsum(passos)
+    return acumulada - acumulada[corpus.offsets[:-1]][rotulos]
+
+
+def reamostrar_perfis(corpus: CorpusTrilhas, passo_m: float = 25.0, largura: int = None):
+    """
+    Objetivo: Interpolar a altitude de todas as trilhas em uma grade uniforme de distância.
+    Entrada:
+        - corpus: CorpusTrilhas (trilhas ordenadas por tempo).
+        - passo_m: Espaçamento da grade (ex.: 25 m).
+        - largura: Número de colunas do perfil (padrão: suficiente para a trilha mais longa).
+    Processamento:
+        1. Calcula a distância acumulada de cada ponto.
+        2. Desloca cada trilha k para o eixo 'k * deslocamento + distância', tornando o eixo
+           global monotônico, e resolve todas as trilhas com um único 'np.interp'.
+        3. Posições além do comprimento da trilha (ou da largura) ficam como NaN.
+    Saída: Tupla (perfis float32 com shape (n_trilhas, largura), comprimentos_m por trilha).
+    """
+    n = len(corpus)
+    acumulada = distancia_acumulada_corpus(corpus)
+    comprimentos_m = acumulada[corpus.offsets[1:] - 1] if n else np.zeros(0)
+
+    if largura is None:
+        largura = int(np.floor(comprimentos_m.max() / passo_m)) + 1 if n else 1
+
+    celulas_por_trilha = np.minimum(np.floor(comprimentos_m / passo_m).astype(np.int64) + 1, largura)
+
+    deslocamento = (comprimentos_m.max() if n else 0.0) + 2 * passo_m
+    rotulos = corpus.indice_trilha_por_ponto()
+    eixo_pontos = rotulos * deslocamento + acumulada
+
+    linhas = np.repeat(np.arange(n, dtype=np.int64), celulas_por_trilha)
+    colunas = np.arange(len(linhas), dtype=np.int64) - np.repeat(
+        np.cumsum(celulas_por_trilha) - celulas_por_trilha,
+        celulas_por_trilha
+    )
+    eixo_grade = linhas * deslocamento + colunas * passo_m
+
+    perfis = np.full((n, largura), np.nan, dtype=np.float32)
+    perfis[linhas, colunas] = np.interp(eixo_grade, eixo_pontos, corpus.altitude_m)
+
+    return perfis, comprimentos_m
+
+
+# ------------------------------------------------------------
+# ARMAZENAMENTO EM MEMÓRIA MAPEADA
+# ------------------------------------------------------------
+
+def construir_perfis_gpx(
+    caminho_pasta_gpx: str,
+    caminho_saida: str,
+    passo_m: float = 25.0,
+    largura: int = 2048,
+    arquivos: list = None,
+    trilhas_por_bloco: int = 2000
+) -> pd.DataFrame:
+    """
+    Objetivo: Gerar a matriz de perfis de todo o acervo em um '.npy' mapeado em memória.
+    Entrada:
+        - caminho_pasta_gpx: Pasta raiz dos GPX.
+        - caminho_saida: Base do arquivo (gera '<base>.npy' e '<base>_indice.csv').
+        - passo_m / largura: Grade de distância (largura * passo_m = comprimento máximo coberto).
+        - arquivos: Lista de trabalho (padrão: varredura recursiva).
+        - trilhas_por_bloco: Trilhas reamostradas por chamada (limita a memória).
+    Processamento:
+        1. Cria o '.npy' float32 (n_arquivos x largura) com 'open_memmap'.
+        2. Para cada bloco: lê as trilhas, monta o corpus, reamostra e grava as linhas.
+    Saída: pd.DataFrame índice (trilha, linha, comprimento_m, passo_m), também salvo em CSV.
+    """
+    if arquivos is None:
+        arquivos = descobrir_arquivos_gpx(caminho_pasta_gpx)
+
+    caminhos = [
+        arquivo if isinstance(arquivo, str) else arquivo.caminho_relativo
+        for arquivo in arquivos
+    ]
+    caminhos = [caminho for caminho in caminhos if eh_membro_gpx(caminho)]
+
+    pasta = os.path.dirname(caminho_saida)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+
+    matriz = np.lib.format.open_memmap(
+        caminho_saida + '.npy',
+        mode='w+',
+        dtype=np.float32,
+        shape=(len(caminhos), largura)
+    )
+    matriz[:] = np.nan
+
+    indice = []
+    proxima_linha = 0
+
+    for inicio in range(0, len(caminhos), trilhas_por_bloco):
+        nomes = []
+        trilhas = []
+
+        for caminho in caminhos[inicio:inicio + trilhas_por_bloco]:
+            try:
+                trilhas.append(ler_gpx_trilha(os.path.join(caminho_pasta_gpx, caminho)))
+                nomes.append(nome_trilha(caminho))
+            except Exception as erro:
+                print(f"Erro ao processar {caminho}: {erro}")
+
+        if not trilhas:
+            continue
+
+        perfis, comprimentos_m = reamostrar_perfis(
+            concatenar_trilhas(nomes, trilhas),
+            passo_m,
+            largura
+        )
+
+        fim = proxima_linha + len(nomes)
+        matriz[proxima_linha:fim] = perfis
+
+        for deslocamento, (nome, comprimento) in enumerate(zip(nomes, comprimentos_m)):
+            indice.append({
+                'trilha': nome,
+                'linha': proxima_linha + deslocamento,
+                'comprimento_m': round(float(comprimento), 1),
+                'passo_m': passo_m
+            })
+
+        proxima_linha = fim
+
+    matriz.flush()
+    del matriz
+
+    df_indice = pd.DataFrame(indice, columns=['trilha', 'linha', 'comprimento_m', 'passo_m'])
+    df_indice.to_csv(caminho_saida + '_indice.csv', index=False, encoding='utf-8')
+
+    return df_indice
+
+
+def abrir_perfis(caminho_saida: str):
+    """
+    Objetivo: Abrir a matriz de perfis sem carregá-la na RAM.
+    Entrada: Base usada em 'construir_perfis_gpx'.
+    Saída: Tupla (np.memmap somente leitura, pd.DataFrame índice).
+    """
+    perfis = np.load(caminho_saida + '.npy', mmap_mode='r')
+    indice = pd.read_csv(caminho_saida + '_indice.csv')
+    return perfis, indice
+
+
+# ------------------------------------------------------------
+# FEATURES EM LOTE
+# ------------------------------------------------------------
+
+def calcular_features_perfis(
+    perfis: np.ndarray,
+    passo_m: float = 25.0,
+    limites_grade_pct=LIMITES_GRADE_PCT,
+    janela_subida_m: float = 500.0
+) -> pd.DataFrame:
+    """
+    Objetivo: Extrair features de forma do perfil para todas as trilhas de uma vez.
+    Entrada:
+        - perfis: Matriz (n_trilhas x largura) com NaN após o fim de cada trilha.
+        - passo_m: Espaçamento usado na reamostragem.
+        - limites_grade_pct: Bordas do histograma de declividade (%).
+        - janela_subida_m: Janela da maior subida sustentada.
+    Processamento:
+        1. Declividade de cada célula: diff / passo * 100.
+        2. Histograma de declividade por trilha (fração das células) via bincount em 2-D.
+        3. Maior subida contínua: soma acumulada de subidas reiniciada a cada célula plana/descida.
+        4. Maior subida sustentada: máximo de perfil[j + k] - perfil[j] com k = janela / passo.
+    Saída: pd.DataFrame com uma linha por trilha (mesma ordem da matriz).
+    """
+    perfis = np.asarray(perfis, dtype=np.float64)
+    n = perfis.shape[0]
+
+    diferencas = np.diff(perfis, axis=1)
+    validas = ~np.isnan(diferencas)
+    grades_pct = diferencas / passo_m * 100
+
+    # Histograma de declividade
+    n_classes = len(limites_grade_pct) - 1
+    classes = np.clip(np.digitize(grades_pct, limites_grade_pct[1:-1]), 0, n_classes - 1)
+    linhas = np.broadcast_to(np.arange(n)[:, None], classes.shape)
+
+    contagens = np.bincount(
+        (linhas * n_classes + classes)[validas],
+        minlength=n * n_classes
+    ).reshape(n, n_classes)
+    totais = np.maximum(validas.sum(axis=1, keepdims=True), 1)
+    fracoes = contagens / totais
+
+    colunas = {}
+    for k in range(n_classes):
+        inferior, superior = limites_grade_pct[k], limites_grade_pct[k + 1]
+        nome = f"grade_{'min' if np.isinf(inferior) else int(inferior)}_{'max' if np.isinf(superior) else int(superior)}"
+        colunas[nome] = fracoes[:, k]
+
+    # Maior subida contínua (m)
+    subidas = np.where(validas & (diferencas > 0), diferencas, 0.0)
+    acumulado = np.cumsum(subidas, axis=1)
+    base = np.maximum.accumulate(np.where(subidas > 0, 0.0, acumulado), axis=1)
+    colunas['subida_continua_max_m'] = (acumulado - base).max(axis=1, initial=0.0)
+
+    # Maior subida sustentada na janela (m)
+    k = max(int(round(janela_subida_m / passo_m)), 1)
+    if perfis.shape[1] > k:
+        ganho_janela = perfis[:, k:] - perfis[:, :-k]
+        ganho_janela = np.where(np.isnan(ganho_janela), -np.inf, ganho_janela)
+        sustentada = ganho_janela.max(axis=1)
+        colunas[f'subida_{int(janela_subida_m)}m_max'] = np.where(
+            np.isfinite(sustentada),
+            np.maximum(sustentada, 0.0),
+            0.0
+        )
+    else:
+        colunas[f'subida_{int(janela_subida_m)}m_max'] = np.zeros(n)
+
+    grade_max = np.where(validas, grades_pct, -np.inf).max(axis=1, initial=-np.inf)
+    colunas['grade_max_pct'] = np.where(np.isfinite(grade_max), grade_max, 0.0)
+
+    return pd.DataFrame(colunas)
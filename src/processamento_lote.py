@@ -1,31 +1,576 @@
 import os
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
 import pandas as pd
 
-from src.analise_trilha import analisar_trilha
+from src.leitura_gpx import ler_gpx_trilha, ler_gpx_trilha_bytes, nome_trilha
+from src.analise_trilha import analisar_trilha, calcular_metricas_trilha
+from src.leitura_antecipada import LeitorAntecipado
+from src.leitura_compactados import (
+    eh_arquivo_compactado,
+    eh_membro_gpx,
+    iterar_membros_gpx,
+    processar_arquivo_compactado
+)
+from src.descoberta_arquivos import descobrir_arquivos_gpx
+from src.elevacao_dem import ModeloElevacao
+from src.duplicatas import IndiceDuplicatas, validar_modo_duplicatas
+from src.indice_espacial import IndiceEspacial
+from src.niveis_detalhe import ArmazemNiveisDetalhe
+from src.telemetria import Telemetria, medir_arquivo, medir_etapa
 
 
-def processar_pasta_gpx(caminho_pasta_gpx: str) -> pd.DataFrame:
+def processar_pasta_gpx(
+    caminho_pasta_gpx: str,
+    telemetria: Telemetria = None,
+    max_workers_compactados: int = None,
+    arquivos: list = None,
+    duplicatas: str = 'manter',
+    indice_duplicatas: IndiceDuplicatas = None,
+    indice_espacial: IndiceEspacial = None,
+    corretor_elevacao: ModeloElevacao = None,
+    armazem_detalhe: ArmazemNiveisDetalhe = None,
+    leitor_antecipado: LeitorAntecipado = None
+) -> pd.DataFrame:
     """
     Objetivo: Orquestrar o processamento massivo de arquivos geográficos (.gpx).
-    Entrada: String com o caminho do diretório contendo os arquivos GPX.
-    Processamento: 
-        1. Varre o diretório em busca de arquivos com extensão .gpx.
-        2. Para cada arquivo, invoca a função 'analisar_trilha'.
-        3. Consolida os dicionários de resultados em uma lista.
-        4. Transforma a lista final em um DataFrame tabular.
+    Entrada:
+        - caminho_pasta_gpx: String com o caminho do diretório contendo os arquivos GPX.
+        - telemetria: Coletor opcional que registra tempo, CPU, RSS e pontos por arquivo e etapa.
+        - max_workers_compactados: Processos usados nos membros de pacotes .zip/.tar (None = CPUs).
+        - arquivos: Lista de trabalho pronta ('descobrir_arquivos_gpx' ou caminhos relativos à pasta).
+          Quando omitida, varre apenas o primeiro nível da pasta.
+        - duplicatas: 'manter' (padrão), 'sinalizar' (coluna 'duplicata_de') ou 'ignorar'
+          (quase duplicatas de uma trilha já vista não entram no resultado). Membros de pacotes
+          são conferidos na ordem do pacote, com a assinatura calculada nos workers.
+        - indice_duplicatas: Índice a reaproveitar entre chamadas (padrão: um novo por chamada).
+        - indice_espacial: Índice opcional preenchido com a caixa envolvente de cada trilha e sua
+          posição no DataFrame de saída (nos pacotes, a caixa é calculada nos workers).
+        - corretor_elevacao: Modelo de elevação opcional ('ModeloElevacao') aplicado à altitude
+          de cada trilha antes das métricas (também nos membros de pacotes).
+        - armazem_detalhe: Armazém opcional de níveis de detalhe preenchido com a geometria
+          simplificada de cada trilha (mapas do acervo); nos pacotes, a simplificação é feita nos
+          workers. Uma trilha por linha da tabela (ValueError se as contagens divergirem).
+        - leitor_antecipado: Pré-leitura opcional ('LeitorAntecipado'): threads leem os próximos
+          GPX para a memória enquanto o atual é parseado e medido.
+    Processamento:
+        1. Obtém a lista de arquivos .gpx, .gpx.gz e pacotes .zip/.tar[.gz] (com pré-leitura,
+           os GPX passam a ser lidos de buffers já carregados).
+        2. Para cada GPX, invoca a função 'analisar_trilha' (ou, com detecção de duplicatas,
+           índice espacial ou armazém de níveis de detalhe, parseia, consulta/atualiza os índices e só então calcula as métricas);
+           a altitude é corrigida pelo modelo de elevação logo antes das métricas.
+        3. Para cada pacote, lê os membros direto do pacote (sem extração) e os analisa em paralelo,
+           em um único pool de processos criado no primeiro pacote e reaproveitado pelos demais.
+        4. Consolida os dicionários de resultados em uma lista.
+        5. Transforma a lista final em um DataFrame tabular.
     Saída: pd.DataFrame consolidado com todas as métricas de todas as trilhas processadas.
     """
+    indice_duplicatas = _preparar_indice_duplicatas(duplicatas, indice_duplicatas)
     resultados = []
 
-    for arquivo in os.listdir(caminho_pasta_gpx):
-        if arquivo.lower().endswith('.gpx'):
+    descobertos = _arquivos_descobertos(caminho_pasta_gpx, arquivos)
+    pre_lidos = _pre_ler_gpx(caminho_pasta_gpx, descobertos, leitor_antecipado)
+
+    executor_compactados = None
+
+    # Membros de pacotes voltam dos workers com a caixa, a geometria simplificada, a assinatura e
+    # as etapas medidas pela telemetria do worker
+    com_extras = (
+        indice_espacial is not None
+        or armazem_detalhe is not None
+        or indice_duplicatas is not None
+        or telemetria is not None
+    )
+    n_armazem_inicial = len(armazem_detalhe) if armazem_detalhe is not None else 0
+
+    try:
+        for arquivo in _lista_de_trabalho(caminho_pasta_gpx, descobertos):
             caminho_completo = os.path.join(caminho_pasta_gpx, arquivo)
 
+            if eh_membro_gpx(arquivo):
+                try:
+                    _, conteudo, erro_leitura = next(pre_lidos)
+                    if erro_leitura is not None:
+                        raise erro_leitura
+
+                    with medir_arquivo(telemetria, arquivo):
+                        if (
+                            conteudo is None
+                            and indice_duplicatas is None
+                            and indice_espacial is None
+                            and armazem_detalhe is None
+                        ):
+                            resultado = analisar_trilha(caminho_completo, telemetria, corretor_elevacao)
+                        else:
+                            nome = nome_trilha(arquivo)
+                            with medir_etapa(telemetria, 'parse', nome) as registro:
+                                dados = _ler_trilha(caminho_completo, conteudo)
+                                registro['n_pontos'] = len(dados)
+                            del conteudo
+                            resultado = _calcular_metricas(
+                                nome, dados, indice_duplicatas, duplicatas, telemetria, corretor_elevacao
+                            )
+                            if resultado is not None:
+                                _registrar_geometria(
+                                    nome, dados, len(resultados), indice_espacial, armazem_detalhe, telemetria
+                                )
+
+                    if resultado is not None:
+                        resultados.append(resultado)
+
+                except Exception as erro:
+                    print(f"Erro ao processar {arquivo}: {erro}")
+
+            elif eh_arquivo_compactado(arquivo):
+                if executor_compactados is None:
+                    executor_compactados = ProcessPoolExecutor(max_workers=max_workers_compactados)
+
+                try:
+                    with medir_arquivo(telemetria, arquivo):
+                        resultados_pacote = processar_arquivo_compactado(
+                            caminho_completo,
+                            max_workers_compactados,
+                            corretor_elevacao,
+                            com_caixa=indice_espacial is not None,
+                            executor=executor_compactados,
+                            tolerancias_detalhe=(
+                                armazem_detalhe.tolerancias_m if armazem_detalhe is not None else None
+                            ),
+                            parametros_assinatura=(
+                                (indice_duplicatas.sementes, indice_duplicatas.tamanho_celula_m)
+                                if indice_duplicatas is not None else None
+                            ),
+                            com_telemetria=telemetria is not None
+                        )
+
+                    for item in resultados_pacote:
+                        resultado, extras = item if com_extras else (item, None)
+
+                        # Etapas medidas no worker entram no trace do processo principal
+                        if telemetria is not None:
+                            for registro in extras['registros']:
+                                telemetria.registrar({**registro, 'arquivo': f"{arquivo}:{registro['arquivo']}"})
+
+                        # Consulta ao índice na ordem dos membros (mesmo resultado do modo streaming)
+                        original = None
+                        if indice_duplicatas is not None:
+                            original, contencao = indice_duplicatas.verificar_e_adicionar_assinatura(
+                                resultado['trilha'], *extras['assinatura']
+                            )
+                            if _descartar_duplicata(resultado['trilha'], original, contencao, duplicatas):
+                                continue
+
+                        if duplicatas == 'sinalizar':
+                            resultado['duplicata_de'] = original
+
+                        if indice_espacial is not None:
+                            indice_espacial.adicionar(resultado['trilha'], extras['caixa'], len(resultados))
+
+                        if armazem_detalhe is not None:
+                            armazem_detalhe.adicionar_niveis(resultado['trilha'], extras['niveis'], extras['caixa'])
+
+                        resultados.append(resultado)
+
+                except Exception as erro:
+                    print(f"Erro ao processar {arquivo}: {erro}")
+
+    finally:
+        pre_lidos.close()
+        if executor_compactados is not None:
+            executor_compactados.shutdown()
+
+    if armazem_detalhe is not None and len(armazem_detalhe) - n_armazem_inicial != len(resultados):
+        raise ValueError(
+            f"Armazém de níveis de detalhe recebeu {len(armazem_detalhe) - n_armazem_inicial} trilhas "
+            f"para {len(resultados)} linhas da tabela."
+        )
+
+    return pd.DataFrame(resultados)
+
+
+def _arquivos_descobertos(caminho_pasta_gpx: str, arquivos: list) -> list:
+    """
+    Objetivo: Lista de trabalho informada ou, se None, a varredura de um nível da pasta.
+    """
+    if arquivos is None:
+        return descobrir_arquivos_gpx(caminho_pasta_gpx, recursivo=False)
+
+    return list(arquivos)
+
+
+def _lista_de_trabalho(caminho_pasta_gpx: str, arquivos: list) -> list:
+    """
+    Objetivo: Normalizar a lista de trabalho em caminhos relativos à pasta.
+    Entrada: Lista de ArquivoDescoberto, de strings, ou None (varredura de um nível).
+    """
+    return [
+        arquivo if isinstance(arquivo, str) else arquivo.caminho_relativo
+        for arquivo in _arquivos_descobertos(caminho_pasta_gpx, arquivos)
+    ]
+
+
+def _pre_ler_gpx(caminho_pasta_gpx: str, arquivos: list, leitor_antecipado: LeitorAntecipado):
+    """
+    Objetivo: Fluxo (arquivo, bytes, erro) dos GPX da lista, na ordem; sem leitor, os bytes são
+              None e cada arquivo é lido pelo caminho no momento do parse.
+    """
+    gpx = [
+        arquivo for arquivo in arquivos
+        if eh_membro_gpx(arquivo if isinstance(arquivo, str) else arquivo.caminho_relativo)
+    ]
+
+    if leitor_antecipado is None:
+        return ((arquivo, None, None) for arquivo in _lista_de_trabalho(caminho_pasta_gpx, gpx))
+
+    return leitor_antecipado.iterar(caminho_pasta_gpx, gpx)
+
+
+def _ler_trilha(caminho_completo: str, conteudo: bytes = None):
+    if conteudo is None:
+        return ler_gpx_trilha(caminho_completo)
+
+    return ler_gpx_trilha_bytes(conteudo, caminho_completo)
+
+
+def _preparar_indice_duplicatas(duplicatas: str, indice_duplicatas: IndiceDuplicatas):
+    validar_modo_duplicatas(duplicatas)
+
+    if duplicatas == 'manter':
+        return None
+
+    return indice_duplicatas if indice_duplicatas is not None else IndiceDuplicatas()
+
+
+def _registrar_geometria(
+    nome: str,
+    dados,
+    linha: int,
+    indice_espacial: IndiceEspacial,
+    armazem_detalhe: ArmazemNiveisDetalhe,
+    telemetria: Telemetria
+) -> None:
+    """
+    Objetivo: Registrar a trilha aceita no índice espacial e no armazém de níveis de detalhe.
+    """
+    if indice_espacial is not None:
+        indice_espacial.adicionar_trilha(nome, dados, linha)
+
+    if armazem_detalhe is not None:
+        with medir_etapa(telemetria, 'detalhe', nome, len(dados)):
+            armazem_detalhe.adicionar_trilha(nome, dados)
+
+
+def _descartar_duplicata(nome: str, original: str, contencao: float, duplicatas: str) -> bool:
+    """
+    Objetivo: Reportar a quase duplicata encontrada pelo índice.
+    Saída: True quando a trilha deve ser descartada (modo 'ignorar').
+    """
+    if original is None:
+        return False
+
+    print(f"{nome}: quase duplicata de {original} (contenção estimada {contencao:.2f}).")
+    return duplicatas == 'ignorar'
+
+
+def _calcular_metricas(
+    nome: str,
+    dados,
+    indice_duplicatas: IndiceDuplicatas,
+    duplicatas: str,
+    telemetria: Telemetria,
+    corretor_elevacao: ModeloElevacao = None
+):
+    """
+    Objetivo: Consultar o índice de duplicatas (se houver) e corrigir a altitude pelo modelo de
+              elevação (se houver) antes das métricas (etapa mais cara).
+    Saída: Dicionário de resultados ou None quando a trilha é duplicata e o modo é 'ignorar'.
+    """
+    original = None
+
+    if indice_duplicatas is not None:
+        with medir_etapa(telemetria, 'duplicatas', nome, len(dados)):
+            original, contencao = indice_duplicatas.verificar_e_adicionar(nome, dados)
+
+        if _descartar_duplicata(nome, original, contencao, duplicatas):
+            return None
+
+    if corretor_elevacao is not None:
+        with medir_etapa(telemetria, 'elevacao', nome, len(dados)):
+            dados = corretor_elevacao.corrigir(dados)
+
+    resultado = calcular_metricas_trilha(nome, dados, telemetria)
+
+    if duplicatas == 'sinalizar':
+        resultado['duplicata_de'] = original
+
+    return resultado
+
+
+# ------------------------------------------------------------
+# MODO STREAMING (MEMÓRIA LIMITADA)
+# ------------------------------------------------------------
+
+def _parsear_item(rotulo: str, nome: str, caminho: str, conteudo: bytes, erro_leitura, telemetria: Telemetria):
+    """
+    Objetivo: Parsear um GPX para a fila do modo streaming.
+    Saída: Tupla (rótulo para mensagens e telemetria, nome da trilha, Trilha ou None, erro ou None).
+    """
+    try:
+        if erro_leitura is not None:
+            raise erro_leitura
+
+        with medir_etapa(telemetria, 'parse', nome) as registro:
+            dados = _ler_trilha(caminho, conteudo)
+            registro['n_pontos'] = len(dados)
+        return rotulo, nome, dados, None
+    except Exception as erro:
+        return rotulo, nome, None, erro
+
+
+def _ler_antecipadamente(
+    caminho_pasta_gpx: str,
+    arquivos: list,
+    fila: queue.Queue,
+    parar: threading.Event,
+    telemetria: Telemetria,
+    leitor_antecipado: LeitorAntecipado = None
+) -> None:
+    """
+    Objetivo: Produtor da leitura antecipada (parse-ahead) executado em thread separada.
+    Processamento:
+        1. Percorre a lista na ordem: cada GPX (do buffer pré-lido, se houver 'leitor_antecipado')
+           e cada membro GPX dos pacotes .zip/.tar (lidos sequencialmente, sem extração) vira um
+           item (rótulo, nome, dados, erro) na fila limitada.
+        2. 'put' bloqueia quando a fila está cheia (backpressure), de modo que nunca
+           existam mais trilhas em memória do que a capacidade da fila.
+        3. Encerra ao consumir a lista ou quando o consumidor sinaliza 'parar'.
+    """
+    pre_lidos = _pre_ler_gpx(caminho_pasta_gpx, arquivos, leitor_antecipado)
+
+    def enfileirar(item) -> bool:
+        while not parar.is_set():
+            try:
+                fila.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    try:
+        for arquivo in _lista_de_trabalho(caminho_pasta_gpx, arquivos):
+            if parar.is_set():
+                return
+
+            caminho_completo = os.path.join(caminho_pasta_gpx, arquivo)
+
+            if eh_membro_gpx(arquivo):
+                _, conteudo, erro_leitura = next(pre_lidos)
+                item = _parsear_item(
+                    arquivo, nome_trilha(arquivo), caminho_completo, conteudo, erro_leitura, telemetria
+                )
+                del conteudo
+
+                if not enfileirar(item):
+                    return
+                continue
+
             try:
-                resultado = analisar_trilha(caminho_completo)
-                resultados.append(resultado)
+                for nome_membro, conteudo in iterar_membros_gpx(caminho_completo):
+                    item = _parsear_item(
+                        f"{arquivo}:{nome_membro}", nome_trilha(nome_membro), nome_membro, conteudo, None, telemetria
+                    )
+                    del conteudo
 
+                    if not enfileirar(item):
+                        return
             except Exception as erro:
+                if not enfileirar((arquivo, None, None, erro)):
+                    return
+    finally:
+        pre_lidos.close()
+
+    fila.put(None)
+
+
+def iterar_resultados_gpx(
+    caminho_pasta_gpx: str,
+    max_trilhas_em_memoria: int = 4,
+    telemetria: Telemetria = None,
+    arquivos: list = None,
+    duplicatas: str = 'manter',
+    indice_duplicatas: IndiceDuplicatas = None,
+    indice_espacial: IndiceEspacial = None,
+    corretor_elevacao: ModeloElevacao = None,
+    armazem_detalhe: ArmazemNiveisDetalhe = None,
+    leitor_antecipado: LeitorAntecipado = None
+):
+    """
+    Objetivo: Processar uma pasta de GPX como um gerador, com consumo de memória limitado.
+    Entrada:
+        - caminho_pasta_gpx: Diretório com os arquivos GPX (.gpx ou .gpx.gz).
+        - max_trilhas_em_memoria: Capacidade da fila de leitura antecipada (trilhas já parseadas
+          aguardando o cálculo de métricas).
+        - telemetria: Coletor opcional de métricas de execução.
+        - arquivos: Lista de trabalho opcional (ver 'processar_pasta_gpx'); os membros de pacotes
+          .zip/.tar passam pela mesma fila (parseados pela thread produtora, sem pool de processos).
+        - duplicatas / indice_duplicatas: Tratamento de quase duplicatas (ver 'processar_pasta_gpx').
+        - indice_espacial: Índice opcional; a posição registrada é a ordem em que o resultado é gerado.
+        - corretor_elevacao / armazem_detalhe / leitor_antecipado: Ver 'processar_pasta_gpx'.
+    Processamento:
+        1. Uma thread produtora parseia os próximos arquivos enquanto o consumidor calcula métricas
+           (com 'leitor_antecipado', threads de I/O leem à frente da produtora).
+        2. A fila limitada aplica backpressure sobre a leitura.
+        3. Cada trilha é descartada logo após gerar seu dicionário de resultados.
+    Saída: Gerador de dicionários (mesmo formato de 'analisar_trilha'), na ordem da listagem.
+    """
+    if max_trilhas_em_memoria < 1:
+        raise ValueError("max_trilhas_em_memoria deve ser >= 1.")
+
+    indice_duplicatas = _preparar_indice_duplicatas(duplicatas, indice_duplicatas)
+
+    arquivos = [
+        arquivo for arquivo in _arquivos_descobertos(caminho_pasta_gpx, arquivos)
+        if eh_membro_gpx(arquivo if isinstance(arquivo, str) else arquivo.caminho_relativo)
+        or eh_arquivo_compactado(arquivo if isinstance(arquivo, str) else arquivo.caminho_relativo)
+    ]
+
+    fila = queue.Queue(maxsize=max_trilhas_em_memoria)
+    parar = threading.Event()
+
+    produtor = threading.Thread(
+        target=_ler_antecipadamente,
+        args=(caminho_pasta_gpx, arquivos, fila, parar, telemetria, leitor_antecipado),
+        daemon=True
+    )
+    produtor.start()
+
+    gerados = 0
+
+    try:
+        while True:
+            item = fila.get()
+            if item is None:
+                break
+
+            arquivo, nome, dados, erro = item
+            del item
+
+            if erro is not None:
                 print(f"Erro ao processar {arquivo}: {erro}")
+                continue
 
-    return pd.DataFrame(resultados)
+            try:
+                with medir_arquivo(telemetria, arquivo):
+                    resultado = _calcular_metricas(
+                        nome,
+                        dados,
+                        indice_duplicatas,
+                        duplicatas,
+                        telemetria,
+                        corretor_elevacao
+                    )
+
+                if resultado is not None:
+                    _registrar_geometria(
+                        resultado['trilha'], dados, gerados, indice_espacial, armazem_detalhe, telemetria
+                    )
+            except Exception as erro_metricas:
+                print(f"Erro ao processar {arquivo}: {erro_metricas}")
+                continue
+            finally:
+                del dados
+
+            if resultado is not None:
+                gerados += 1
+                yield resultado
+
+    finally:
+        # Consumidor encerrado (fim normal, exceção ou gerador abandonado)
+        parar.set()
+        while produtor.is_alive():
+            try:
+                fila.get(timeout=0.1)
+            except queue.Empty:
+                pass
+
+
+def salvar_resultados_em_lotes(resultados, caminho_csv_saida: str, tamanho_lote: int = 1000) -> int:
+    """
+    Objetivo: Gravar um fluxo de resultados no CSV de análise sem acumulá-lo inteiro em memória.
+    Entrada:
+        - resultados: Iterável de dicionários (ex.: 'iterar_resultados_gpx').
+        - caminho_csv_saida: CSV de destino (sobrescrito).
+        - tamanho_lote: Número de linhas por bloco anexado ao arquivo.
+    Processamento:
+        1. Agrupa os dicionários em blocos de 'tamanho_lote'.
+        2. O primeiro bloco cria o arquivo com cabeçalho; os demais são anexados.
+    Saída: Inteiro com o total de linhas gravadas.
+    """
+    lote = []
+    total = 0
+    colunas = None
+
+    def gravar(bloco):
+        nonlocal colunas
+        df = pd.DataFrame(bloco, columns=colunas)
+        primeiro = colunas is None
+        colunas = list(df.columns)
+        df.to_csv(
+            caminho_csv_saida,
+            mode='w' if primeiro else 'a',
+            header=primeiro,
+            index=False,
+            encoding='utf-8'
+        )
+
+    for resultado in resultados:
+        lote.append(resultado)
+
+        if len(lote) >= tamanho_lote:
+            gravar(lote)
+            total += len(lote)
+            lote = []
+
+    if lote or colunas is None:
+        gravar(lote)
+        total += len(lote)
+
+    return total
+
+
+def processar_pasta_gpx_streaming(
+    caminho_pasta_gpx: str,
+    caminho_csv_saida: str,
+    tamanho_lote: int = 1000,
+    max_trilhas_em_memoria: int = 4,
+    telemetria: Telemetria = None,
+    arquivos: list = None,
+    duplicatas: str = 'manter',
+    indice_espacial: IndiceEspacial = None,
+    corretor_elevacao: ModeloElevacao = None,
+    armazem_detalhe: ArmazemNiveisDetalhe = None,
+    leitor_antecipado: LeitorAntecipado = None
+) -> int:
+    """
+    Objetivo: Variante de 'processar_pasta_gpx' para pastas arbitrariamente grandes.
+    Entrada: Pasta GPX, CSV de saída, tamanho do bloco de gravação e limite de trilhas em memória.
+    Processamento: Encadeia 'iterar_resultados_gpx' e 'salvar_resultados_em_lotes'.
+    Saída: Inteiro com o número de trilhas gravadas no CSV.
+    """
+    return salvar_resultados_em_lotes(
+        iterar_resultados_gpx(
+            caminho_pasta_gpx,
+            max_trilhas_em_memoria,
+            telemetria,
+            arquivos,
+            duplicatas,
+            indice_espacial=indice_espacial,
+            corretor_elevacao=corretor_elevacao,
+            armazem_detalhe=armazem_detalhe,
+            leitor_antecipado=leitor_antecipado
+        ),
+        caminho_csv_saida,
+        tamanho_lote
+    )
@@ -0,0 +1,242 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+from src.clustering_dificuldade import carregar_modelo_dificuldade, prever_dificuldade
+
+
+class IndiceSimilaridade:
+    """
+    Objetivo: Responder "quais trilhas são mais parecidas em dificuldade com esta?" sem
+              varrer a tabela inteira.
+    Estrutura:
+        - Vetores de features padronizados pelo MESMO StandardScaler do modelo K-Means salvo,
+          para que a distância corresponda à do clustering.
+        - Uma KDTree global e uma por dificuldade (filtro sem perda de vizinhos).
+        - Buffer de inserções recentes, consultado por força bruta e incorporado às árvores
+          quando passa de 'fracao_reconstrucao' do total indexado.
+    """
+
+    def __init__(self, modelo: dict, fracao_reconstrucao: float = 0.1, tamanho_folha: int = 40):
+        self.colunas = list(modelo['colunas'])
+        self.scaler = modelo['scaler']
+        self.fracao_reconstrucao = fracao_reconstrucao
+        self.tamanho_folha = tamanho_folha
+
+        self.trilhas = []
+        self.dificuldades = []
+        self.vetores = np.zeros((0, len(self.colunas)), dtype=np.float64)
+
+        # Árvores cobrem as 'n_indexados' primeiras linhas; o restante é o buffer
+        self.n_indexados = 0
+        self.arvores = {}
+        self.membros = {}
+        self._posicoes = {}
+
+    def __len__(self) -> int:
+        return len(self.trilhas)
+
+    # ------------------------------------------------------------
+    # CONSTRUÇÃO E ATUALIZAÇÃO
+    # ------------------------------------------------------------
+
+    def adicionar(self, tabela: pd.DataFrame) -> None:
+        """
+        Objetivo: Inserir trilhas (tabela inicial ou novas linhas do lote).
+        Entrada: DataFrame com 'trilha', as colunas do modelo e, opcionalmente, 'dificuldade'
+                 (linhas com feature ausente são ignoradas).
+        Processamento: Padroniza com o scaler do modelo e acumula no buffer; reconstrói as
+                       árvores quando o buffer fica grande em relação ao índice.
+        """
+        tabela = tabela.dropna(subset=self.colunas)
+        if tabela.empty:
+            return
+
+        dificuldades = (
+            tabela['dificuldade'] if 'dificuldade' in tabela.columns
+            else pd.Series(np.nan, index=tabela.index, dtype=object)
+        )
+
+        for trilha in tabela['trilha']:
+            self._posicoes[trilha] = len(self.trilhas)
+            self.trilhas.append(trilha)
+
+        self.dificuldades.extend(dificuldades.tolist())
+        self.vetores = np.vstack([
+            self.vetores,
+            self.scaler.transform(tabela[self.colunas])
+        ])
+
+        if len(self) - self.n_indexados > self.fracao_reconstrucao * max(self.n_indexados, 1):
+            self.reconstruir()
+
+    def reconstruir(self) -> None:
+        """
+        Objetivo: Recriar as árvores com todas as trilhas (esvazia o buffer).
+        """
+        dificuldades = np.asarray(self.dificuldades, dtype=object)
+
+        self.membros = {None: np.arange(len(self), dtype=np.int64)}
+        for rotulo in pd.unique(dificuldades[pd.notna(dificuldades)]):
+            self.membros[rotulo] = np.flatnonzero(dificuldades == rotulo)
+
+        self.arvores = {
+            rotulo: KDTree(self.vetores[membros], leaf_size=self.tamanho_folha)
+            for rotulo, membros in self.membros.items()
+            if len(membros)
+        }
+        self.n_indexados = len(self)
+
+    # ------------------------------------------------------------
+    # CONSULTAS
+    # ------------------------------------------------------------
+
+    def _vetor(self, referencia) -> np.ndarray:
+        if isinstance(referencia, str):
+            if referencia not in self._posicoes:
+                raise ValueError(f"Trilha '{referencia}' não está no índice.")
+            return self.vetores[self._posicoes[referencia]]
+
+        valores = pd.DataFrame([referencia], columns=self.colunas)
+        return self.scaler.transform(valores)[0]
+
+    def _buffer(self, dificuldade):
+        posicoes = np.arange(self.n_indexados, len(self), dtype=np.int64)
+        if dificuldade is not None:
+            rotulos = np.asarray(self.dificuldades, dtype=object)[posicoes]
+            posicoes = posicoes[rotulos == dificuldade]
+
+        return posicoes, self.vetores[posicoes]
+
+    def _resultado(self, posicoes: np.ndarray, distancias: np.ndarray, excluir: int) -> pd.DataFrame:
+        ordem = np.argsort(distancias, kind='stable')
+        posicoes, distancias = posicoes[ordem], distancias[ordem]
+
+        manter = posicoes != excluir
+        posicoes, distancias = posicoes[manter], distancias[manter]
+
+        return pd.DataFrame({
+            'trilha': [self.trilhas[p] for p in posicoes],
+            'dificuldade': [self.dificuldades[p] for p in posicoes],
+            'distancia': np.round(distancias, 4)
+        })
+
+    def vizinhos(self, referencia, k: int = 20, dificuldade: str = None) -> pd.DataFrame:
+        """
+        Objetivo: As 'k' trilhas mais parecidas com a referência.
+        Entrada:
+            - referencia: Nome de uma trilha indexada (ela própria é excluída do resultado)
+              ou dicionário/lista com os valores das colunas do modelo.
+            - k: Número de vizinhos.
+            - dificuldade: Restringe a busca a um rótulo (ex.: 'Pesada').
+        Saída: pd.DataFrame (trilha, dificuldade, distancia) da mais próxima à mais distante.
+        """
+        vetor = self._vetor(referencia)
+        excluir = self._posicoes.get(referencia, -1) if isinstance(referencia, str) else -1
+        k_busca = k + (excluir >= 0)
+
+        posicoes = [np.zeros(0, dtype=np.int64)]
+        distancias = [np.zeros(0)]
+
+        arvore = self.arvores.get(dificuldade)
+        if arvore is not None:
+            k_arvore = min(k_busca, len(self.membros[dificuldade]))
+            dist, ind = arvore.query(vetor[None, :], k=k_arvore)
+            posicoes.append(self.membros[dificuldade][ind[0]])
+            distancias.append(dist[0])
+
+        posicoes_buffer, vetores_buffer = self._buffer(dificuldade)
+        posicoes.append(posicoes_buffer)
+        distancias.append(np.linalg.norm(vetores_buffer - vetor, axis=1))
+
+        resultado = self._resultado(np.concatenate(posicoes), np.concatenate(distancias), excluir)
+        return resultado.head(k).reset_index(drop=True)
+
+    def no_raio(self, referencia, raio: float, dificuldade: str = None) -> pd.DataFrame:
+        """
+        Objetivo: Todas as trilhas a até 'raio' (distância no espaço padronizado) da referência.
+        Entrada: Mesmas referências de 'vizinhos', raio e filtro opcional de dificuldade.
+        Saída: pd.DataFrame (trilha, dificuldade, distancia), ordenado pela distância.
+        """
+        vetor = self._vetor(referencia)
+        excluir = self._posicoes.get(referencia, -1) if isinstance(referencia, str) else -1
+
+        posicoes = [np.zeros(0, dtype=np.int64)]
+        distancias = [np.zeros(0)]
+
+        arvore = self.arvores.get(dificuldade)
+        if arvore is not None:
+            ind, dist = arvore.query_radius(vetor[None, :], r=raio, return_distance=True)
+            posicoes.append(self.membros[dificuldade][ind[0]])
+            distancias.append(dist[0])
+
+        posicoes_buffer, vetores_buffer = self._buffer(dificuldade)
+        dist_buffer = np.linalg.norm(vetores_buffer - vetor, axis=1)
+        dentro = dist_buffer <= raio
+        posicoes.append(posicoes_buffer[dentro])
+        distancias.append(dist_buffer[dentro])
+
+        return self._resultado(np.concatenate(posicoes), np.concatenate(distancias), excluir)
+
+    # ------------------------------------------------------------
+    # PERSISTÊNCIA
+    # ------------------------------------------------------------
+
+    def salvar(self, caminho: str) -> None:
+        pasta = os.path.dirname(caminho)
+        if pasta:
+            os.makedirs(pasta, exist_ok=True)
+
+        joblib.dump(self, caminho)
+
+
+def carregar_indice_similaridade(caminho: str, modelo: dict = None) -> IndiceSimilaridade:
+    """
+    Objetivo: Reabrir um índice salvo, opcionalmente conferindo se ele usa o scaler do modelo atual.
+    Entrada: Caminho do índice e, opcionalmente, o modelo de 'carregar_modelo_dificuldade'.
+    Saída: IndiceSimilaridade. Lança ValueError se o scaler divergir (índice desatualizado).
+    """
+    indice = joblib.load(caminho)
+
+    if modelo is not None:
+        scaler = modelo['scaler']
+        if not (
+            np.allclose(indice.scaler.mean_, scaler.mean_)
+            and np.allclose(indice.scaler.scale_, scaler.scale_)
+        ):
+            raise ValueError("Índice de similaridade construído com outro scaler: reconstrua o índice.")
+
+    return indice
+
+
+def construir_indice_similaridade(
+    caminho_csv: str,
+    caminho_modelo: str,
+    caminho_indice: str = None
+) -> IndiceSimilaridade:
+    """
+    Objetivo: Criar o índice a partir da tabela de análise e do modelo K-Means salvo.
+    Entrada:
+        - caminho_csv: Tabela com 'trilha' e as features (classificada ou não).
+        - caminho_modelo: Modelo salvo por 'classificar_dificuldade_kmeans(caminho_modelo=...)'.
+        - caminho_indice: Destino opcional do índice (joblib).
+    Processamento: Trilhas sem 'dificuldade' são rotuladas com o próprio modelo.
+    Saída: IndiceSimilaridade pronto para consulta.
+    """
+    modelo = carregar_modelo_dificuldade(caminho_modelo)
+    tabela = pd.read_csv(caminho_csv)
+
+    if 'dificuldade' not in tabela.columns:
+        tabela['dificuldade'] = prever_dificuldade(modelo, tabela)
+
+    indice = IndiceSimilaridade(modelo)
+    indice.adicionar(tabela)
+    indice.reconstruir()
+
+    if caminho_indice:
+        indice.salvar(caminho_indice)
+
+    return indice
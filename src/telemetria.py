@@ -0,0 +1,351 @@
+import cProfile
+import heapq
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # Windows não possui o módulo 'resource'
+    resource = None
+
+
+# ------------------------------------------------------------
+# FUNÇÕES AUXILIARES
+# ------------------------------------------------------------
+
+def medir_rss_pico_mb() -> float:
+    """
+    Objetivo: Obter o pico de memória residente (RSS) do processo atual, desde o seu início
+              (não é o pico de uma etapa: depois que uma etapa atinge o máximo, todas as
+              seguintes reportam o mesmo valor).
+    Entrada: Nenhuma.
+    Processamento:
+        1. Consulta 'getrusage' do sistema operacional.
+        2. Converte a unidade nativa (KB no Linux, bytes no macOS) para MB.
+    Saída: Float com o pico de RSS em MB, ou None quando indisponível na plataforma.
+    """
+    if resource is None:
+        return None
+
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    if sys.platform == 'darwin':
+        return pico / (1024 * 1024)
+
+    return pico / 1024
+
+
+def medir_rss_atual_mb() -> float:
+    """
+    Objetivo: Obter a memória residente (RSS) atual do processo.
+    Processamento: Lê as páginas residentes de '/proc/self/statm' (Linux).
+    Saída: Float em MB, ou None quando '/proc' não está disponível.
+    """
+    try:
+        with open('/proc/self/statm', 'rb') as arquivo:
+            paginas = int(arquivo.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+
+    return paginas * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+
+def _arredondar_mb(valor: float):
+    return round(valor, 2) if valor is not None else None
+
+
+def campos_memoria(rss_inicio_mb: float) -> dict:
+    """
+    Objetivo: Campos de memória de um registro de etapa/arquivo.
+    Entrada: RSS atual medido no início do bloco ('medir_rss_atual_mb').
+    Saída: Dicionário com RSS no início e no fim do bloco, a variação (atribuível ao bloco) e o
+           pico do processo até o momento ('rss_pico_processo_mb').
+    """
+    rss_fim_mb = medir_rss_atual_mb()
+
+    return {
+        'rss_inicio_mb': _arredondar_mb(rss_inicio_mb),
+        'rss_fim_mb': _arredondar_mb(rss_fim_mb),
+        'rss_delta_mb': (
+            _arredondar_mb(rss_fim_mb - rss_inicio_mb)
+            if rss_inicio_mb is not None and rss_fim_mb is not None else None
+        ),
+        'rss_pico_processo_mb': _arredondar_mb(medir_rss_pico_mb()),
+        'pid': os.getpid()
+    }
+
+
+# ------------------------------------------------------------
+# COLETOR DE TELEMETRIA
+# ------------------------------------------------------------
+
+class Telemetria:
+    """
+    Objetivo: Instrumentar o pipeline registrando o custo de cada etapa por arquivo.
+    Entrada:
+        - caminho_trace: Arquivo JSON-lines de saída (None mantém os registros apenas em memória).
+        - perfilar_top_n: Quantidade de arquivos mais lentos cujo perfil é preservado (0 desativa).
+        - backend_perfil: 'cprofile' (padrão) ou 'pyinstrument' (se instalado).
+    Processamento:
+        1. Cada etapa (parse, distancia, ganho, dias_ic, tobler, clustering, graficos) é
+           medida em tempo de parede, tempo de CPU, RSS no início e no fim (e a variação) e
+           número de pontos; o pico de RSS do processo vai junto, rotulado como tal.
+        2. Etapas executadas em workers (membros de pacotes, figuras) são medidas no worker e
+           devolvidas ao processo principal ('registrar'); o campo 'pid' identifica o processo.
+        3. Os registros são gravados linha a linha no trace JSON-lines.
+        4. Opcionalmente perfila cada arquivo e mantém apenas os N mais lentos.
+    Saída: Objeto consultável via 'registros' e 'resumo()'.
+    """
+
+    def __init__(self, caminho_trace: str = None, perfilar_top_n: int = 0, backend_perfil: str = 'cprofile'):
+        self.caminho_trace = caminho_trace
+        self.perfilar_top_n = perfilar_top_n
+        self.backend_perfil = backend_perfil
+        self.registros = []
+
+        # Heap mínimo (tempo, sequência, arquivo, perfil) com os arquivos mais lentos
+        self._perfis = []
+        self._sequencia = 0
+        self._arquivo_trace = None
+        self._trava = threading.Lock()
+
+        if backend_perfil not in ('cprofile', 'pyinstrument'):
+            raise ValueError(f"Backend de perfil não suportado: {backend_perfil}")
+
+        if caminho_trace:
+            pasta = os.path.dirname(caminho_trace)
+            if pasta:
+                os.makedirs(pasta, exist_ok=True)
+            self._arquivo_trace = open(caminho_trace, 'a', encoding='utf-8')
+
+    def registrar(self, registro: dict) -> None:
+        """
+        Objetivo: Armazenar um registro e anexá-lo ao trace JSON-lines.
+        Entrada: Dicionário serializável em JSON.
+        Saída: Nenhuma.
+        """
+        # Etapas podem ser medidas em threads de leitura antecipada (modo streaming)
+        with self._trava:
+            self.registros.append(registro)
+
+            if self._arquivo_trace is not None:
+                self._arquivo_trace.write(json.dumps(registro, ensure_ascii=False) + '\n')
+                self._arquivo_trace.flush()
+
+    @contextmanager
+    def etapa(self, nome: str, arquivo: str = None, n_pontos: int = None):
+        """
+        Objetivo: Medir uma etapa do pipeline.
+        Entrada: Nome da etapa, arquivo processado e número de pontos (opcionais).
+        Processamento:
+            1. Captura relógio de parede e de CPU (da thread corrente) antes e depois do bloco.
+            2. Entrega ao bloco o dicionário do registro, permitindo preencher
+               'n_pontos' quando ele só é conhecido ao final (ex.: parse).
+        Saída: Registro JSON-lines do tipo 'etapa'.
+        """
+        registro = {
+            'evento': 'etapa',
+            'etapa': nome,
+            'arquivo': arquivo,
+            'n_pontos': n_pontos
+        }
+
+        rss_inicio = medir_rss_atual_mb()
+        inicio_parede = time.perf_counter()
+        inicio_cpu = time.thread_time()
+
+        try:
+            yield registro
+        finally:
+            registro['tempo_parede_s'] = round(time.perf_counter() - inicio_parede, 6)
+            registro['tempo_cpu_s'] = round(time.thread_time() - inicio_cpu, 6)
+            registro.update(campos_memoria(rss_inicio))
+            registro['timestamp'] = time.time()
+
+            self.registrar(registro)
+
+    @contextmanager
+    def arquivo(self, arquivo: str):
+        """
+        Objetivo: Medir o processamento completo de um arquivo e, se configurado, perfilá-lo.
+        Entrada: Nome do arquivo.
+        Processamento:
+            1. Ativa o perfilador escolhido durante o bloco.
+            2. Mantém no heap apenas os 'perfilar_top_n' arquivos de maior tempo de parede.
+        Saída: Registro JSON-lines do tipo 'arquivo'.
+        """
+        perfilador = self._criar_perfilador()
+
+        rss_inicio = medir_rss_atual_mb()
+        inicio_parede = time.perf_counter()
+        inicio_cpu = time.process_time()
+
+        if isinstance(perfilador, cProfile.Profile):
+            perfilador.enable()
+        elif perfilador is not None:
+            perfilador.start()
+
+        try:
+            yield
+        finally:
+            if isinstance(perfilador, cProfile.Profile):
+                perfilador.disable()
+            elif perfilador is not None:
+                perfilador.stop()
+
+            tempo_parede = time.perf_counter() - inicio_parede
+
+            self.registrar({
+                'evento': 'arquivo',
+                'arquivo': arquivo,
+                'tempo_parede_s': round(tempo_parede, 6),
+                'tempo_cpu_s': round(time.process_time() - inicio_cpu, 6),
+                **campos_memoria(rss_inicio),
+                'timestamp': time.time()
+            })
+
+            if perfilador is not None:
+                self._guardar_perfil(tempo_parede, arquivo, perfilador)
+
+    def _criar_perfilador(self):
+        if self.perfilar_top_n <= 0:
+            return None
+
+        if self.backend_perfil == 'pyinstrument':
+            try:
+                from pyinstrument import Profiler
+            except ImportError:
+                print("pyinstrument não instalado; usando cProfile.")
+                self.backend_perfil = 'cprofile'
+            else:
+                return Profiler()
+
+        return cProfile.Profile()
+
+    def _guardar_perfil(self, tempo_parede: float, arquivo: str, perfilador) -> None:
+        self._sequencia += 1
+        item = (tempo_parede, self._sequencia, arquivo, perfilador)
+
+        if len(self._perfis) < self.perfilar_top_n:
+            heapq.heappush(self._perfis, item)
+        elif tempo_parede > self._perfis[0][0]:
+            heapq.heapreplace(self._perfis, item)
+
+    def salvar_perfis(self, pasta_saida: str) -> list:
+        """
+        Objetivo: Persistir os perfis dos arquivos mais lentos.
+        Entrada: Pasta de destino.
+        Processamento: Grava '.prof' (cProfile, legível por pstats/snakeviz) ou '.txt' (pyinstrument).
+        Saída: Lista com os caminhos gerados.
+        """
+        os.makedirs(pasta_saida, exist_ok=True)
+        caminhos = []
+
+        for posicao, (_, _, arquivo, perfilador) in enumerate(sorted(self._perfis, reverse=True), start=1):
+            base = os.path.join(pasta_saida, f"{posicao:02d}_{os.path.basename(str(arquivo))}")
+
+            if isinstance(perfilador, cProfile.Profile):
+                caminho = base + '.prof'
+                perfilador.dump_stats(caminho)
+            else:
+                caminho = base + '.txt'
+                with open(caminho, 'w', encoding='utf-8') as saida:
+                    saida.write(perfilador.output_text())
+
+            caminhos.append(caminho)
+
+        return caminhos
+
+    def resumo(self, top: int = 15) -> str:
+        """
+        Objetivo: Consolidar a execução em um relatório textual.
+        Entrada: Quantidade de pontos quentes (funções) a listar.
+        Processamento:
+            1. Soma tempo de parede e CPU por etapa e guarda o maior aumento de RSS de uma chamada.
+            2. Lista os arquivos mais lentos.
+            3. Agrega os perfis preservados e ordena as funções por tempo acumulado.
+        Saída: String com o relatório (também impressa no console).
+        """
+        totais = {}
+        for registro in self.registros:
+            if registro['evento'] != 'etapa':
+                continue
+            total = totais.setdefault(registro['etapa'], [0, 0.0, 0.0, 0, None])
+            total[0] += 1
+            total[1] += registro['tempo_parede_s']
+            total[2] += registro['tempo_cpu_s']
+            total[3] += registro['n_pontos'] or 0
+
+            delta = registro.get('rss_delta_mb')
+            if delta is not None:
+                total[4] = delta if total[4] is None else max(total[4], delta)
+
+        linhas = ["", "Resumo de telemetria por etapa:"]
+        linhas.append(
+            f"{'etapa':<12}{'chamadas':>10}{'parede (s)':>14}{'cpu (s)':>12}{'pontos':>12}{'Δrss máx (MB)':>16}"
+        )
+        for nome, (chamadas, parede, cpu, pontos, delta) in sorted(totais.items(), key=lambda item: -item[1][1]):
+            delta = f"{delta:>16.2f}" if delta is not None else f"{'-':>16}"
+            linhas.append(f"{nome:<12}{chamadas:>10}{parede:>14.3f}{cpu:>12.3f}{pontos:>12}{delta}")
+
+        arquivos = [r for r in self.registros if r['evento'] == 'arquivo']
+        if arquivos:
+            linhas.append("")
+            linhas.append("Arquivos mais lentos:")
+            for registro in sorted(arquivos, key=lambda r: -r['tempo_parede_s'])[:5]:
+                linhas.append(f"  {registro['tempo_parede_s']:>10.3f} s  {registro['arquivo']}")
+
+        perfis_cprofile = [p for _, _, _, p in self._perfis if isinstance(p, cProfile.Profile)]
+        if perfis_cprofile:
+            buffer = io.StringIO()
+            estatisticas = pstats.Stats(perfis_cprofile[0], stream=buffer)
+            for perfil in perfis_cprofile[1:]:
+                estatisticas.add(perfil)
+            estatisticas.sort_stats('cumulative').print_stats(top)
+
+            linhas.append("")
+            linhas.append(f"Pontos quentes ({len(perfis_cprofile)} arquivos mais lentos):")
+            linhas.append(buffer.getvalue().strip())
+
+        texto = '\n'.join(linhas)
+        print(texto)
+        return texto
+
+    def fechar(self) -> None:
+        if self._arquivo_trace is not None:
+            self._arquivo_trace.close()
+            self._arquivo_trace = None
+
+
+@contextmanager
+def medir_etapa(telemetria: Telemetria, nome: str, arquivo: str = None, n_pontos: int = None):
+    """
+    Objetivo: Permitir instrumentação opcional sem ramificar o código chamador.
+    Entrada: Instância de Telemetria (ou None) e os mesmos argumentos de 'Telemetria.etapa'.
+    Saída: Context manager que não faz nada quando a telemetria está desligada.
+    """
+    if telemetria is None:
+        yield {}
+        return
+
+    with telemetria.etapa(nome, arquivo, n_pontos) as registro:
+        yield registro
+
+
+@contextmanager
+def medir_arquivo(telemetria: Telemetria, arquivo: str):
+    """
+    Objetivo: Versão opcional de 'Telemetria.arquivo' (no-op quando telemetria é None).
+    """
+    if telemetria is None:
+        yield
+        return
+
+    with telemetria.arquivo(arquivo):
+        yield
@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+
+
+# Sentinela de tempo ausente: mesmo valor interno do NaT do NumPy/Pandas
+NAT_NS = np.iinfo(np.int64).min
+
+NS_POR_DIA = 86_400 * 10**9
+
+
+class Trilha:
+    """
+    Objetivo: Representar uma trilha GPS em formato colunar compacto.
+    Estrutura:
+        - latitude, longitude, altitude_m: arrays contíguos float64 (ou float32, opcional).
+        - tempo_ns: array int64 com o instante UTC em nanossegundos desde a época (NAT_NS = ausente).
+    Uso: Fatias ('trilha[i:j]', 'por_dia()') são views sem cópia dos arrays originais;
+         'to_frame()' gera o DataFrame apenas quando o Pandas é realmente necessário.
+    """
+
+    __slots__ = ('latitude', 'longitude', 'altitude_m', 'tempo_ns')
+
+    def __init__(self, latitude, longitude, altitude_m, tempo_ns=None, dtype=np.float64):
+        self.latitude = np.ascontiguousarray(latitude, dtype=dtype)
+        self.longitude = np.ascontiguousarray(longitude, dtype=dtype)
+        self.altitude_m = np.ascontiguousarray(altitude_m, dtype=dtype)
+
+        if tempo_ns is None:
+            tempo_ns = np.full(len(self.latitude), NAT_NS, dtype=np.int64)
+        self.tempo_ns = np.ascontiguousarray(tempo_ns, dtype=np.int64)
+
+        n = len(self.latitude)
+        if not (len(self.longitude) == len(self.altitude_m) == len(self.tempo_ns) == n):
+            raise ValueError("Arrays da trilha com tamanhos diferentes.")
+
+    # ------------------------------------------------------------
+    # CONSTRUÇÃO E CONVERSÃO
+    # ------------------------------------------------------------
+
+    @classmethod
+    def from_frame(cls, dados: pd.DataFrame, dtype=np.float64) -> 'Trilha':
+        """
+        Objetivo: Converter o DataFrame de 'ler_gpx' (ou equivalente) em Trilha.
+        Entrada: pd.DataFrame com ['latitude', 'longitude', 'altitude_m'] e, opcionalmente, 'time'.
+        Saída: Trilha na mesma ordem de linhas do DataFrame.
+        """
+        if 'time' in dados.columns:
+            tempos = pd.to_datetime(dados['time'], utc=True, errors='coerce')
+            tempo_ns = (
+                tempos.dt.tz_convert(None)
+                .to_numpy(dtype='datetime64[ns]')
+                .view(np.int64)
+            )
+        else:
+            tempo_ns = None
+
+        return cls(
+            dados['latitude'].to_numpy(),
+            dados['longitude'].to_numpy(),
+            dados['altitude_m'].to_numpy(),
+            tempo_ns,
+            dtype=dtype
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Objetivo: Materializar a trilha como DataFrame (mesmo layout de 'ler_gpx').
+        Saída: pd.DataFrame com colunas ['latitude', 'longitude', 'altitude_m', 'time'].
+        """
+        return pd.DataFrame({
+            'latitude': self.latitude,
+            'longitude': self.longitude,
+            'altitude_m': self.altitude_m,
+            'time': pd.to_datetime(self.tempo_ns.view('datetime64[ns]'), utc=True)
+        })
+
+    def astype(self, dtype) -> 'Trilha':
+        """
+        Objetivo: Converter as coordenadas (ex.: para float32, reduzindo memória pela metade).
+        Saída: Nova Trilha (sem cópia se o dtype já for o solicitado).
+        """
+        return Trilha(self.latitude, self.longitude, self.altitude_m, self.tempo_ns, dtype=dtype)
+
+    def ordenar_por_tempo(self) -> 'Trilha':
+        """
+        Objetivo: Ordenar os pontos cronologicamente (ordenação estável, tempos ausentes ao final).
+        Saída: Nova Trilha ordenada.
+        """
+        chave = np.where(self.tempo_ns == NAT_NS, np.iinfo(np.int64).max, self.tempo_ns)
+        ordem = np.argsort(chave, kind='stable')
+
+        return Trilha(
+            self.latitude[ordem],
+            self.longitude[ordem],
+            self.altitude_m[ordem],
+            self.tempo_ns[ordem],
+            dtype=self.latitude.dtype
+        )
+
+    # ------------------------------------------------------------
+    # ACESSO E FATIAMENTO
+    # ------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.latitude)
+
+    def __getitem__(self, fatia: slice) -> 'Trilha':
+        """
+        Objetivo: Recortar um segmento contíguo da trilha sem copiar os arrays.
+        Entrada: slice (ex.: trilha[100:500]).
+        Saída: Trilha cujos arrays são views da original.
+        """
+        if not isinstance(fatia, slice):
+            raise TypeError("Trilha só aceita fatiamento por slice.")
+
+        segmento = Trilha.__new__(Trilha)
+        segmento.latitude = self.latitude[fatia]
+        segmento.longitude = self.longitude[fatia]
+        segmento.altitude_m = self.altitude_m[fatia]
+        segmento.tempo_ns = self.tempo_ns[fatia]
+        return segmento
+
+    def __repr__(self) -> str:
+        return f"Trilha(n_pontos={len(self)}, dtype={self.latitude.dtype})"
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self.latitude.nbytes + self.longitude.nbytes
+            + self.altitude_m.nbytes + self.tempo_ns.nbytes
+        )
+
+    def mascara_tempo_valido(self) -> np.ndarray:
+        return self.tempo_ns != NAT_NS
+
+    def dias_utc(self) -> np.ndarray:
+        """
+        Objetivo: Obter o dia UTC (dias desde a época) de cada ponto com tempo válido.
+        Saída: Array int64 com um valor por ponto de tempo válido, na ordem da trilha.
+        """
+        return self.tempo_ns[self.mascara_tempo_valido()] // NS_POR_DIA
+
+    def por_dia(self):
+        """
+        Objetivo: Percorrer a trilha dia a dia (UTC) sem cópias.
+        Pré-condição: Trilha ordenada por tempo (como retornada por 'ler_gpx_trilha').
+        Processamento:
+            1. Considera apenas o prefixo de pontos com tempo válido.
+            2. Localiza as fronteiras de mudança de dia e devolve views contíguas.
+        Saída: Gerador de tuplas (datetime.date, Trilha).
+        """
+        n_validos = int(self.mascara_tempo_valido().sum())
+        tempos = self.tempo_ns[:n_validos]
+
+        if n_validos and (
+            np.any(tempos == NAT_NS) or np.any(np.diff(tempos) < 0)
+        ):
+            raise ValueError("Trilha não ordenada por tempo; use 'ordenar_por_tempo()'.")
+
+        dias = tempos // NS_POR_DIA
+        fronteiras = np.concatenate((
+            [0],
+            np.flatnonzero(np.diff(dias)) + 1,
+            [n_validos]
+        ))
+
+        for inicio, fim in zip(fronteiras[:-1], fronteiras[1:]):
+            if fim > inicio:
+                dia = np.datetime64(int(dias[inicio]), 'D').astype(object)
+                yield dia, self[int(inicio):int(fim)]
+
+
+def como_trilha(dados) -> Trilha:
+    """
+    Objetivo: Aceitar tanto Trilha quanto DataFrame nas funções de métricas.
+    Entrada: Trilha ou pd.DataFrame no layout de 'ler_gpx'.
+    Saída: Trilha (a própria instância, quando já for uma).
+    """
+    if isinstance(dados, Trilha):
+        return dados
+
+    return Trilha.from_frame(dados)
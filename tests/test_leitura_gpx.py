@@ -0,0 +1,52 @@
+import gzip
+
+import numpy as np
+import pytest
+
+from src.leitura_gpx import ler_gpx_trilha, ler_gpx_trilha_bytes
+
+
+GPX_COM_COMENTARIO_E_CDATA = b'''<?xml version="1.0" encoding="UTF-8"?>
+<gpx version="1.1" creator="teste" xmlns="http://www.topografix.com/GPX/1/1">
+  <trk>
+    <name>Trilha com ruido</name>
+    <desc><![CDATA[<trkpt lat="10.0" lon="10.0"><ele>999</ele></trkpt>]]></desc>
+    <trkseg>
+      <trkpt lat="-22.9000" lon="-43.2000"><ele>10.0</ele><time>2024-05-01T08:00:00Z</time></trkpt>
+      <!-- <trkpt lat="0.0" lon="0.0"><ele>0</ele><time>2024-05-01T08:00:30Z</time></trkpt> -->
+      <trkpt lat="-22.9010" lon="-43.2010"><ele>15.5</ele><time>2024-05-01T08:01:00Z</time></trkpt>
+      <trkpt lat="-22.9020" lon="-43.2020"><ele>21.0</ele><time>2024-05-01T08:02:00Z</time></trkpt>
+    </trkseg>
+  </trk>
+</gpx>
+'''
+
+
+def _assert_trilhas_iguais(obtida, esperada):
+    assert len(obtida) == len(esperada) == 3
+    np.testing.assert_array_equal(obtida.latitude, esperada.latitude)
+    np.testing.assert_array_equal(obtida.longitude, esperada.longitude)
+    np.testing.assert_array_equal(obtida.altitude_m, esperada.altitude_m)
+    np.testing.assert_array_equal(obtida.tempo_ns, esperada.tempo_ns)
+
+
+@pytest.mark.parametrize('gzipado', [False, True])
+def test_bytes_com_comentario_e_cdata_igual_ao_gpxpy(gzipado):
+    conteudo = GPX_COM_COMENTARIO_E_CDATA
+    if gzipado:
+        conteudo = gzip.compress(conteudo)
+
+    esperada = ler_gpx_trilha_bytes(conteudo, leitura_rapida=False)
+    obtida = ler_gpx_trilha_bytes(conteudo, leitura_rapida=True)
+
+    _assert_trilhas_iguais(obtida, esperada)
+
+
+def test_arquivo_mapeado_com_comentario_e_cdata_igual_ao_gpxpy(tmp_path):
+    caminho = tmp_path / 'trilha.gpx'
+    caminho.write_bytes(GPX_COM_COMENTARIO_E_CDATA)
+
+    esperada = ler_gpx_trilha(str(caminho), leitura_rapida=False)
+    obtida = ler_gpx_trilha(str(caminho), leitura_rapida=True)
+
+    _assert_trilhas_iguais(obtida, esperada)